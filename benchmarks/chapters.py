@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of CDS.
+# Copyright (C) 2026 CERN.
+#
+# CDS is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# CDS is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CDS; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Video chapters parsing benchmarks.
+
+Time the parsing of the chapters of synthetic descriptions of increasing
+size, compared to reading the chapters stored in the record when it was
+published.
+
+To run it::
+
+    python benchmarks/chapters.py --lines 100 1000 10000
+"""
+
+import argparse
+import timeit
+
+from cds.modules.records.utils import get_video_chapters, parse_video_chapters
+
+
+def make_description(lines):
+    """Create a description with one chapter every 3 lines.
+
+    A tenth of the chapter titles contain HTML tags or entities.
+    """
+    parts = ["<p>Recording of the seminar, see the chapters below.</p>"]
+    for i in range(lines):
+        if i % 3:
+            parts.append("Some notes about the talk, line {0}.".format(i))
+            continue
+        hours, rest = divmod(i * 7, 3600)
+        timestamp = "{0}:{1:02d}:{2:02d}".format(hours, *divmod(rest, 60))
+        if i % 10 == 0:
+            title = "<b>Part {0}</b> &amp; questions".format(i)
+        else:
+            title = "Part {0}".format(i)
+        parts.append("{0} {1}".format(timestamp, title))
+    return "\n".join(parts)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--lines", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        "{0:>8} {1:>10} {2:>14} {3:>14}".format(
+            "lines", "chapters", "parse (ms)", "stored (ms)"
+        )
+    )
+    for lines in args.lines:
+        description = make_description(lines)
+        chapters = parse_video_chapters(description)
+        record = dict(description=description, chapters=chapters)
+        number = max(1, 10000 // lines)
+        parse = min(
+            timeit.repeat(
+                lambda: parse_video_chapters(description),
+                number=number,
+                repeat=args.repeat,
+            )
+        )
+        stored = min(
+            timeit.repeat(
+                lambda: get_video_chapters(record), number=number, repeat=args.repeat
+            )
+        )
+        print(
+            "{0:>8} {1:>10} {2:>14.3f} {3:>14.6f}".format(
+                lines, len(chapters), parse * 1000 / number, stored * 1000 / number
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
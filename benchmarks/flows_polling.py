@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2026 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Flow status polling benchmarks."""
+
+import os
+
+from locust import HttpLocust, TaskSet, task
+
+
+class FlowPollingTasks(TaskSet):
+    """Benchmark the deposit UI polling the status of a flow.
+
+    The flow to poll and the access token are read from the ``FLOW_ID`` and
+    ``ACCESS_TOKEN`` environment variables. Set ``CONDITIONAL=0`` to poll
+    without sending the ``If-None-Match`` header, for comparison.
+    """
+
+    flow_id = os.environ.get("FLOW_ID")
+    access_token = os.environ.get("ACCESS_TOKEN")
+    conditional = os.environ.get("CONDITIONAL", "1") == "1"
+
+    def on_start(self):
+        """Initialize the last ETag received per endpoint."""
+        self.etags = {}
+
+    def poll(self, url, name):
+        """Poll an endpoint, sending the last ETag received."""
+        headers = {}
+        if self.conditional and url in self.etags:
+            headers["If-None-Match"] = self.etags[url]
+        with self.client.get(
+            url,
+            params={"access_token": self.access_token},
+            headers=headers,
+            name=name,
+            catch_response=True,
+        ) as response:
+            if response.status_code >= 400:
+                response.failure(
+                    "Unexpected status {0}".format(response.status_code)
+                )
+                return
+            response.success()
+            if "ETag" in response.headers:
+                self.etags[url] = response.headers["ETag"]
+
+    @task(3)
+    def feedback(self):
+        """Task flow feedback."""
+        self.poll(
+            "/api/flows/{0}/feedback".format(self.flow_id),
+            "/api/flows/[id]/feedback",
+        )
+
+    @task
+    def status(self):
+        """Task flow status."""
+        self.poll("/api/flows/{0}".format(self.flow_id), "/api/flows/[id]")
+
+
+class FlowPollingUser(HttpLocust):
+    """Locust.
+
+    To run it with many concurrent pollers:
+    `FLOW_ID=<id> ACCESS_TOKEN=<token> locust -f flows_polling.py
+    --host=https://localhost:5000 --clients=500 --hatch-rate=50` and compare
+    the response times with a run using `CONDITIONAL=0`.
+    """
+
+    task_set = FlowPollingTasks
+    min_wait = 1000
+    max_wait = 2000
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of CDS.
+# Copyright (C) 2026 CERN.
+#
+# CDS is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# CDS is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CDS; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Records REST JSON encoding benchmarks.
+
+Time the encoding of project records with the ``_files`` tree of every
+video, each as large as ``tests/data/cds_records_and_files_dump.json``,
+alone and as search results. The records are dumped with the
+``RecordSchemaJSONV1`` schema and encoded with the standard library, as by
+default, compared to built directly and encoded hit by hit with ``orjson``,
+as with ``CDS_RECORDS_REST_FAST_JSON``.
+
+To run it::
+
+    pip install orjson
+    python benchmarks/json_encoding.py --hits 1 10 50
+"""
+
+import argparse
+import json
+import os
+import timeit
+from collections import namedtuple
+
+import orjson
+from invenio_records_rest.schemas import RecordSchemaJSONV1
+
+DUMP = os.path.join(
+    os.path.dirname(__file__), "..", "tests", "data", "cds_records_and_files_dump.json"
+)
+
+PID = namedtuple("PID", ["pid_type", "pid_value"])
+
+
+def make_file(recid, key, subformats=4, frames=10):
+    """Create the ``_files`` entry of a video master, as stored in CDS."""
+    bucket = "{0:08d}-0000-0000-0000-000000000000".format(recid)
+
+    def entry(name, **tags):
+        return dict(
+            bucket_id=bucket,
+            checksum="md5:7843365e4c2f507fa5578854e7a32191",
+            completed=True,
+            content_type="mp4",
+            key=name,
+            links=dict(
+                self="https://videos.cern.ch/api/files/{0}/{1}".format(bucket, name)
+            ),
+            size=123456789,
+            tags=dict(context_type="master", media_type="video", **tags),
+            version_id="{0:08d}-1111-1111-1111-111111111111".format(recid),
+        )
+
+    master = entry(key, duration="3600.0", width="1920", height="1080")
+    master["subformat"] = [
+        entry("{0}p.mp4".format(360 * (i + 1)), preset_quality="{0}p".format(i))
+        for i in range(subformats)
+    ]
+    master["frame"] = [
+        entry("frame-{0}.jpg".format(i), timestamp=str(i * 360)) for i in range(frames)
+    ]
+    master["playlist"] = [entry("{0}.smil".format(recid))]
+    return master
+
+
+def make_project(recid, size):
+    """Create the hit of a project whose videos sum up to ``size`` bytes."""
+    videos = []
+    metadata = dict(
+        recid=recid,
+        title=dict(title="Project {0}".format(recid)),
+        description="<p>Recording of the seminar.</p>",
+        videos=videos,
+    )
+    while len(json.dumps(metadata)) < size:
+        video_recid = recid * 1000 + len(videos)
+        videos.append(
+            dict(
+                recid=video_recid,
+                title=dict(title="Video {0}".format(video_recid)),
+                _files=[make_file(video_recid, "video.mp4")],
+            )
+        )
+    return dict(
+        pid=PID("recid", recid),
+        metadata=metadata,
+        links=dict(self="https://videos.cern.ch/api/record/{0}".format(recid)),
+        revision=3,
+        created="2026-01-01T00:00:00+00:00",
+        updated="2026-01-02T00:00:00+00:00",
+    )
+
+
+def encode_json(hits):
+    """Dump the hits with the schema and encode them all at once."""
+    schema = RecordSchemaJSONV1()
+    return json.dumps(
+        dict(hits=dict(hits=[schema.dump(hit) for hit in hits], total=len(hits))),
+        separators=(",", ":"),
+        sort_keys=True,
+    )
+
+
+def encode_orjson(hits):
+    """Build the hits as the schema would and encode them one by one."""
+    chunks = [b'{"hits":{"hits":[']
+    for index, hit in enumerate(hits):
+        if index:
+            chunks.append(b",")
+        data = dict(id=str(hit["pid"].pid_value))
+        for key in ("metadata", "links", "created", "updated"):
+            data[key] = hit[key]
+        chunks.append(orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
+    chunks.append(b'],"total":%d}}' % len(hits))
+    return b"".join(chunks)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--hits", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    size = os.path.getsize(DUMP)
+    print(
+        "{0:>6} {1:>10} {2:>12} {3:>14} {4:>8}".format(
+            "hits", "size (kB)", "json (ms)", "orjson (ms)", "speedup"
+        )
+    )
+    for count in args.hits:
+        hits = [make_project(recid, size) for recid in range(1, count + 1)]
+        number = max(1, 20 // count)
+        stdlib = min(
+            timeit.repeat(lambda: encode_json(hits), number=number, repeat=args.repeat)
+        )
+        fast = min(
+            timeit.repeat(
+                lambda: encode_orjson(hits), number=number, repeat=args.repeat
+            )
+        )
+        print(
+            "{0:>6} {1:>10} {2:>12.3f} {3:>14.3f} {4:>8.1f}".format(
+                count,
+                len(encode_orjson(hits)) // 1024,
+                stdlib * 1000 / number,
+                fast * 1000 / number,
+                stdlib / fast,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -155,11 +155,19 @@ CELERY_BEAT_SCHEDULE = {
             "checksum_kwargs": {"use_default_impl": True},
         },
     },
+    "process-reindex-queue": {
+        "task": "cds.modules.deposit.tasks.process_reindex_queue",
+        "schedule": timedelta(seconds=10),
+    },
     "index-deposit-projects": {
         "task": "cds.modules.deposit.tasks.index_deposit_projects",
         # Every 12 minutes, not to be at the same time as the others
         "schedule": timedelta(minutes=12),
     },
+    "flows-reap-stuck-tasks": {
+        "task": "cds.modules.maintenance.tasks.reap_stuck_flow_tasks",
+        "schedule": timedelta(minutes=15),
+    },
     "clean-tmp-videos": {
         "task": "cds.modules.maintenance.tasks.clean_tmp_videos",
         "schedule": crontab(minute=0, hour=3),  # at 3 am
@@ -274,7 +282,7 @@ SEARCH_UI_SEARCH_TEMPLATE = "cds_search_ui/search.html"
 # Default base template for search UI
 SEARCH_UI_BASE_TEMPLATE = "cds_theme/page.html"
 # Default search parameters for search UI
-SEARCH_UI_SEARCH_EXTRA_PARAMS = {"size": 21}  # page size
+SEARCH_UI_SEARCH_EXTRA_PARAMS = {"size": 21, "format": "ui"}  # page size
 # Default Elasticsearch document type.
 SEARCH_DOC_TYPE_DEFAULT = None
 
@@ -506,11 +514,13 @@ CDS_RECORDS_EXPORTFORMATS = {
         title="SMIL",
         mimetype="application/smil",
         serializer="cds.modules.records.serializers:smil_v1",
+        cacheable=True,
     ),
     "vtt": dict(
         title="VTT",
         mimetype="text/vtt",
         serializer="cds.modules.records.serializers:vtt_v1",
+        cacheable=True,
     ),
     "drupal": dict(
         title="Drupal",
@@ -526,6 +536,21 @@ CDS_RECORDS_EXPORTFORMATS = {
 
 CDS_RECORDS_UI_LINKS_FORMAT = "https://videos.cern.ch/record/{recid}"
 
+# Seconds during which the rendered SMIL and VTT files of a record revision
+# are cached.
+CDS_RECORDS_FORMAT_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+# Seconds during which the players can reuse the SMIL and VTT files without
+# checking if they changed.
+CDS_RECORDS_FORMAT_MAX_AGE = 60 * 60
+
+# Number of videos read from the index at once by the Drupal export feed.
+CDS_RECORDS_DRUPAL_FEED_PAGE_SIZE = 500
+
+# Encode the JSON of the records REST API with ``orjson`` and stream the
+# search results. Requires the ``orjson`` extra.
+CDS_RECORDS_REST_FAST_JSON = False
+
 # Endpoints for records.
 RECORDS_UI_ENDPOINTS = dict(
     recid=dict(
@@ -609,7 +634,48 @@ OAISERVER_RECORD_INDEX = "records"
 # 404 template.
 RECORDS_UI_TOMBSTONE_TEMPLATE = "invenio_records_ui/tombstone.html"
 
-CDS_RECORDS_RELATED_QUERY = "/api/records/?size=3&sort=mostrecent&q=%s"
+CDS_RECORDS_RELATED_QUERY = "/api/records/?size=3&sort=mostrecent&format=ui&q=%s"
+
+# Filter the searches with the ``_access_terms`` of the records, computed
+# when indexing them, instead of their ``_access`` and owner. Enable it once
+# the records are reindexed.
+CDS_RECORDS_SEARCH_ACCESS_TERMS = False
+
+# Seconds during which the results of the searches of the anonymous users
+# are cached, until a record is indexed or deleted. Set to 0 to disable.
+CDS_RECORDS_SEARCH_CACHE_TIMEOUT = 60
+
+# Seconds after the records are indexed or deleted during which the searches
+# are not cached, until the index is refreshed and the changes are visible.
+CDS_RECORDS_SEARCH_CACHE_SETTLE_TIME = 2
+
+# Media type of the search results rendered by the search UI.
+CDS_RECORDS_SEARCH_UI_MEDIA_TYPE = "application/vnd.cds.search-ui+json"
+
+# Filter the ``_source`` of the search hits with
+# ``CDS_RECORDS_REST_SEARCH_SOURCE``. The search UI renders the cards from the
+# ``_thumbnail`` of the records instead of their ``_files``: enable it once
+# the records are reindexed.
+CDS_RECORDS_REST_SEARCH_SOURCE_ENABLED = False
+
+# Filters of the ``_source`` of the search hits, by REST endpoint and by
+# search serializer, as ``includes`` and ``excludes`` lists of fields.
+CDS_RECORDS_REST_SEARCH_SOURCE = {
+    "recid": {
+        CDS_RECORDS_SEARCH_UI_MEDIA_TYPE: dict(
+            includes=[
+                "recid",
+                "title",
+                "description",
+                "duration",
+                "date",
+                "publication_date",
+                "related_identifiers",
+                "_thumbnail",
+            ],
+        ),
+    },
+}
 
 # Endpoints for record API.
 _Record_PID = 'pid(recid, record_class="cds.modules.records.api:CDSRecord")'
@@ -643,6 +709,13 @@ RECORDS_REST_ENDPOINTS = dict(
         },
         search_serializers={
             "application/json": ("cds.modules.records.serializers" ":json_v1_search"),
+            CDS_RECORDS_SEARCH_UI_MEDIA_TYPE: (
+                "cds.modules.records.serializers" ":json_v1_search_ui"
+            ),
+        },
+        search_serializers_aliases={
+            "json": "application/json",
+            "ui": CDS_RECORDS_SEARCH_UI_MEDIA_TYPE,
         },
         list_route="/records/",
         item_route="/record/<{0}:pid_value>".format(_Record_PID),
@@ -959,7 +1032,7 @@ FRONTPAGE_ENDPOINT = "cds_home.index"
 # Featured query
 FRONTPAGE_FEATURED_QUERY = "/api/records/?q=featured:true&size=1&sort=mostrecent"
 # Recent videos query
-FRONTPAGE_RECENT_QUERY = "/api/records/?size=3&sort=mostrecent&type=VIDEO"
+FRONTPAGE_RECENT_QUERY = "/api/records/?size=3&sort=mostrecent&type=VIDEO&format=ui"
 # Queries for the boxes
 FRONTPAGE_QUERIES = [
     {"size": 5, "page": 1},
@@ -1321,6 +1394,14 @@ INDEXER_DEFAULT_INDEX = "records-default-v1.0.0"
 INDEXER_DEFAULT_DOC_TYPE = "default-v1.0.0"
 INDEXER_BULK_REQUEST_TIMEOUT = 60
 
+#: Collect the videos and projects to reindex during the flows in a queue,
+#: indexed in bulk periodically, instead of indexing them at every change.
+CDS_REINDEX_QUEUE_ENABLED = True
+#: Redis key (in ``CACHE_REDIS_URL``) of the reindex queue.
+CDS_REINDEX_QUEUE_KEY = "cds::reindex_queue"
+#: Max number of records sent to the indexer in a single bulk request.
+CDS_REINDEX_QUEUE_BATCH_SIZE = 500
+
 ###############################################################################
 # Deposit
 ###############################################################################
@@ -1661,5 +1742,39 @@ CDS_LDAP_URL = "ldap://xldap.cern.ch"
 # Sets the location to share the video files among the different tasks
 CDS_FILES_TMP_FOLDER = "/tmp/videos"
 
+###############################################################################
+# Flows
+###############################################################################
+
+#: Max number of parallel connections used to download a remote file, when
+#: the server supports range requests.
+CDS_FLOWS_DOWNLOAD_CONNECTIONS = 4
+#: Min size in bytes of each part of a parallel download.
+CDS_FLOWS_DOWNLOAD_PART_MIN_SIZE = 16 * 1024 * 1024
+#: Number of retries of a failed download request, resuming where it stopped.
+CDS_FLOWS_DOWNLOAD_RETRIES = 3
+#: Timeout in seconds of the download requests.
+CDS_FLOWS_DOWNLOAD_TIMEOUT = 60
+#: Min seconds between two updates of the download progress in the task.
+CDS_FLOWS_DOWNLOAD_PROGRESS_INTERVAL = 5
+#: Seconds without update after which a started task is considered stuck, by
+#: task name, as ``(base, per second of video)``.
+CDS_FLOWS_REAPER_SLA = {
+    "file_download": (3600, 0),
+    "file_video_metadata_extraction": (1800, 0),
+    "file_video_extract_frames": (1800, 1),
+    "file_video_extract_chapter_frames": (1800, 1),
+    "file_transcode": (4 * 3600, 10),
+}
+#: SLA of the started tasks not listed in ``CDS_FLOWS_REAPER_SLA``.
+CDS_FLOWS_REAPER_DEFAULT_SLA = (3600, 1)
+#: Seconds after which a pending task, in a flow without started tasks, is
+#: cancelled because it will never start.
+CDS_FLOWS_REAPER_PENDING_SLA = 24 * 3600
+#: Number of times a stuck task is restarted before being left failed.
+CDS_FLOWS_REAPER_MAX_RESTARTS = 1
+#: Timeout in seconds of the Celery workers inspection.
+CDS_FLOWS_REAPER_INSPECT_TIMEOUT = 5
+
 # TODO: needs latest files-rest enabling range requests
 FILES_REST_ALLOW_RANGE_REQUESTS = True
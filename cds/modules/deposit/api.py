@@ -55,14 +55,16 @@ from invenio_pidstore.errors import (
 )
 from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 from invenio_pidstore.resolver import Resolver
+from invenio_records.models import RecordMetadata
 from invenio_records_files.models import RecordsBuckets
 from invenio_records_files.utils import sorted_files_from_bucket
 from invenio_sequencegenerator.api import Sequence
 from jsonschema.exceptions import ValidationError
+from sqlalchemy import and_, or_
 
 from ..flows.api import (
     FlowService,
-    get_tasks_status_grouped_by_task_name,
+    get_tasks_status_by_deposit,
     merge_tasks_status,
 )
 from ..flows.tasks import ExtractChapterFramesTask
@@ -82,6 +84,7 @@ from ..records.utils import (
     lowercase_value,
     parse_video_chapters,
     get_existing_chapter_frame_timestamps,
+    get_video_chapters,
 )
 from ..records.validators import PartialDraft4Validator
 from ..records.permissions import is_public
@@ -442,6 +445,25 @@ class CDSDeposit(Deposit):
         return data
 
 
+class VideoRefIndex(object):
+    """Index of the video references of a project.
+
+    It maps each reference to its positions in ``project["videos"]`` and
+    keeps the videos already resolved, so that they are loaded only once,
+    with the version of their metadata when they were loaded.
+    """
+
+    def __init__(self, fingerprint, refs):
+        """Init."""
+        self.fingerprint = fingerprint
+        self.refs = refs
+        self.positions = {}
+        for position, ref in enumerate(refs):
+            self.positions.setdefault(ref, []).append(position)
+        self.resolved = {}
+        self.versions = {}
+
+
 # TODO move inside Video class
 def video_build_url(video_id):
     """Build video url."""
@@ -535,38 +557,56 @@ class Project(CDSDeposit):
         if len(self["videos"]) > 0 and self["videos"][0].get("$ref", ""):
             return [record_unbuild_url(ref) for ref in self._video_refs]
 
-        #  return []
         ids = []
         for video in self["videos"]:
-            if Video(video).is_published():
+            if video["_deposit"]["status"] == "published":
                 ids.append(video["_deposit"].get("pid"))
             else:
                 ids.append(video["_deposit"]["id"])
         return ids
 
+    @staticmethod
+    def _build_video_ref(video):
+        """Get the reference of a video entry without loading the video."""
+        if "$ref" in video:
+            return video["$ref"]
+        if video["_deposit"]["status"] == "published":
+            return record_build_url(video["recid"])
+        return video_build_url(video["_deposit"]["id"])
+
+    def _video_ref_index(self):
+        """Get the references index, rebuilding it if ``videos`` changed."""
+        videos = self.get("videos", [])
+        fingerprint = (id(videos),) + tuple(
+            (id(video), video.get("$ref")) for video in videos
+        )
+        index = getattr(self, "_video_refs_cache", None)
+        if index is None or index.fingerprint != fingerprint:
+            index = VideoRefIndex(
+                fingerprint, [self._build_video_ref(video) for video in videos]
+            )
+            self._video_refs_cache = index
+        return index
+
+    def _invalidate_video_refs(self):
+        """Drop the references index after modifying ``videos``."""
+        self._video_refs_cache = None
+
     @property
     def _video_refs(self):
         """Get all video refs.
 
         :returns: A list of video references.
         """
-        refs = []
-        for video in self.get("videos", []):
-            if "$ref" in video:
-                refs.append(video["$ref"])
-            else:
-                refs.append(Video(video).ref)
-        return refs
+        return list(self._video_ref_index().refs)
 
     def _find_refs(self, refs):
         """Find index of references."""
+        positions = self._video_ref_index().positions
         result = {}
-        for key, value in enumerate(self._video_refs):
-            try:
-                refs.index(value)
-                result[key] = value
-            except ValueError:
-                pass
+        for ref in refs:
+            for key in positions.get(ref, []):
+                result[key] = ref
         return result
 
     def _update_videos(self, old_refs, new_refs):
@@ -575,20 +615,21 @@ class Project(CDSDeposit):
         :param old_refs: List contains the video references to substitute.
         :param new_refs: List contains the new video references
         """
-        for key, value in enumerate(self._video_refs):
-            try:
-                index = old_refs.index(value)
-                self["videos"][key] = {"$ref": new_refs[index]}
-            except ValueError:
-                pass
+        replacements = {}
+        for old_ref, new_ref in zip(old_refs, new_refs):
+            replacements.setdefault(old_ref, new_ref)
+        for key, value in self._find_refs(list(replacements)).items():
+            self["videos"][key] = {"$ref": replacements[value]}
+        self._invalidate_video_refs()
 
     def _delete_videos(self, refs):
         """Update metadata deleting videos.
 
         :param refs: List contains the video references to delete.
         """
-        for index in self._find_refs(refs).keys():
+        for index in sorted(self._find_refs(refs).keys(), reverse=True):
             del self["videos"][index]
+        self._invalidate_video_refs()
 
     def _publish_videos(self):
         """Publish all videos that are still deposits."""
@@ -652,6 +693,7 @@ class Project(CDSDeposit):
         else:
             # add new one
             self["videos"].append({"$ref": video_ref})
+        self._invalidate_video_refs()
 
     def delete(self, force=True, pid=None):
         """Delete a project."""
@@ -709,10 +751,19 @@ class Project(CDSDeposit):
         )
 
     def _current_tasks_status(self):
-        """Return up-to-date tasks status."""
+        """Return up-to-date tasks status.
+
+        The status of the videos is computed from their metadata and their
+        flows with two queries, without loading the videos.
+        """
+        videos = videos_refs_state(self._video_refs)
+        flows_status = get_tasks_status_by_deposit(
+            [deposit_id for deposit_id, _ in videos]
+        )
         status = {}
-        for video in self.videos:
-            status = merge_tasks_status(status, video["_cds"].get("state", {}))
+        for deposit_id, state in videos:
+            state = flows_status.get(deposit_id, state)
+            status = merge_tasks_status(status, state)
         return status
 
     @classmethod
@@ -727,13 +778,34 @@ class Project(CDSDeposit):
     @property
     def videos(self):
         """Get videos."""
-        videos = []
-        for ref in self._video_refs:
-            if is_deposit(ref):
-                videos.append(deposit_video_resolver(record_unbuild_url(ref)))
-            else:
-                videos.append(record_video_resolver(record_unbuild_url(ref)))
-        return videos
+        return self._load_videos()
+
+    def _load_videos(self, fresh=False):
+        """Resolve the videos, reusing the ones already resolved.
+
+        :param fresh: resolve again the videos modified since they were
+            resolved, e.g. before committing them.
+        """
+        index = self._video_ref_index()
+        if fresh and index.resolved:
+            versions = dict(
+                db.session.query(RecordMetadata.id, RecordMetadata.version_id)
+                .filter(
+                    RecordMetadata.id.in_(
+                        [video.id for video in index.resolved.values()]
+                    )
+                )
+                .all()
+            )
+            for ref, video in list(index.resolved.items()):
+                if versions.get(video.id) != index.versions[ref]:
+                    del index.resolved[ref]
+        missing = [ref for ref in index.positions if ref not in index.resolved]
+        if missing:
+            for ref, video in zip(missing, videos_refs_resolver(missing)):
+                index.resolved[ref] = video
+                index.versions[ref] = video.model.version_id
+        return [index.resolved[ref] for ref in index.refs]
 
     def update(self, *args, **kwargs):
         """Update project."""
@@ -743,8 +815,9 @@ class Project(CDSDeposit):
 
     def _sync_videos(self):
         """Sync fields from project to the videos."""
-        # sync access right from project to the videos
-        for video in self.videos:
+        # sync access right from project to the videos, resolving again the
+        # ones modified in the meantime not to overwrite their changes
+        for video in self._load_videos(fresh=True):
             # sync video with project
             if self._sync_fields(video=video):
                 video.commit(validator=PartialDraft4Validator)
@@ -915,15 +988,13 @@ class Video(CDSDeposit):
 
     def _has_chapters_changed(self, old_record=None):
         """Check if chapters in description have changed."""
-        current_description = self.get("description", "")
-        current_chapters = parse_video_chapters(current_description)
+        current_chapters = self.get("chapters", [])
 
         if old_record is None:
             # First publish - trigger if chapters exist
             return len(current_chapters) > 0
 
-        old_description = old_record.get("description", "")
-        old_chapters = parse_video_chapters(old_description)
+        old_chapters = get_video_chapters(old_record)
 
         # Compare chapter timestamps
         if len(current_chapters) != len(old_chapters):
@@ -1000,6 +1071,8 @@ class Video(CDSDeposit):
         self.project._sync_fields(self)
         # generate human-readable duration
         self.generate_duration()
+        # parse the chapters once, instead of on every read
+        self["chapters"] = parse_video_chapters(self.get("description", ""))
         # generate extra tags for files
         self._create_tags()
 
@@ -1114,9 +1187,10 @@ class Video(CDSDeposit):
 
     def _current_tasks_status(self):
         """Return up-to-date tasks status."""
-        flow = FlowMetadata.get_by_deposit(self["_deposit"]["id"])
-        if flow:
-            return get_tasks_status_grouped_by_task_name(flow)
+        deposit_id = self["_deposit"]["id"]
+        flows_status = get_tasks_status_by_deposit([deposit_id])
+        if deposit_id in flows_status:
+            return flows_status[deposit_id]
         if "state" in self.get("_cds", {}):
             return self["_cds"]["state"]
         return {}
@@ -1220,9 +1294,43 @@ def deposit_video_resolver(video_id):
     return deposit
 
 
+def _bulk_videos_resolver(pid_type, pid_values, fallback, with_deleted=False):
+    """Resolve videos with one query for the PIDs and one for the records.
+
+    PIDs which are not registered or assigned are resolved one by one with
+    ``fallback``, which raises the same errors as the single resolvers.
+    """
+    if not pid_values:
+        return []
+    pids = PersistentIdentifier.query.filter(
+        PersistentIdentifier.pid_type == pid_type,
+        PersistentIdentifier.pid_value.in_(set(pid_values)),
+        PersistentIdentifier.status == PIDStatus.REGISTERED,
+        PersistentIdentifier.object_type == "rec",
+        PersistentIdentifier.object_uuid.isnot(None),
+    )
+    uuids = {pid.pid_value: str(pid.object_uuid) for pid in pids}
+    videos = {
+        str(video.id): video
+        for video in Video.get_records(
+            list(set(uuids.values())), with_deleted=with_deleted
+        )
+    }
+    result = []
+    for pid_value in pid_values:
+        video = videos.get(uuids.get(pid_value))
+        result.append(video if video is not None else fallback(pid_value))
+    return result
+
+
 def deposit_videos_resolver(video_ids):
     """Resolve videos."""
-    return [deposit_video_resolver(id_) for id_ in video_ids]
+    return _bulk_videos_resolver(
+        "depid",
+        [str(id_) for id_ in video_ids],
+        fallback=deposit_video_resolver,
+        with_deleted=True,
+    )
 
 
 def record_video_resolver(video_id):
@@ -1230,6 +1338,68 @@ def record_video_resolver(video_id):
     return Video.get_record(record_resolver.resolve(video_id)[1].id)
 
 
+def record_videos_resolver(video_ids):
+    """Get the video deposits from the records."""
+    return _bulk_videos_resolver(
+        "recid", [str(id_) for id_ in video_ids], fallback=record_video_resolver
+    )
+
+
+def videos_refs_state(refs):
+    """Get deposit id and stored tasks status of videos from their references.
+
+    The values are read with a single query, without loading the videos.
+    Unresolvable references are skipped.
+
+    :returns: A list of ``(deposit_id, state)`` tuples.
+    """
+    pid_values = {"depid": set(), "recid": set()}
+    for ref in refs:
+        pid_type = "depid" if is_deposit(ref) else "recid"
+        pid_values[pid_type].add(record_unbuild_url(ref))
+    conditions = [
+        and_(
+            PersistentIdentifier.pid_type == pid_type,
+            PersistentIdentifier.pid_value.in_(values),
+        )
+        for pid_type, values in pid_values.items()
+        if values
+    ]
+    if not conditions:
+        return []
+    rows = (
+        db.session.query(
+            RecordMetadata.json[("_deposit", "id")].as_string(),
+            RecordMetadata.json[("_cds", "state")],
+        )
+        .join(
+            PersistentIdentifier,
+            PersistentIdentifier.object_uuid == RecordMetadata.id,
+        )
+        .filter(
+            or_(*conditions),
+            PersistentIdentifier.object_type == "rec",
+            RecordMetadata.json.isnot(None),
+        )
+    )
+    return [(deposit_id, state or {}) for deposit_id, state in rows]
+
+
+def videos_refs_resolver(refs):
+    """Resolve video references, keeping their order."""
+    deposits = iter(
+        deposit_videos_resolver(
+            [record_unbuild_url(ref) for ref in refs if is_deposit(ref)]
+        )
+    )
+    records = iter(
+        record_videos_resolver(
+            [record_unbuild_url(ref) for ref in refs if not is_deposit(ref)]
+        )
+    )
+    return [next(deposits) if is_deposit(ref) else next(records) for ref in refs]
+
+
 def record_project_resolver(video_id):
     """Get the video deposit from the record."""
     return Project.get_record(record_resolver.resolve(video_id)[1].id)
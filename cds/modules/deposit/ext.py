@@ -30,18 +30,27 @@ import tempfile
 import os
 import shutil
 
+from flask_principal import identity_changed
 from invenio_base.signals import app_loaded
 from invenio_db import db
 from invenio_files_rest.models import ObjectVersion, ObjectVersionTag
 from invenio_files_rest.signals import file_uploaded
 from invenio_files_rest.errors import InvalidKeyError
 from invenio_indexer.signals import before_record_index
+from invenio_records.signals import (
+    after_record_delete,
+    after_record_revert,
+    after_record_update,
+)
 from invenio_records_files.utils import sorted_files_from_bucket
 from srt_to_vtt import srt_to_vtt
 
 from ..flows.files import move_file_into_local
 from ..invenio_deposit.signals import post_action
-from .indexer import cdsdeposit_indexer_receiver
+from ..records.refs import clear_resolved_refs
+from ..records.search import expire_search_cache, expire_search_cache_on_teardown
+from ..records.utils import clear_user_provides
+from .indexer import ReindexQueue, cdsdeposit_indexer_receiver
 from .receivers import (
     datacite_register_after_publish,
     index_deposit_after_action,
@@ -158,6 +167,10 @@ class CDSDepositApp(object):
 
     def init_app(self, app):
         """Flask application initialization."""
+        self.deposit_classes = None
+        self.reindex_queue = ReindexQueue(
+            app.config["CACHE_REDIS_URL"], app.config["CDS_REINDEX_QUEUE_KEY"]
+        )
         app.extensions["cds-deposit"] = self
         self.register_signals(app)
 
@@ -170,6 +183,16 @@ class CDSDepositApp(object):
         post_action.connect(update_project_id_after_publish, sender=app, weak=False)
         # if it's a project/video, expands information before index
         before_record_index.connect(cdsdeposit_indexer_receiver, sender=app, weak=False)
+        # the references resolved in bulk are kept until a record changes
+        for signal in (after_record_update, after_record_delete, after_record_revert):
+            signal.connect(clear_resolved_refs, sender=app, weak=False)
+        # the cached searches expire once the records are indexed or deleted,
+        # at the end of the request or task
+        before_record_index.connect(expire_search_cache, sender=app, weak=False)
+        after_record_delete.connect(expire_search_cache, sender=app, weak=False)
+        app.teardown_appcontext(expire_search_cache_on_teardown)
+        # the user's provides kept in the session are rebuilt on login/logout
+        identity_changed.connect(clear_user_provides, sender=app, weak=False)
         # register Datacite after publish record
         post_action.connect(datacite_register_after_publish, sender=app, weak=False)
 
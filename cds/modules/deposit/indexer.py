@@ -25,36 +25,102 @@
 """Deposit Indexer."""
 
 
+from contextlib import contextmanager
+
+import redis
+from flask import current_app, g
 from invenio_indexer.api import RecordIndexer
 from invenio_jsonschemas import current_jsonschemas
 from invenio_pidstore.models import PersistentIdentifier
+from invenio_records.models import RecordMetadata
+from werkzeug.local import LocalProxy
 
-from ..records.utils import lowercase_value
+from ..records.api import CDSVideosFilesIterator
+from ..records.utils import get_access_terms, is_record, lowercase_value
 from .api import Project, Video
 
 
+def get_deposit_classes():
+    """Get the deposit classes by schema URL.
+
+    The URLs are built once per application and then reused.
+    """
+    ext = current_app.extensions["cds-deposit"]
+    if ext.deposit_classes is None:
+        ext.deposit_classes = {
+            current_jsonschemas.path_to_url(cls._schema): cls for cls in (Project, Video)
+        }
+    return ext.deposit_classes
+
+
+@contextmanager
+def prefetch_deposits(record_ids):
+    """Load in bulk the deposits that are going to be indexed.
+
+    While the context is active, :func:`cdsdeposit_indexer_receiver` uses
+    the prefetched deposits instead of loading them one by one.
+    """
+    deposit_classes = get_deposit_classes()
+    deposits = {}
+    if record_ids:
+        models = RecordMetadata.query.filter(
+            RecordMetadata.id.in_(list(record_ids)), RecordMetadata.json.isnot(None)
+        )
+        for model in models:
+            deposit_cls = deposit_classes.get(model.json.get("$schema"))
+            if deposit_cls:
+                deposits[str(model.id)] = deposit_cls(model.json, model=model)
+    previous = g.get("cds_prefetched_deposits")
+    g.cds_prefetched_deposits = deposits
+    try:
+        yield deposits
+    finally:
+        g.cds_prefetched_deposits = previous
+
+
+def _get_deposit(deposit_cls, record):
+    """Get the deposit of the record being indexed without reloading it."""
+    if isinstance(record, deposit_cls):
+        return record
+    deposit = (g.get("cds_prefetched_deposits") or {}).get(str(record.id))
+    if deposit is not None:
+        return deposit
+    if record.model is not None:
+        return deposit_cls(dict(record), model=record.model)
+    return deposit_cls.get_record(record.id)
+
+
 def cdsdeposit_indexer_receiver(
     sender, json=None, record=None, index=None, **dummy_kwargs
 ):
-    """Inject task status information before index."""
-    video_schema = current_jsonschemas.path_to_url(Video._schema)
-    project_schema = current_jsonschemas.path_to_url(Project._schema)
-    if record["$schema"] == project_schema:
-        deposit = Project.get_record(record.id)
-    if record["$schema"] == video_schema:
-        deposit = Video.get_record(record.id)
-    if record["$schema"] in [project_schema, video_schema]:
-        json["_cds"]["state"] = deposit["_cds"]["state"]
-        json["_files"] = deposit["_files"]
-        if json.get("_access"):
-            if json["_access"].get("read"):
-                json["_access"]["read"] = [
-                    lowercase_value(value) for value in json["_access"]["read"]
-                ]
-            if json["_access"].get("update"):
-                json["_access"]["update"] = [
-                    lowercase_value(value) for value in json["_access"]["update"]
-                ]
+    """Inject task status information, access terms and thumbnail before index."""
+    deposit_cls = get_deposit_classes().get(record.get("$schema"))
+    if deposit_cls is not None:
+        _inject_deposit_information(json, _get_deposit(deposit_cls, record))
+        # the deposits are only searched by who can update them
+        json["_access_terms"] = get_access_terms(json, read=False)
+    elif is_record(record):
+        json["_access_terms"] = get_access_terms(json)
+    if json.get("_files"):
+        # the search results show the thumbnail without the ``_files``
+        thumbnail = CDSVideosFilesIterator.get_video_thumbnail(json)
+        if thumbnail:
+            json["_thumbnail"] = thumbnail
+
+
+def _inject_deposit_information(json, deposit):
+    """Inject the task status information of a deposit."""
+    json["_cds"]["state"] = deposit["_cds"]["state"]
+    json["_files"] = deposit["_files"]
+    if json.get("_access"):
+        if json["_access"].get("read"):
+            json["_access"]["read"] = [
+                lowercase_value(value) for value in json["_access"]["read"]
+            ]
+        if json["_access"].get("update"):
+            json["_access"]["update"] = [
+                lowercase_value(value) for value in json["_access"]["update"]
+            ]
 
 
 class CDSRecordIndexer(RecordIndexer):
@@ -77,12 +143,11 @@ class CDSRecordIndexer(RecordIndexer):
         super(CDSRecordIndexer, self).bulk_index(iter(ids))
 
     def index(self, deposit, action="commit"):
-        video_schema = current_jsonschemas.path_to_url(Video._schema)
-        project_schema = current_jsonschemas.path_to_url(Project._schema)
+        deposit_cls = get_deposit_classes().get(deposit["$schema"])
         if action == "publish":
-            if deposit["$schema"] == project_schema:
+            if deposit_cls is Project:
                 self._index_project_after_publish(deposit)
-            elif deposit["$schema"] == video_schema:
+            elif deposit_cls is Video:
                 _, record = deposit.fetch_published()
                 super(CDSRecordIndexer, self).index(record)
         elif action in ("edit", "discard", "commit"):
@@ -91,15 +156,14 @@ class CDSRecordIndexer(RecordIndexer):
             self.delete(deposit)
 
     def delete(self, record):
-        video_schema = current_jsonschemas.path_to_url(Video._schema)
-        project_schema = current_jsonschemas.path_to_url(Project._schema)
+        deposit_cls = get_deposit_classes().get(record["$schema"])
 
-        if record["$schema"] == video_schema:
+        if deposit_cls is Video:
             project = record.project
             super(CDSRecordIndexer, self).delete(record)
             # If is a Video index also the project
             super(CDSRecordIndexer, self).index(project)
-        elif record["$schema"] == project_schema:
+        elif deposit_cls is Project:
             ids = [str(video.id) for video in record.videos]
             if ids:
                 index, doc_type = self.record_to_index(record.videos[0])
@@ -110,3 +174,35 @@ class CDSRecordIndexer(RecordIndexer):
         """Overrides to `RecordIndexer.buld_delete` to pass the index of the
         records. Can be used to delete only records of the same index."""
         self._bulk_op(record_iterator, "delete", **kwargs)
+
+
+class ReindexQueue(object):
+    """Deduplicating queue of records waiting to be reindexed.
+
+    The record ids are collected in a Redis set: a record requested several
+    times before the queue is processed is indexed only once.
+    """
+
+    def __init__(self, redis_url, key):
+        """Init."""
+        self.key = key
+        self.client = redis.StrictRedis.from_url(redis_url)
+
+    def add(self, *record_ids):
+        """Add records to the queue."""
+        if record_ids:
+            self.client.sadd(self.key, *[str(id_) for id_ in record_ids])
+
+    def pop(self, count):
+        """Remove and return up to ``count`` records from the queue."""
+        return [id_.decode("utf-8") for id_ in self.client.spop(self.key, count)]
+
+    def __len__(self):
+        """Number of records in the queue."""
+        return self.client.scard(self.key)
+
+
+current_reindex_queue = LocalProxy(
+    lambda: current_app.extensions["cds-deposit"].reindex_queue
+)
+"""Proxy to the reindex queue."""
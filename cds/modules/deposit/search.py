@@ -33,7 +33,7 @@ from invenio_search.api import DefaultFilter
 from invenio_search.engine import dsl
 
 from ..records.search import query_parser_with_fields
-from ..records.utils import get_user_provides
+from ..records.utils import get_user_access_terms, get_user_provides
 from .facets import deposit_facets_factory
 
 
@@ -68,6 +68,10 @@ def cern_filter():
     if Permission(superuser_access).allows(g.identity):
         return dsl.Q()
 
+    if current_app.config["CDS_RECORDS_SEARCH_ACCESS_TERMS"]:
+        terms = dsl.Q("terms", _access_terms=get_user_access_terms(read=False))
+        return dsl.Q("bool", filter=[terms])
+
     # Get CERN user's provides
     provides = get_user_provides()
 
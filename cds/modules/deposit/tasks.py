@@ -26,6 +26,7 @@
 
 
 from datetime import datetime, timedelta
+from itertools import islice
 
 from celery import shared_task
 from flask import current_app
@@ -37,10 +38,12 @@ from invenio_pidstore.models import PIDStatus
 from invenio_pidstore.providers.datacite import DataCiteProvider
 from invenio_records.models import RecordMetadata
 from invenio_records_files.api import Record
+from sqlalchemy import and_, or_
 
 from ...modules.records.minters import is_local_doi
 from ...modules.records.serializers import datacite_v41
 from .api import Project
+from .indexer import current_reindex_queue, prefetch_deposits
 
 
 @shared_task(
@@ -89,26 +92,75 @@ def datacite_register(self, pid_value, record_uuid, max_retries=5, countdown=5):
 
 
 @shared_task(ignore_result=True, rate_limit="100/m")
-def index_deposit_projects(start_date=None):
-    cache = current_cache.get("task_index_deposit_projects:details") or {}
+def index_deposit_projects(start_date=None, chunk_size=500):
+    """Index the project deposits updated since the last run.
+
+    The projects are selected by schema in the database and read in chunks
+    of ``chunk_size`` ids. After each chunk is sent to the indexer the last
+    processed ``(updated, id)`` is saved, so that an interrupted run resumes
+    from there.
+    """
+    cache_key = "task_index_deposit_projects:details"
+    cache = current_cache.get(cache_key) or {}
     if "update_date" not in cache:
         # Set the update date by default to 10 minutes ago
         cache["update_date"] = datetime.utcnow() - timedelta(minutes=10)
-
-    start_date = start_date or cache["update_date"]
-    records = RecordMetadata.query.filter(
-        RecordMetadata.updated > start_date
-    ).with_entities(RecordMetadata.id, RecordMetadata.json)
-
-    projects_ids = []
-    for _id, json in records:
-        if json and json.get("$schema") == current_jsonschemas.path_to_url(
-            Project._schema
-        ):
-            projects_ids.append(str(_id))
-
-    if projects_ids:
-        RecordIndexer().bulk_index(iter(projects_ids))
-
-    cache["update_date"] = datetime.utcnow()
-    current_cache.set("task_index_deposit_projects:details", cache, timeout=-1)
+    if start_date:
+        cache = {"update_date": start_date}
+    end_date = datetime.utcnow()
+
+    query = db.session.query(RecordMetadata.id, RecordMetadata.updated).filter(
+        RecordMetadata.updated <= end_date,
+        RecordMetadata.json["$schema"].as_string()
+        == current_jsonschemas.path_to_url(Project._schema),
+    )
+    if cache.get("last_id"):
+        # resume an interrupted run
+        query = query.filter(
+            or_(
+                RecordMetadata.updated > cache["update_date"],
+                and_(
+                    RecordMetadata.updated == cache["update_date"],
+                    RecordMetadata.id > cache["last_id"],
+                ),
+            )
+        )
+    else:
+        query = query.filter(RecordMetadata.updated > cache["update_date"])
+    query = query.order_by(RecordMetadata.updated, RecordMetadata.id)
+
+    indexer = RecordIndexer()
+    rows = iter(query.yield_per(chunk_size))
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        indexer.bulk_index(str(_id) for _id, _ in chunk)
+        # checkpoint
+        _id, updated = chunk[-1]
+        cache = {"update_date": updated, "last_id": str(_id)}
+        current_cache.set(cache_key, cache, timeout=-1)
+
+    current_cache.set(cache_key, {"update_date": end_date}, timeout=-1)
+
+
+@shared_task(ignore_result=True)
+def process_reindex_queue():
+    """Bulk index the records collected in the reindex queue."""
+    batch_size = current_app.config["CDS_REINDEX_QUEUE_BATCH_SIZE"]
+    indexer = RecordIndexer()
+    queued = []
+    while True:
+        ids = current_reindex_queue.pop(batch_size)
+        if not ids:
+            break
+        try:
+            indexer.bulk_index(iter(ids))
+        except Exception:
+            # put them back, they will be indexed at the next run
+            current_reindex_queue.add(*ids)
+            raise
+        queued.extend(ids)
+    if queued:
+        with prefetch_deposits(queued):
+            indexer.process_bulk_queue()
@@ -0,0 +1,59 @@
+#
+# This file is part of Invenio.
+# Copyright (C) 2026 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Add flows lookup indexes and transcoding columns."""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "4c2f8a9d1e37"
+down_revision = "95f86cc7f284"
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.add_column(
+        "flows_task", sa.Column("preset_quality", sa.String(), nullable=True)
+    )
+    op.add_column(
+        "flows_task", sa.Column("opencast_event_id", sa.String(), nullable=True)
+    )
+    # copy the values from the payload of the existing tasks
+    op.execute(
+        "UPDATE flows_task SET "
+        "preset_quality = payload->>'preset_quality', "
+        "opencast_event_id = payload->>'opencast_event_id' "
+        "WHERE name = 'file_transcode'"
+    )
+    op.create_index(
+        "ix_flows_flow_deposit_id_is_last",
+        "flows_flow",
+        ["deposit_id", "is_last"],
+    )
+    op.create_index(
+        "ix_flows_task_flow_id_name",
+        "flows_task",
+        ["flow_id", "name"],
+    )
+    op.create_index(
+        "ix_flows_task_started_transcode",
+        "flows_task",
+        ["opencast_event_id"],
+        postgresql_where=sa.text("status = 'STARTED' AND name = 'file_transcode'"),
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index("ix_flows_task_started_transcode", table_name="flows_task")
+    op.drop_index("ix_flows_task_flow_id_name", table_name="flows_task")
+    op.drop_index("ix_flows_flow_deposit_id_is_last", table_name="flows_flow")
+    op.drop_column("flows_task", "opencast_event_id")
+    op.drop_column("flows_task", "preset_quality")
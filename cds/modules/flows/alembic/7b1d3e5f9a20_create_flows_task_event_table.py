@@ -0,0 +1,62 @@
+#
+# This file is part of Invenio.
+# Copyright (C) 2026 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Create flows task event table."""
+
+import sqlalchemy as sa
+import sqlalchemy_utils
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7b1d3e5f9a20"
+down_revision = "4c2f8a9d1e37"
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_table(
+        "flows_task_event",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column(
+            "flow_id", sqlalchemy_utils.types.uuid.UUIDType(), nullable=False
+        ),
+        sa.Column(
+            "task_id", sqlalchemy_utils.types.uuid.UUIDType(), nullable=False
+        ),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("message", sa.String(), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["flow_id"],
+            ["flows_flow.id"],
+            name=op.f("fk_flows_task_event_flow_id_flows_flow"),
+            onupdate="CASCADE",
+            ondelete="CASCADE",
+        ),
+        sa.ForeignKeyConstraint(
+            ["task_id"],
+            ["flows_task.id"],
+            name=op.f("fk_flows_task_event_task_id_flows_task"),
+            onupdate="CASCADE",
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_flows_task_event")),
+    )
+    op.create_index(
+        "ix_flows_task_event_flow_id_id",
+        "flows_task_event",
+        ["flow_id", "id"],
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index("ix_flows_task_event_flow_id_id", table_name="flows_task_event")
+    op.drop_table("flows_task_event")
@@ -0,0 +1,51 @@
+#
+# This file is part of Invenio.
+# Copyright (C) 2026 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Compact flows task payload."""
+
+import logging
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a83c5d2e6f14"
+down_revision = "7b1d3e5f9a20"
+branch_labels = ()
+depends_on = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+PAYLOAD_SIZE = (
+    "SELECT count(*), coalesce(sum(pg_column_size(payload)), 0) FROM flows_task"
+)
+
+
+def upgrade():
+    """Upgrade database."""
+    connection = op.get_bind()
+    rows, size_before = connection.execute(PAYLOAD_SIZE).fetchone()
+
+    # the master file tags and the extracted metadata are not copied in the
+    # tasks payload anymore, they are referenced by the `master_id`
+    compacted = connection.execute(
+        "UPDATE flows_task SET payload = payload::jsonb - 'tags' - 'meta' "
+        "WHERE payload::jsonb ?| array['tags', 'meta']"
+    ).rowcount
+
+    _, size_after = connection.execute(PAYLOAD_SIZE).fetchone()
+    logger.info(
+        "Compacted %s of %s flows tasks payload: %s bytes before, %s bytes after.",
+        compacted,
+        rows,
+        size_before,
+        size_after,
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    # the removed tags can still be read from the master file
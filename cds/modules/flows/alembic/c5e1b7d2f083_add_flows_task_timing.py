@@ -0,0 +1,37 @@
+#
+# This file is part of Invenio.
+# Copyright (C) 2026 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Add flows task timing columns."""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c5e1b7d2f083"
+down_revision = "a83c5d2e6f14"
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.add_column("flows_task", sa.Column("queued", sa.DateTime(), nullable=True))
+    op.add_column("flows_task", sa.Column("started", sa.DateTime(), nullable=True))
+    op.add_column("flows_task", sa.Column("finished", sa.DateTime(), nullable=True))
+    op.add_column(
+        "flows_task", sa.Column("bytes_processed", sa.BigInteger(), nullable=True)
+    )
+    op.add_column("flows_task", sa.Column("worker", sa.String(), nullable=True))
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_column("flows_task", "worker")
+    op.drop_column("flows_task", "bytes_processed")
+    op.drop_column("flows_task", "finished")
+    op.drop_column("flows_task", "started")
+    op.drop_column("flows_task", "queued")
@@ -29,13 +29,14 @@ import logging
 from collections import defaultdict
 
 from celery import chain as celery_chain
+from celery import group as celery_group
 from invenio_db import db
 from sqlalchemy.orm.attributes import flag_modified as db_flag_modified
 
 from .deposit import index_deposit_project
 from .errors import TaskAlreadyRunningError
 from .files import init_object_version
-from .models import FlowTaskStatus, as_task
+from .models import FlowMetadata, FlowTaskMetadata, FlowTaskStatus, as_task
 from .tasks import (
     CeleryTask,
     DownloadTask,
@@ -57,6 +58,43 @@ def get_tasks_status_grouped_by_task_name(flow):
     return {k: str(FlowTaskStatus.compute_status(v)) for k, v in results.items() if v}
 
 
+def get_tasks_status_by_deposit(deposit_ids):
+    """Get tasks status grouped by task name for the last flow of deposits.
+
+    Only the name and the status of the tasks are read, with a single query
+    for all the deposits.
+
+    :param deposit_ids: List of deposit ids.
+    :returns: A dictionary with the tasks status of each deposit having a
+        flow.
+    """
+    if not deposit_ids:
+        return {}
+    rows = (
+        db.session.query(
+            FlowMetadata.deposit_id, FlowTaskMetadata.name, FlowTaskMetadata.status
+        )
+        .outerjoin(FlowTaskMetadata, FlowTaskMetadata.flow_id == FlowMetadata.id)
+        .filter(
+            FlowMetadata.deposit_id.in_([str(id_) for id_ in deposit_ids]),
+            FlowMetadata.is_last.is_(True),
+        )
+        .distinct()
+    )
+    results = defaultdict(lambda: defaultdict(list))
+    for deposit_id, name, status in rows:
+        tasks = results[deposit_id]
+        if name is not None:
+            tasks[name].append(status)
+
+    return {
+        deposit_id: {
+            k: str(FlowTaskStatus.compute_status(v)) for k, v in tasks.items()
+        }
+        for deposit_id, tasks in results.items()
+    }
+
+
 def merge_tasks_status(statuses_1, statuses_2):
     """Merge task statuses."""
     statuses = {}
@@ -100,15 +138,28 @@ class AVCFlowCeleryTasks:
         return signature
 
     @classmethod
-    def _build_chain(cls, payload, has_remote_file_to_download):
-        """Build flow's tasks."""
-        celery_tasks = []
+    def _build_tasks(cls, payload, has_remote_file_to_download):
+        """Build flow's tasks.
+
+        :returns: a tuple with the tasks to run one after the other and the
+            tasks to run in parallel once the first ones are done.
+        """
+        serial_tasks = []
+
+        # the checksum is only needed to verify the downloaded file
+        payload = dict(payload)
+        checksum = payload.pop("checksum", None)
 
         if has_remote_file_to_download:
             file_download_task = cls.create_task(
-                DownloadTask, {**payload, "uri": has_remote_file_to_download}
+                DownloadTask,
+                {
+                    **payload,
+                    "uri": has_remote_file_to_download,
+                    "checksum": checksum,
+                },
             )
-            celery_tasks.append(file_download_task)
+            serial_tasks.append(file_download_task)
 
         metadata_extract_task = cls.create_task(
             ExtractMetadataTask,
@@ -118,29 +169,34 @@ class AVCFlowCeleryTasks:
             # # destination file uri once the Download task finishes
             # uri=None if has_remote_file_to_download else payload.get("uri"),
         )
-        celery_tasks.append(metadata_extract_task)
+        serial_tasks.append(metadata_extract_task)
 
+        # frames extraction and transcoding only need the extracted metadata
         frames_extract_task = cls.create_task(ExtractFramesTask, payload)
-        celery_tasks.append(frames_extract_task)
-
         transcode_task = cls.create_task(TranscodeVideoTask, payload)
-        celery_tasks.append(transcode_task)
+        parallel_tasks = [frames_extract_task, transcode_task]
 
-        return celery_tasks
+        return serial_tasks, parallel_tasks
 
     @classmethod
     def build_workflow(cls, payload, has_remote_file_to_download):
-        """Build the Celery tasks sequence for the workflow."""
-        celery_tasks = cls._build_chain(payload, has_remote_file_to_download)
-
-        celery_tasks_signatures = []
-        for celery_task_tuple in celery_tasks:
-            assert isinstance(celery_task_tuple, tuple)
-            celery_task, kwargs = celery_task_tuple
-            signature = cls.create_task_signature(celery_task, **kwargs)
-            celery_tasks_signatures.append(signature)
+        """Build the Celery canvas for the workflow."""
+        serial_tasks, parallel_tasks = cls._build_tasks(
+            payload, has_remote_file_to_download
+        )
 
-        return celery_chain(*celery_tasks_signatures)
+        def _signatures(celery_tasks):
+            signatures = []
+            for celery_task_tuple in celery_tasks:
+                assert isinstance(celery_task_tuple, tuple)
+                celery_task, kwargs = celery_task_tuple
+                signatures.append(cls.create_task_signature(celery_task, **kwargs))
+            return signatures
+
+        return celery_chain(
+            *_signatures(serial_tasks),
+            celery_group(*_signatures(parallel_tasks)),
+        )
 
 
 class FlowService:
@@ -157,8 +213,8 @@ class FlowService:
         Steps:
           * Download the video file (if not done yet).
           * Extract metadata from the video.
-          * Run video transcoding.
-          * Extract frames from the video.
+          * Run video transcoding and extract frames from the video, in
+            parallel.
 
         Mandatory fields in the payload:
           * bucket_id
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of CERN Document Server.
+# Copyright (C) 2026 CERN.
+#
+# CERN Document Server is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# CERN Document Server is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CERN Document Server; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Flows command line utilities."""
+
+import json
+
+import click
+from flask.cli import with_appcontext
+
+from .profile import PERCENTILES, build_report, get_task_timings
+
+
+def _format(value, pattern="{0:.1f}"):
+    """Format a number of the report, which can be missing."""
+    return "-" if value is None else pattern.format(value)
+
+
+@click.group()
+def flows():
+    """Flows command line utilities."""
+
+
+@flows.command()
+@click.option(
+    "--from",
+    "from_date",
+    type=click.DateTime(),
+    help="Profile the flows created from this date.",
+)
+@click.option(
+    "--to",
+    "to_date",
+    type=click.DateTime(),
+    help="Profile the flows created until this date.",
+)
+@click.option("--json", "as_json", is_flag=True, help="Print the report as JSON.")
+@with_appcontext
+def profile(from_date, to_date, as_json):
+    """Report the time spent in each step of the flows."""
+    report = build_report(get_task_timings(from_date, to_date))
+    if as_json:
+        click.echo(json.dumps(report, indent=2, sort_keys=True))
+        return
+
+    percentiles = "/".join("p{0}".format(p) for p in PERCENTILES)
+    click.echo(
+        "{0:<32} {1:>6} {2:>6} {3:>24} {4:>24} {5:>8} {6:>9}".format(
+            "stage",
+            "tasks",
+            "failed",
+            "wait {0} (s)".format(percentiles),
+            "run {0} (s)".format(percentiles),
+            "MB/s",
+            "realtime",
+        )
+    )
+    for stage, values in sorted(report["stages"].items()):
+        click.echo(
+            "{0:<32} {1:>6} {2:>6} {3:>24} {4:>24} {5:>8} {6:>9}".format(
+                stage,
+                values["count"],
+                values["failures"],
+                "/".join(_format(values["wait"][p]) for p in PERCENTILES),
+                "/".join(_format(values["run"][p]) for p in PERCENTILES),
+                _format(values["mb_per_second"]),
+                _format(values["realtime_factor"], "{0:.2f}x"),
+            )
+        )
+
+    flows_ = report["flows"]
+    click.echo("")
+    click.echo(
+        "Critical path of {0} successful flows, total {1} (s): {2}, "
+        "median realtime factor {3}".format(
+            flows_["count"],
+            percentiles,
+            "/".join(_format(flows_["total"][p]) for p in PERCENTILES),
+            _format(flows_["realtime_factor"], "{0:.2f}x"),
+        )
+    )
+    critical_path = sorted(
+        report["critical_path"].items(), key=lambda item: -item[1]["seconds"]
+    )
+    for stage, values in critical_path:
+        click.echo(
+            "{0:<32} in {1:>6} flows, {2:>6}% of the time".format(
+                stage,
+                values["flows"],
+                _format(None if values["share"] is None else values["share"] * 100),
+            )
+        )
@@ -24,13 +24,16 @@
 # as an Intergovernmental Organization or submit itself to any jurisdiction.
 
 """Useful decorators."""
+import hashlib
 import time
 from functools import wraps
 
 from celery import shared_task
-from flask import current_app, jsonify, request
+from flask import current_app, jsonify, make_response, request
 from flask_login import current_user
 from flask_restful import abort
+from invenio_db import db
+from invenio_files_rest.models import ObjectVersionTag
 
 from .errors import FlowDoesNotExist, FlowsError, InvalidPayload
 from .models import FlowMetadata
@@ -100,6 +103,58 @@ def pass_flow(f):
     return inner
 
 
+def get_flow_tags_version(flow):
+    """Get a digest of the tags of the flow file, part of the flow responses."""
+    version_id = (flow.payload or {}).get("version_id")
+    if not version_id:
+        return ""
+    tags = (
+        db.session.query(ObjectVersionTag.key, ObjectVersionTag.value)
+        .filter(ObjectVersionTag.version_id == version_id)
+        .order_by(ObjectVersionTag.key)
+    )
+    digest = hashlib.sha1()
+    for key, value in tags:
+        digest.update("{0}={1}\n".format(key, value).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def conditional_flow(f):
+    """Decorator answering ``304 Not Modified`` if the flow did not change.
+
+    The ``ETag`` header is computed from the flow version and the tags of
+    its file, without loading and serializing the flow tasks. The
+    modification dates are not precise enough for the fast changing tasks,
+    only ``If-None-Match`` is supported.
+    """
+
+    @wraps(f)
+    def inner(self, *args, **kwargs):
+        flow = kwargs.get("flow")
+        version = FlowMetadata.get_version(flow.id) if flow else None
+        if version is None:
+            return f(self, *args, **kwargs)
+
+        updated, tasks_count, is_last = version
+        etag = "{0}-{1}-{2}-{3}-{4}".format(
+            flow.id,
+            updated.strftime("%Y%m%d%H%M%S%f"),
+            tasks_count,
+            int(is_last),
+            get_flow_tags_version(flow),
+        )
+
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(f(self, *args, **kwargs))
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    return inner
+
+
 def error_handler(f):
     """Return a json payload and appropriate status code on exception."""
 
@@ -22,13 +22,44 @@
 # waive the privileges and immunities granted to it by virtue of its status
 # as an Intergovernmental Organization or submit itself to any jurisdiction.
 
+from flask import current_app
 from invenio_indexer.tasks import index_record
+from invenio_pidstore.errors import PIDDoesNotExistError
+from invenio_pidstore.models import PersistentIdentifier
+from invenio_records.models import RecordMetadata
+
+
+def get_video_and_project_ids(deposit_id):
+    """Get the ids of a video deposit and of its project deposit.
+
+    Only the PIDs and the video metadata are read, without loading the
+    deposits (and then the files and the flows of all the videos).
+    """
+    video_pid = PersistentIdentifier.get("depid", deposit_id)
+    video = RecordMetadata.query.get(video_pid.object_uuid)
+    project_id = video.json["_project_id"]
+    try:
+        project_pid = PersistentIdentifier.get("depid", project_id)
+    except PIDDoesNotExistError:
+        # the video points to the project record
+        record_pid = PersistentIdentifier.get("recid", project_id)
+        record = RecordMetadata.query.get(record_pid.object_uuid)
+        project_pid = PersistentIdentifier.get("depid", record.json["_deposit"]["id"])
+    return str(video.id), str(project_pid.object_uuid)
 
 
 def index_deposit_project(deposit_id=None):
-    """Update deposit and project."""
-    from cds.modules.deposit.api import deposit_video_resolver
+    """Update deposit and project.
+
+    When the reindex queue is enabled, the records are only added to the
+    queue and indexed in bulk by
+    :func:`cds.modules.deposit.tasks.process_reindex_queue`.
+    """
+    ids = get_video_and_project_ids(deposit_id)
+    if current_app.config["CDS_REINDEX_QUEUE_ENABLED"]:
+        from cds.modules.deposit.indexer import current_reindex_queue
 
-    deposit_video = deposit_video_resolver(deposit_id)
-    index_record.delay(str(deposit_video.id))
-    index_record.delay(str(deposit_video.project.id))
+        current_reindex_queue.add(*ids)
+    else:
+        for id_ in ids:
+            index_record.delay(id_)
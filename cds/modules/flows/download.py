@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of CERN Document Server.
+# Copyright (C) 2026 CERN.
+#
+# CERN Document Server is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# CERN Document Server is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CERN Document Server; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Resumable download of remote files."""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+import requests
+
+from .errors import DownloadTaskError
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def verify_checksum(path, checksum):
+    """Verify the checksum of a file.
+
+    :param checksum: checksum in the ``<algorithm>:<hex digest>`` format,
+        e.g. ``md5:...``.
+    """
+    algorithm, _, expected = checksum.partition(":")
+    try:
+        digest = hashlib.new(algorithm)
+    except ValueError:
+        raise DownloadTaskError("Unknown checksum algorithm {0}".format(algorithm))
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    if digest.hexdigest() != expected.lower():
+        raise DownloadTaskError(
+            "Checksum mismatch: expected {0}, got {1}:{2}".format(
+                checksum, algorithm, digest.hexdigest()
+            )
+        )
+
+
+class RangedDownload(object):
+    """Download a file, in parallel parts when the server supports ranges.
+
+    The bytes downloaded for each part are recorded next to the destination
+    file, so a new download of the same URI to the same path resumes from
+    there. Failed requests are retried from where they stopped, and the
+    partial file is removed once the retries are exhausted.
+    """
+
+    def __init__(
+        self,
+        uri,
+        path,
+        connections=4,
+        part_min_size=16 * 1024 * 1024,
+        retries=3,
+        timeout=60,
+        save_interval=5,
+    ):
+        """Initialize the download."""
+        self.uri = uri
+        self.path = path
+        self.state_path = path + ".parts"
+        self.connections = connections
+        self.part_min_size = part_min_size
+        self.retries = retries
+        self.timeout = timeout
+        self.save_interval = save_interval
+        self.size = None
+        self.downloaded = 0
+        self.parts = []
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    def _probe(self):
+        """Get the size of the file and if range requests are supported."""
+        response = requests.get(
+            self.uri, headers={"Range": "bytes=0-0"}, stream=True, timeout=self.timeout
+        )
+        response.close()
+        if response.status_code == 206:
+            # e.g. `Content-Range: bytes 0-0/1234`
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit():
+                return int(total), True
+        response.raise_for_status()
+        length = response.headers.get("Content-Length", "")
+        return (int(length) if length.isdigit() else None), False
+
+    def _load_parts(self):
+        """Load the state of a previous download, or split the file."""
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            if (
+                state["uri"] == self.uri
+                and state["size"] == self.size
+                and os.path.exists(self.path)
+            ):
+                return state["parts"]
+        except (IOError, ValueError, KeyError):
+            pass
+
+        count = max(1, min(self.connections, self.size // self.part_min_size))
+        part_size = -(-self.size // count)
+        parts = [
+            [start, min(start + part_size, self.size) - 1, 0]
+            for start in range(0, self.size, part_size)
+        ]
+        with open(self.path, "wb") as f:
+            f.truncate(self.size)
+        return parts
+
+    def _save_parts(self):
+        """Record the bytes downloaded for each part."""
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(dict(uri=self.uri, size=self.size, parts=self.parts), f)
+        os.replace(tmp_path, self.state_path)
+
+    def _retry(self, fetch):
+        """Call ``fetch`` until it succeeds or the retries are exhausted."""
+        for attempt in range(self.retries + 1):
+            try:
+                return fetch()
+            except (requests.RequestException, IOError) as e:
+                if attempt == self.retries or self._cancelled.is_set():
+                    raise DownloadTaskError(
+                        "Failed to download {0}: {1}".format(self.uri, e)
+                    )
+                time.sleep(2**attempt)
+
+    def _flush_part(self, f, part, size):
+        """Write to disk the last ``size`` bytes of a part, then record them.
+
+        The recorded bytes are always on disk, so a resumed download never
+        skips bytes which were lost.
+        """
+        f.flush()
+        os.fsync(f.fileno())
+        with self._lock:
+            part[2] += size
+            self._save_parts()
+
+    def _fetch_part(self, part):
+        """Download the missing bytes of a part."""
+
+        def fetch():
+            start, end, done = part
+            if start + done > end:
+                return
+            response = requests.get(
+                self.uri,
+                headers={"Range": "bytes={0}-{1}".format(start + done, end)},
+                stream=True,
+                timeout=self.timeout,
+            )
+            with response, open(self.path, "r+b") as f:
+                if response.status_code != 206:
+                    raise DownloadTaskError(
+                        "Range request not satisfied: {0}".format(response.status_code)
+                    )
+                f.seek(start + done)
+                unsaved = 0
+                last_save = time.monotonic()
+                try:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        if self._cancelled.is_set():
+                            return
+                        f.write(chunk)
+                        unsaved += len(chunk)
+                        with self._lock:
+                            self.downloaded += len(chunk)
+                        if time.monotonic() - last_save >= self.save_interval:
+                            self._flush_part(f, part, unsaved)
+                            unsaved = 0
+                            last_save = time.monotonic()
+                finally:
+                    self._flush_part(f, part, unsaved)
+            if start + part[2] <= end:
+                # the connection was closed early, resume from there
+                raise IOError(
+                    "Incomplete range response: got {0} of {1} bytes".format(
+                        part[2], end - start + 1
+                    )
+                )
+
+        self._retry(fetch)
+
+    def _cleanup(self):
+        """Remove the downloaded file and the state of the download."""
+        for path in (self.path, self.state_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _fetch_all(self, report):
+        """Download the whole file with a single request."""
+
+        def fetch():
+            response = requests.get(self.uri, stream=True, timeout=self.timeout)
+            with response, open(self.path, "wb") as f:
+                response.raise_for_status()
+                self.downloaded = 0
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    self.downloaded += len(chunk)
+                    report()
+
+        self._retry(fetch)
+
+    def download(self, progress_callback=None, progress_interval=5):
+        """Download the file.
+
+        :param progress_callback: called with the downloaded and the total
+            size, the latter ``None`` if unknown, at most once every
+            ``progress_interval`` seconds, from the calling thread.
+        """
+        last_report = [0]
+
+        def report(force=False):
+            now = time.monotonic()
+            if progress_callback and (
+                force or now - last_report[0] >= progress_interval
+            ):
+                last_report[0] = now
+                progress_callback(self.downloaded, self.size)
+
+        self.size, ranges = self._probe()
+        try:
+            if ranges and self.size:
+                self.parts = self._load_parts()
+                self.downloaded = sum(done for _, _, done in self.parts)
+                with ThreadPoolExecutor(max_workers=len(self.parts)) as executor:
+                    pending = [
+                        executor.submit(self._fetch_part, part) for part in self.parts
+                    ]
+                    try:
+                        while pending:
+                            done, pending = wait(
+                                pending,
+                                timeout=progress_interval,
+                                return_when=FIRST_EXCEPTION,
+                            )
+                            for future in done:
+                                future.result()
+                            report()
+                    except Exception:
+                        self._cancelled.set()
+                        raise
+            else:
+                self._fetch_all(report)
+
+            downloaded_size = os.path.getsize(self.path)
+            if self.size is not None and downloaded_size != self.size:
+                raise DownloadTaskError(
+                    "Size mismatch: expected {0} bytes, got {1}".format(
+                        self.size, downloaded_size
+                    )
+                )
+        except DownloadTaskError:
+            # the retries are exhausted, do not leave the partial file behind
+            self._cleanup()
+            raise
+        self.size = downloaded_size
+        report(force=True)
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        return self.path
@@ -47,3 +47,7 @@ class ExtractFramesTaskError(FlowsError):
 
 class TaskAlreadyRunningError(FlowsError):
     """Raised when a task is restarted while is running."""
+
+
+class DownloadTaskError(FlowsError):
+    """Raised when the download task cannot download the file."""
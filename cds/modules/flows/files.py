@@ -27,11 +27,20 @@ import shutil
 from contextlib import contextmanager
 
 from flask import current_app
+from invenio_cache import current_cache
 from invenio_db import db
-from invenio_files_rest.models import ObjectVersion, ObjectVersionTag, as_object_version
+from invenio_files_rest.models import (
+    Bucket,
+    ObjectVersion,
+    ObjectVersionTag,
+    as_object_version,
+)
 
 from ..xrootd.utils import file_opener_xrootd
 
+BUCKET_WRITERS_TIMEOUT = 24 * 3600
+"""Seconds after which the writers of a bucket are forgotten."""
+
 
 def _rename_key(object_version):
     """Renames the object_version key to avoid issues with subformats
@@ -84,6 +93,53 @@ def dispose_object_version(object_version):
         object_version.bucket.locked = True
 
 
+def _bucket_writers_key(bucket_id):
+    """Cache key of the tasks writing to a bucket."""
+    return "cds_flows_bucket_writers:{0}".format(bucket_id)
+
+
+def unlock_bucket(bucket_id, writer_id):
+    """Unlock a bucket, e.g. of a published video, to add files to it.
+
+    The frames extraction and the transcoding of a flow add their files to
+    the same bucket at the same time. The bucket row is locked with
+    ``SELECT ... FOR UPDATE`` while the writers are registered, so that the
+    bucket is locked again only by the last one, with :func:`relock_bucket`,
+    and only if it was locked before the first one.
+
+    :param writer_id: id of the task writing to the bucket.
+    """
+    bucket = Bucket.query.filter_by(id=bucket_id).with_for_update().one()
+    key = _bucket_writers_key(bucket_id)
+    writers = current_cache.get(key) or dict(relock=bucket.locked, ids=[])
+    if writer_id not in writers["ids"]:
+        writers["ids"].append(writer_id)
+    current_cache.set(key, writers, timeout=BUCKET_WRITERS_TIMEOUT)
+    bucket.locked = False
+    db.session.commit()
+
+
+def relock_bucket(bucket_id, writer_id):
+    """Lock again a bucket unlocked by :func:`unlock_bucket`.
+
+    The bucket stays unlocked while other tasks are writing to it, even if
+    it was locked in the meantime, e.g. by the files sync of the record.
+    """
+    bucket = Bucket.query.filter_by(id=bucket_id).with_for_update().one()
+    key = _bucket_writers_key(bucket_id)
+    writers = current_cache.get(key)
+    if writers is not None:
+        if writer_id in writers["ids"]:
+            writers["ids"].remove(writer_id)
+        if writers["ids"]:
+            current_cache.set(key, writers, timeout=BUCKET_WRITERS_TIMEOUT)
+            bucket.locked = False
+        else:
+            current_cache.delete(key)
+            bucket.locked = writers["relock"]
+    db.session.commit()
+
+
 @contextmanager
 def move_file_into_local(obj, delete=True, tmp_dir=None):
     """Move file from XRootD accessed file system into a local path
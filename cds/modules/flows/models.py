@@ -25,14 +25,18 @@
 """Flow and task models."""
 
 import logging
+import socket
 import uuid
+from datetime import datetime
 from enum import Enum, unique
 
 from invenio_accounts.models import User
 from invenio_db import db
+from sqlalchemy import event, inspect
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import validates
 from sqlalchemy_utils.models import Timestamp
 from sqlalchemy_utils.types import JSONType, UUIDType
 
@@ -94,7 +98,10 @@ class FlowMetadata(db.Model, Timestamp):
     deposit_id = db.Column(db.String, nullable=False)
     """Deposit for which the flow was triggered."""
 
-    __table_args__ = (db.UniqueConstraint("id", "deposit_id"),)
+    __table_args__ = (
+        db.UniqueConstraint("id", "deposit_id"),
+        db.Index("ix_flows_flow_deposit_id_is_last", "deposit_id", "is_last"),
+    )
 
     @hybrid_property
     def status(self):
@@ -128,6 +135,32 @@ class FlowMetadata(db.Model, Timestamp):
             db.session.add(obj)
         return obj
 
+    @classmethod
+    def get_version(cls, flow_id):
+        """Get the version of a flow without loading its tasks.
+
+        :returns: a tuple with the last update time of the flow or its tasks,
+            the number of tasks and the ``is_last`` flag, or ``None``.
+        """
+        result = (
+            db.session.query(
+                cls.updated,
+                cls.is_last,
+                db.func.max(FlowTaskMetadata.updated),
+                db.func.count(FlowTaskMetadata.id),
+            )
+            .outerjoin(FlowTaskMetadata, FlowTaskMetadata.flow_id == cls.id)
+            .filter(cls.id == flow_id)
+            .group_by(cls.id)
+            .one_or_none()
+        )
+        if result is None:
+            return None
+        updated, is_last, tasks_updated, tasks_count = result
+        if tasks_updated is not None:
+            updated = max(updated, tasks_updated)
+        return updated, tasks_count, is_last
+
     @classmethod
     def get_by_deposit(cls, deposit_id, is_last=True, multiple=False):
         """Get flows by deposit id."""
@@ -137,6 +170,15 @@ class FlowMetadata(db.Model, Timestamp):
 
         return query.all() if multiple else query.one_or_none()
 
+    @classmethod
+    def get_by_deposits(cls, deposit_ids):
+        """Get the last flows of many deposits, by deposit id."""
+        query = FlowMetadata.query.filter(
+            cls.deposit_id.in_([str(id_) for id_ in deposit_ids]),
+            cls.is_last.is_(True),
+        )
+        return {flow.deposit_id: flow for flow in query}
+
     @classmethod
     def get_all_by_deposit(cls, deposit_id):
         """Get all flows by deposit id."""
@@ -214,6 +256,14 @@ class FlowTaskStatus(Enum):
         return self.value
 
 
+FINISHED_STATUSES = (
+    FlowTaskStatus.SUCCESS,
+    FlowTaskStatus.FAILURE,
+    FlowTaskStatus.CANCELLED,
+)
+"""Statuses of the tasks which are not running anymore."""
+
+
 class FlowTaskMetadata(db.Model, Timestamp):
     """Flow Task database model."""
 
@@ -268,6 +318,45 @@ class FlowTaskMetadata(db.Model, Timestamp):
     message = db.Column(db.String, nullable=False, default="")
     """Task status message."""
 
+    preset_quality = db.Column(db.String, nullable=True)
+    """Transcoding quality, copied from the payload."""
+
+    opencast_event_id = db.Column(db.String, nullable=True)
+    """OpenCast event of the transcoding, copied from the payload."""
+
+    queued = db.Column(db.DateTime, nullable=True)
+    """Time when the Celery task was sent to the queue."""
+
+    started = db.Column(db.DateTime, nullable=True)
+    """Time when the task started running."""
+
+    finished = db.Column(db.DateTime, nullable=True)
+    """Time when the task succeeded or failed."""
+
+    bytes_processed = db.Column(db.BigInteger, nullable=True)
+    """Size of the file processed by the task."""
+
+    worker = db.Column(db.String, nullable=True)
+    """Host of the worker which ran the task."""
+
+    __table_args__ = (
+        db.Index("ix_flows_task_flow_id_name", "flow_id", "name"),
+        db.Index(
+            "ix_flows_task_started_transcode",
+            "opencast_event_id",
+            postgresql_where=db.text(
+                "status = 'STARTED' AND name = 'file_transcode'"
+            ),
+        ),
+    )
+
+    @validates("payload")
+    def _copy_payload_columns(self, key, payload):
+        """Keep the columns copied from the payload in sync with it."""
+        self.preset_quality = (payload or {}).get("preset_quality")
+        self.opencast_event_id = (payload or {}).get("opencast_event_id")
+        return payload
+
     @classmethod
     def create(
         cls, flow_id, name, payload=None, status=FlowTaskStatus.PENDING
@@ -298,6 +387,35 @@ class FlowTaskMetadata(db.Model, Timestamp):
         """Get a task object from the DB."""
         return cls.query.get(id_)
 
+    @classmethod
+    def set_status(cls, flow_id, name, task_ids, status, message=""):
+        """Set the status of tasks with a single UPDATE by primary key.
+
+        The tasks are not loaded, so the status change events are appended
+        here instead of when flushing the session.
+        """
+        if not task_ids:
+            return
+        now = datetime.utcnow()
+        values = {cls.status: status, cls.message: message, cls.updated: now}
+        if status in FINISHED_STATUSES:
+            values[cls.finished] = now
+        cls.query.filter(cls.id.in_(task_ids)).update(
+            values, synchronize_session=False
+        )
+        db.session.add_all(
+            [
+                FlowTaskEvent(
+                    flow_id=flow_id,
+                    task_id=task_id,
+                    name=name,
+                    status=str(status),
+                    message=message,
+                )
+                for task_id in task_ids
+            ]
+        )
+
     @classmethod
     def get_all_by_flow_task_name(cls, flow_id, name):
         """Get tasks by flow id and name."""
@@ -315,3 +433,121 @@ class FlowTaskMetadata(db.Model, Timestamp):
             "status": str(self.status),
             "message": self.message,
         }
+
+    @classmethod
+    def get_started_by_name(cls, name):
+        """Get the started tasks with the given name."""
+        return cls.query.filter(
+            cls.status == FlowTaskStatus.STARTED, cls.name == name
+        ).all()
+
+
+class FlowTaskEvent(db.Model):
+    """Append-only log of the flow tasks status changes."""
+
+    __tablename__ = "flows_task_event"
+
+    id = db.Column(
+        db.BigInteger().with_variant(db.Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+    )
+    """Event identifier, increasing with the order of the changes."""
+
+    flow_id = db.Column(
+        UUIDType,
+        db.ForeignKey(FlowMetadata.id, onupdate="CASCADE", ondelete="CASCADE"),
+        nullable=False,
+    )
+    """Flow of the task."""
+
+    task_id = db.Column(
+        UUIDType,
+        db.ForeignKey(
+            FlowTaskMetadata.id, onupdate="CASCADE", ondelete="CASCADE"
+        ),
+        nullable=False,
+    )
+    """Task which changed status."""
+
+    flow = db.relationship(FlowMetadata)
+    """Relationship to the FlowMetadata."""
+
+    task = db.relationship(FlowTaskMetadata)
+    """Relationship to the FlowTaskMetadata."""
+
+    name = db.Column(db.String, nullable=False)
+    """Task name."""
+
+    status = db.Column(db.String, nullable=False)
+    """New status of the task."""
+
+    message = db.Column(db.String, nullable=False, default="")
+    """Task status message at the time of the change."""
+
+    created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    """Time of the change."""
+
+    __table_args__ = (
+        db.Index("ix_flows_task_event_flow_id_id", "flow_id", "id"),
+    )
+
+    @classmethod
+    def get_by_flow(cls, flow_id, after=None):
+        """Get the events of a flow, optionally only the ones after an id."""
+        query = cls.query.filter(cls.flow_id == flow_id)
+        if after is not None:
+            query = query.filter(cls.id > after)
+        return query.order_by(cls.id).all()
+
+    def to_dict(self):
+        """Event dictionary representation."""
+        return {
+            "id": self.id,
+            "flow_id": str(self.flow_id),
+            "task_id": str(self.task_id),
+            "created": self.created.isoformat(),
+            "name": self.name,
+            "status": self.status,
+            "message": self.message,
+        }
+
+
+def _record_task_timing(obj, status):
+    """Record when a task started or finished, unless set explicitly."""
+    attrs = inspect(obj).attrs
+    now = datetime.utcnow()
+    if status == FlowTaskStatus.PENDING:
+        obj.finished = None
+    elif status == FlowTaskStatus.STARTED:
+        if not attrs.started.history.added:
+            obj.started = now
+        if not attrs.worker.history.added:
+            obj.worker = socket.gethostname()
+        obj.finished = None
+    elif status in FINISHED_STATUSES:
+        if not attrs.finished.history.added:
+            obj.finished = now
+
+
+@event.listens_for(db.session, "before_flush")
+def log_tasks_status_changes(session, flush_context, instances):
+    """Append a ``FlowTaskEvent`` for each task whose status changed."""
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, FlowTaskMetadata):
+            continue
+        added = inspect(obj).attrs.status.history.added
+        if not added:
+            continue
+        _record_task_timing(obj, FlowTaskStatus(added[0]))
+        if obj.id is None:
+            obj.id = uuid.uuid4()
+        session.add(
+            FlowTaskEvent(
+                flow_id=obj.flow_id,
+                task=obj,
+                name=obj.name,
+                status=str(FlowTaskStatus(added[0])),
+                message=obj.message or "",
+            )
+        )
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of CERN Document Server.
+# Copyright (C) 2026 CERN.
+#
+# CERN Document Server is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# CERN Document Server is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CERN Document Server; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Timing report of the flows tasks."""
+
+import math
+import uuid
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from invenio_db import db
+from invenio_files_rest.models import ObjectVersionTag
+
+from .models import FlowMetadata, FlowTaskMetadata, FlowTaskStatus
+
+PERCENTILES = (50, 90, 99)
+
+CRITICAL_PATH_TOLERANCE = timedelta(seconds=1)
+"""Delay between a task finishing and the status update of its successor."""
+
+TaskTiming = namedtuple(
+    "TaskTiming",
+    [
+        "flow_id",
+        "name",
+        "stage",
+        "status",
+        "queued",
+        "started",
+        "finished",
+        "bytes_processed",
+        "duration",
+    ],
+)
+"""Timing of a flow task, ``duration`` is the one of the master video."""
+
+
+def percentile(values, percent):
+    """Get the nearest-rank percentile of a list of values."""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(1, int(math.ceil(percent / 100.0 * len(values))))
+    return values[rank - 1]
+
+
+def _seconds(delta):
+    """Convert a timedelta to seconds, never negative."""
+    return max(delta.total_seconds(), 0.0)
+
+
+def get_master_durations(version_ids, batch_size=500):
+    """Get the duration of the master videos, by version id."""
+    version_ids = [uuid.UUID(id_) for id_ in version_ids if id_]
+    durations = {}
+    for i in range(0, len(version_ids), batch_size):
+        tags = db.session.query(
+            ObjectVersionTag.version_id, ObjectVersionTag.value
+        ).filter(
+            ObjectVersionTag.version_id.in_(version_ids[i : i + batch_size]),
+            ObjectVersionTag.key == "duration",
+        )
+        for version_id, value in tags:
+            try:
+                durations[str(version_id)] = float(value)
+            except ValueError:
+                pass
+    return durations
+
+
+def get_task_timings(from_date=None, to_date=None):
+    """Get the timing of the finished tasks of the flows in a date range."""
+    query = (
+        db.session.query(
+            FlowTaskMetadata.flow_id,
+            FlowTaskMetadata.name,
+            FlowTaskMetadata.preset_quality,
+            FlowTaskMetadata.status,
+            FlowTaskMetadata.queued,
+            FlowTaskMetadata.started,
+            FlowTaskMetadata.finished,
+            FlowTaskMetadata.bytes_processed,
+            FlowMetadata.payload["version_id"].as_string(),
+        )
+        .join(FlowMetadata, FlowTaskMetadata.flow_id == FlowMetadata.id)
+        .filter(
+            FlowTaskMetadata.started.isnot(None),
+            FlowTaskMetadata.finished.isnot(None),
+        )
+    )
+    if from_date:
+        query = query.filter(FlowMetadata.created >= from_date)
+    if to_date:
+        query = query.filter(FlowMetadata.created <= to_date)
+    rows = query.all()
+
+    durations = get_master_durations({row[-1] for row in rows})
+    return [
+        TaskTiming(
+            flow_id=flow_id,
+            name=name,
+            stage="{0}:{1}".format(name, quality) if quality else name,
+            status=FlowTaskStatus(status),
+            queued=queued or started,
+            started=started,
+            finished=finished,
+            bytes_processed=bytes_processed,
+            duration=durations.get(version_id),
+        )
+        for (
+            flow_id,
+            name,
+            quality,
+            status,
+            queued,
+            started,
+            finished,
+            bytes_processed,
+            version_id,
+        ) in rows
+    ]
+
+
+def critical_path(tasks):
+    """Get the tasks which determined when a flow finished, in order.
+
+    Starting from the last task to finish, the predecessor of each task is
+    the task of another step which finished last before it started.
+    """
+    if not tasks:
+        return []
+    path = [max(tasks, key=lambda t: t.finished)]
+    while True:
+        current = path[-1]
+        candidates = [
+            t
+            for t in tasks
+            if t.name != current.name
+            and t.started < current.started
+            and t.finished <= current.started + CRITICAL_PATH_TOLERANCE
+        ]
+        if not candidates:
+            return list(reversed(path))
+        path.append(max(candidates, key=lambda t: t.finished))
+
+
+def _throughput(tasks):
+    """Get the MB/s and the realtime factor of tasks."""
+    processed = [t for t in tasks if t.bytes_processed]
+    with_duration = [t for t in tasks if t.duration]
+    mb_per_second = realtime_factor = None
+    processed_time = sum(_seconds(t.finished - t.started) for t in processed)
+    if processed_time:
+        mb_per_second = (
+            sum(t.bytes_processed for t in processed) / 1e6 / processed_time
+        )
+    duration_time = sum(_seconds(t.finished - t.started) for t in with_duration)
+    if duration_time:
+        realtime_factor = sum(t.duration for t in with_duration) / duration_time
+    return mb_per_second, realtime_factor
+
+
+def build_report(timings):
+    """Build the timing report of the tasks.
+
+    :param timings: list of ``TaskTiming``.
+    :returns: a dictionary with, for each stage, the percentiles of the queue
+        wait and run times and the throughput, how much each stage counts
+        in the critical path of the flows, and the flows total time.
+    """
+    by_stage = defaultdict(list)
+    by_flow = defaultdict(list)
+    failures = defaultdict(int)
+    for timing in timings:
+        if timing.status == FlowTaskStatus.SUCCESS:
+            by_stage[timing.stage].append(timing)
+        else:
+            failures[timing.stage] += 1
+        by_flow[timing.flow_id].append(timing)
+
+    stages = {}
+    for stage in set(by_stage) | set(failures):
+        tasks = by_stage[stage]
+        wait = [_seconds(t.started - t.queued) for t in tasks]
+        run = [_seconds(t.finished - t.started) for t in tasks]
+        mb_per_second, realtime_factor = _throughput(tasks)
+        stages[stage] = dict(
+            count=len(tasks),
+            failures=failures[stage],
+            wait={p: percentile(wait, p) for p in PERCENTILES},
+            run={p: percentile(run, p) for p in PERCENTILES},
+            mb_per_second=mb_per_second,
+            realtime_factor=realtime_factor,
+        )
+
+    critical = defaultdict(lambda: dict(flows=0, seconds=0.0))
+    totals = []
+    realtime_factors = []
+    for tasks in by_flow.values():
+        if any(t.status != FlowTaskStatus.SUCCESS for t in tasks):
+            continue
+        path = critical_path(tasks)
+        previous_end = path[0].queued
+        for task in path:
+            critical[task.stage]["flows"] += 1
+            critical[task.stage]["seconds"] += _seconds(task.finished - previous_end)
+            previous_end = task.finished
+        total = _seconds(path[-1].finished - path[0].queued)
+        totals.append(total)
+        if path[-1].duration and total:
+            realtime_factors.append(path[-1].duration / total)
+
+    critical_seconds = sum(c["seconds"] for c in critical.values())
+    for values in critical.values():
+        values["share"] = (
+            values["seconds"] / critical_seconds if critical_seconds else None
+        )
+
+    return dict(
+        stages=stages,
+        critical_path=dict(critical),
+        flows=dict(
+            count=len(totals),
+            total={p: percentile(totals, p) for p in PERCENTILES},
+            realtime_factor=percentile(realtime_factors, 50),
+        ),
+    )
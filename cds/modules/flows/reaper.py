@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of CERN Document Server.
+# Copyright (C) 2026 CERN.
+#
+# CERN Document Server is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# CERN Document Server is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CERN Document Server; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Reaper of the flow tasks stuck after their worker died."""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from celery import current_app as celery_app
+from flask import current_app
+from invenio_db import db
+from invenio_pidstore.errors import PIDDeletedError
+from sqlalchemy import func, or_
+
+from ..opencast.tasks import get_opencast_events
+from .api import FlowService
+from .deposit import index_deposit_project
+from .models import FlowTaskEvent, FlowTaskMetadata, FlowTaskStatus
+from .profile import get_master_durations
+from .tasks import DownloadTask, ExtractMetadataTask, TranscodeVideoTask
+
+REAPER_MESSAGE = "Stuck task reaped"
+"""Prefix of the status message of the tasks set by the reaper."""
+
+OPENCAST_RUNNING_STATES = ("INSTANTIATED", "RUNNING", "PAUSED")
+"""OpenCast processing states of an event which may still complete."""
+
+NOT_RESTARTABLE_TASKS = (DownloadTask.name, ExtractMetadataTask.name)
+"""Tasks which, restarted alone, would not start the following ones."""
+
+
+def get_sla(name, duration=None):
+    """Get the time after which a started task is considered stuck.
+
+    :param duration: duration in seconds of the processed video.
+    """
+    base, per_second = current_app.config["CDS_FLOWS_REAPER_SLA"].get(
+        name, current_app.config["CDS_FLOWS_REAPER_DEFAULT_SLA"]
+    )
+    return timedelta(seconds=base + per_second * (duration or 0))
+
+
+def get_overdue_tasks(now=None):
+    """Get the started tasks which were not updated within their SLA."""
+    now = now or datetime.utcnow()
+    min_sla = min(
+        get_sla(name)
+        for name in list(current_app.config["CDS_FLOWS_REAPER_SLA"]) + [None]
+    )
+    tasks = FlowTaskMetadata.query.filter(
+        FlowTaskMetadata.status == FlowTaskStatus.STARTED,
+        FlowTaskMetadata.updated < now - min_sla,
+    ).all()
+    durations = get_master_durations(
+        {task.flow.payload.get("version_id") for task in tasks}
+    )
+
+    def is_overdue(task):
+        duration = durations.get(task.flow.payload.get("version_id"))
+        return task.updated < now - get_sla(task.name, duration)
+
+    return [task for task in tasks if is_overdue(task)]
+
+
+def get_stale_pending_tasks(now=None, failed_flow_ids=None):
+    """Get the pending tasks which will never start.
+
+    They are the tasks, in flows without started tasks, not updated for
+    ``CDS_FLOWS_REAPER_PENDING_SLA`` or of the given failed flows.
+    """
+    now = now or datetime.utcnow()
+    sla = timedelta(seconds=current_app.config["CDS_FLOWS_REAPER_PENDING_SLA"])
+    started_flows = db.session.query(FlowTaskMetadata.flow_id).filter(
+        FlowTaskMetadata.status == FlowTaskStatus.STARTED
+    )
+    stale = FlowTaskMetadata.updated < now - sla
+    if failed_flow_ids:
+        stale = or_(stale, FlowTaskMetadata.flow_id.in_(failed_flow_ids))
+    return FlowTaskMetadata.query.filter(
+        FlowTaskMetadata.status == FlowTaskStatus.PENDING,
+        stale,
+        ~FlowTaskMetadata.flow_id.in_(started_flows),
+    ).all()
+
+
+def get_celery_task_ids():
+    """Get the ids of the tasks running or waiting on the Celery workers.
+
+    :returns: a set of ids, ``None`` if no worker replied.
+    """
+    inspect = celery_app.control.inspect(
+        timeout=current_app.config["CDS_FLOWS_REAPER_INSPECT_TIMEOUT"]
+    )
+    ids = set()
+    for method in (inspect.active, inspect.reserved, inspect.scheduled):
+        replies = method()
+        if replies is None:
+            return None
+        for requests in replies.values():
+            for request in requests:
+                # scheduled tasks are wrapped with their ETA
+                ids.add(request.get("request", request)["id"])
+    return ids
+
+
+def count_restarts(task_ids):
+    """Count how many times the reaper stopped each task."""
+    if not task_ids:
+        return {}
+    query = (
+        db.session.query(FlowTaskEvent.task_id, func.count(FlowTaskEvent.id))
+        .filter(
+            FlowTaskEvent.task_id.in_(task_ids),
+            FlowTaskEvent.status == str(FlowTaskStatus.FAILURE),
+            FlowTaskEvent.message.startswith(REAPER_MESSAGE),
+        )
+        .group_by(FlowTaskEvent.task_id)
+    )
+    return dict(query)
+
+
+def _verify_transcoding(tasks):
+    """Check the stuck transcoding tasks on OpenCast.
+
+    :returns: a list of ``(task, reason, restartable)`` for the tasks to stop.
+    """
+    grouped = defaultdict(list)
+    for task in tasks:
+        grouped[task.opencast_event_id].append(task)
+    # the tasks of the events not found are failed while fetching them
+    events = get_opencast_events(list(grouped.values()))
+
+    stuck = []
+    for event_id, event_tasks in grouped.items():
+        event = events.get(event_id)
+        if event is None:
+            continue
+        state = event["processing_state"]
+        if state == "SUCCEEDED" and event["subformats"]:
+            # the subformats are downloaded by `check_transcoding_status`
+            continue
+        if state in OPENCAST_RUNNING_STATES:
+            # the tasks are kept started, so that `check_transcoding_status`
+            # still gets the subformats, instead of transcoding them twice
+            current_app.logger.warning(
+                "OpenCast event %s is %s past the SLA of %s tasks.",
+                event_id,
+                state,
+                len(event_tasks),
+            )
+            continue
+        reason = "OpenCast event {0} is {1}".format(event_id, state)
+        stuck.extend((task, reason, True) for task in event_tasks)
+    return stuck
+
+
+def _verify_celery(tasks):
+    """Check the stuck tasks on the Celery workers.
+
+    :returns: a list of ``(task, reason, restartable)`` for the tasks to stop,
+        empty if the workers could not be inspected.
+    """
+    running = get_celery_task_ids()
+    if running is None:
+        current_app.logger.warning(
+            "No Celery worker replied, cannot verify %s stuck tasks.", len(tasks)
+        )
+        return []
+    return [
+        (task, "worker lost", task.name not in NOT_RESTARTABLE_TASKS)
+        for task in tasks
+        if task.payload.get("celery_task_id") not in running
+    ]
+
+
+def _set_status(tasks, status, message_by_task):
+    """Update the status of tasks in bulk, by flow, name and message."""
+    groups = defaultdict(list)
+    for task in tasks:
+        groups[(task.flow_id, task.name, message_by_task[task.id])].append(task.id)
+    for (flow_id, name, message), task_ids in groups.items():
+        FlowTaskMetadata.set_status(flow_id, name, task_ids, status, message)
+
+
+def _reindex(deposit_ids):
+    """Reindex the projects of the given video deposits."""
+    for deposit_id in deposit_ids:
+        try:
+            index_deposit_project(deposit_id)
+        except PIDDeletedError:
+            pass
+
+
+def reap_stuck_tasks(now=None):
+    """Fail or restart the stuck tasks and cancel the never started ones.
+
+    A started task not updated within its SLA is stuck if Celery is not
+    running it anymore or, for the transcoding, if its OpenCast event failed
+    or completed without subformats. The transcoding still running on
+    OpenCast is left started. Stuck tasks are set to failed, then restarted
+    up to ``CDS_FLOWS_REAPER_MAX_RESTARTS`` times.
+
+    :returns: the number of tasks checked, failed, restarted and cancelled.
+    """
+    counts = dict(checked=0, failed=0, restarted=0, cancelled=0)
+
+    overdue = get_overdue_tasks(now)
+    counts["checked"] = len(overdue)
+    transcoding = [
+        task
+        for task in overdue
+        if task.name == TranscodeVideoTask.name and task.opencast_event_id
+    ]
+    others = [task for task in overdue if task not in transcoding]
+    stuck = []
+    if transcoding:
+        stuck.extend(_verify_transcoding(transcoding))
+    if others:
+        stuck.extend(_verify_celery(others))
+
+    messages = {
+        task.id: "{0}: {1}.".format(REAPER_MESSAGE, reason)
+        for task, reason, _ in stuck
+    }
+    _set_status(
+        [task for task, _, _ in stuck], FlowTaskStatus.FAILURE, messages
+    )
+    db.session.commit()
+
+    max_restarts = current_app.config["CDS_FLOWS_REAPER_MAX_RESTARTS"]
+    restarts = count_restarts([task.id for task, _, _ in stuck])
+    to_reindex = set()
+    failed_flow_ids = set()
+    for task, _, restartable in stuck:
+        if restartable and restarts.get(task.id, 0) <= max_restarts:
+            FlowService(task.flow).restart_task(task.id)
+            counts["restarted"] += 1
+        else:
+            counts["failed"] += 1
+            failed_flow_ids.add(task.flow_id)
+            to_reindex.add(task.flow.deposit_id)
+
+    pending = get_stale_pending_tasks(now, failed_flow_ids)
+    _set_status(
+        pending,
+        FlowTaskStatus.CANCELLED,
+        {task.id: "{0}: never started.".format(REAPER_MESSAGE) for task in pending},
+    )
+    db.session.commit()
+    counts["cancelled"] = len(pending)
+    to_reindex.update(task.flow.deposit_id for task in pending)
+
+    _reindex(to_reindex)
+    return counts
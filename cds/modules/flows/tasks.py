@@ -27,15 +27,18 @@ import json
 import os
 import shutil
 import signal
+import socket
 import tempfile
+from contextlib import nullcontext
+from datetime import datetime
 from io import BytesIO
 
 import jsonpatch
-import requests
 from celery import Task as _Task
 from celery import current_app as celery_app
 from celery import shared_task
 from celery.result import AsyncResult
+from celery.signals import before_task_publish
 from celery.utils.log import get_task_logger
 from flask import current_app
 
@@ -65,15 +68,31 @@ from ..opencast.error import RequestError
 from ..opencast.utils import get_qualities
 from ..records.utils import (
     to_string,
-    parse_video_chapters,
+    get_video_chapters,
     get_existing_chapter_frame_timestamps,
 )
 from ..xrootd.utils import file_opener_xrootd
 from .deposit import index_deposit_project
-from .files import dispose_object_version, move_file_into_local
+from .download import RangedDownload, verify_checksum
+from .files import (
+    dispose_object_version,
+    move_file_into_local,
+    relock_bucket,
+    unlock_bucket,
+)
 
 logger = get_task_logger(__name__)
 
+QUEUED_AT_HEADER = "cds_queued_at"
+"""Message header with the time when a task was sent to the queue."""
+
+
+@before_task_publish.connect
+def set_queued_at_header(headers=None, **kwargs):
+    """Record when a task is sent, to measure how long it waited."""
+    if headers is not None:
+        headers.setdefault(QUEUED_AT_HEADER, datetime.utcnow().isoformat())
+
 
 # *****************************************************************************
 # Moved here from flask-iif as it was removed due to breaking the IIIF worfklow
@@ -124,36 +143,83 @@ def resize_gif(image, size, resample):
 class CeleryTask(_Task):
     """The task class which is used as the minimal unit of work.
 
-    This class is a wrapper around ``celery.Task``
+    This class is a wrapper around ``celery.Task``. A single Flask app
+    context, and so a single database session, is used for the whole task
+    lifecycle: run, success or failure handling and reindexing.
     """
 
+    _app_context = None
+    _flow_task_ids = None
+    started_at = None
+    queued_at = None
+
+    def before_start(self, task_id, args, kwargs):
+        """Push the app context used until the task returns."""
+        self._flow_task_ids = None
+        self.started_at = datetime.utcnow()
+        queued_at = self.request.get(QUEUED_AT_HEADER)
+        self.queued_at = (
+            datetime.fromisoformat(queued_at) if queued_at else self.started_at
+        )
+        self._app_context = celery_app.flask_app.app_context()
+        self._app_context.push()
+
+    def after_return(self, status, retval, task_id, args, kwargs, einfo):
+        """Pop the app context pushed when the task started."""
+        app_context, self._app_context = self._app_context, None
+        if app_context is not None:
+            app_context.pop()
+
+    def task_app_context(self):
+        """Get the app context of the task, if not already pushed."""
+        if self._app_context is not None:
+            return nullcontext()
+        return celery_app.flask_app.app_context()
+
+    def get_flow_task_ids(self):
+        """Get the ids of the Flow TaskMetadata handled by the task."""
+        if self._flow_task_ids is None:
+            self._flow_task_ids = [
+                id_
+                for (id_,) in db.session.query(FlowTaskMetadata.id).filter_by(
+                    flow_id=self.flow_id, name=self.name
+                )
+            ]
+        return self._flow_task_ids
+
     def on_failure(self, exc, task_id, args, kwargs, einfo):
         """Update task status on database."""
-        with celery_app.flask_app.app_context():
-            for flow_task_metadata in FlowTaskMetadata.get_all_by_flow_task_name(
-                self.flow_id, self.name
-            ):
-                flow_task_metadata.status = FlowTaskStatus.FAILURE
-                flow_task_metadata.message = str(einfo)
+        with self.task_app_context():
+            # discard what the task did not commit
+            db.session.rollback()
+            FlowTaskMetadata.set_status(
+                self.flow_id,
+                self.name,
+                self.get_flow_task_ids(),
+                FlowTaskStatus.FAILURE,
+                message=str(einfo),
+            )
             db.session.commit()
 
-        super(CeleryTask, self).on_failure(exc, task_id, args, kwargs, einfo)
+            super(CeleryTask, self).on_failure(exc, task_id, args, kwargs, einfo)
 
-        self._reindex_video_project()
+            self._reindex_video_project()
 
     def on_success(self, retval, task_id, args, kwargs):
         """Update tasks status on database."""
-        with celery_app.flask_app.app_context():
-            for flow_task_metadata in FlowTaskMetadata.get_all_by_flow_task_name(
-                self.flow_id, self.name
-            ):
-                flow_task_metadata.status = FlowTaskStatus.SUCCESS
-                flow_task_metadata.message = "{}".format(retval)
+        with self.task_app_context():
+            FlowTaskMetadata.set_status(
+                self.flow_id,
+                self.name,
+                self.get_flow_task_ids(),
+                FlowTaskStatus.SUCCESS,
+                message="{}".format(retval),
+            )
             db.session.commit()
 
-        super(CeleryTask, self).on_success(retval, task_id, args, kwargs)
+            super(CeleryTask, self).on_success(retval, task_id, args, kwargs)
 
-        self._reindex_video_project()
+            self._reindex_video_project()
 
     @staticmethod
     def stop_task(celery_task_id):
@@ -169,6 +235,7 @@ class AVCTask(CeleryTask):
     abstract = True
 
     _base_payload = {}
+    master_tags = {}
 
     def _pop_call_arguments(self, arg_list, **kwargs):
         for name in arg_list:
@@ -179,7 +246,7 @@ class AVCTask(CeleryTask):
         """Extract keyword arguments."""
         arg_list = ["flow_id", "deposit_id", "key"]
         kwargs = self._pop_call_arguments(arg_list, **kwargs)
-        with self.app.flask_app.app_context():
+        with self.task_app_context():
             if kwargs.get("_clean", False):
                 self.clean(*args, **kwargs)
 
@@ -209,7 +276,7 @@ class AVCTask(CeleryTask):
 
     def on_failure(self, exc, task_id, args, kwargs, einfo):
         """When an error occurs, attach useful information to the state."""
-        with celery_app.flask_app.app_context():
+        with self.task_app_context():
             exception = self._meta_exception_envelope(exc=exc)
             self.log("Failure: {0}".format(exception))
 
@@ -219,7 +286,7 @@ class AVCTask(CeleryTask):
 
     def on_success(self, exc, task_id, args, kwargs):
         """When end correctly, attach useful information to the state."""
-        with celery_app.flask_app.app_context():
+        with self.task_app_context():
             meta = dict(message=str(exc), payload=self._base_payload)
             self.log("Success: {0}".format(meta))
 
@@ -229,7 +296,7 @@ class AVCTask(CeleryTask):
 
     def _reindex_video_project(self):
         """Reindex video and project."""
-        with celery_app.flask_app.app_context():
+        with self.task_app_context():
             # Safety check in case base payload is not set yet
             if (
                 not hasattr(self, "_base_payload")
@@ -263,13 +330,17 @@ class AVCTask(CeleryTask):
         signal.signal(signal.SIGTERM, _handler)
 
     def set_base_payload(self):
-        """Set default base payload."""
+        """Set default base payload.
+
+        The master file tags are not stored in the tasks payload, which only
+        reference the master file by ``master_id``.
+        """
+        self.master_tags = self.object_version.get_tags()
         self._base_payload = dict(
             deposit_id=self.deposit_id,
             flow_id=self.flow_id,
             name=self.name,
             key=self.key,
-            tags=self.object_version.get_tags(),
             master_id=self.object_version_id,
         )
 
@@ -278,11 +349,9 @@ class AVCTask(CeleryTask):
         _payload = dict()
 
         # base payload EXAMPLE
-        # {'deposit_id': <value>, 'tags':
-        #   {u'context_type': u'master', u'media_type': u'video',
-        #    u'preview': u'true', u'flow_id': <value>},
+        # {'deposit_id': <value>,
         # 'name': <celery task name>,
-        # 'master_version_id': <value>,
+        # 'master_id': <value>,
         # 'flow_id': <value>,
         # 'key': <value>}
         _payload.update(self._base_payload)
@@ -336,8 +405,19 @@ class AVCTask(CeleryTask):
         else:
             assert len(flow_tasks_metadata) == 1
             flow_task_metadata = flow_tasks_metadata[0]
+        # the status is updated by id when the task returns
+        self._flow_task_ids = [flow_task_metadata.id]
+        self.set_flow_task_timing(flow_task_metadata)
         return flow_task_metadata
 
+    def set_flow_task_timing(self, flow_task_metadata):
+        """Record when the task was queued and started, and where it runs."""
+        flow_task_metadata.queued = self.queued_at
+        flow_task_metadata.started = self.started_at or datetime.utcnow()
+        flow_task_metadata.worker = socket.gethostname()
+        file_ = self.object_version.file
+        flow_task_metadata.bytes_processed = file_.size if file_ else None
+
 
 class DownloadTask(AVCTask):
     """Download task."""
@@ -351,11 +431,16 @@ class DownloadTask(AVCTask):
         if version_id:
             dispose_object_version(version_id)
 
-    def run(self, uri, **kwargs):
+    def run(self, uri, checksum=None, **kwargs):
         """Download file from a URL.
 
+        The file is downloaded in the temporary folder first, in parallel
+        parts when the server supports range requests. A download of the
+        same object version interrupted before resumes where it stopped.
+
         :param self: reference to instance of task base class
         :param uri: URL of the file to download.
+        :param checksum: optional checksum of the file, e.g. ``md5:...``.
         """
         self._base_payload.update(key=self.object_version.key)
 
@@ -369,29 +454,45 @@ class DownloadTask(AVCTask):
 
         self.log("Started task {0}".format(kwargs["task_id"]))
 
-        # Make HTTP request
-        response = requests.get(uri, stream=True)
-
-        if "Content-Length" in response.headers:
-            headers_size = int(response.headers.get("Content-Length"))
-        else:
-            headers_size = None
-
-        def progress_updater(size, total):
+        def progress_updater(downloaded, size):
             """Progress reporter."""
-            size = size or headers_size
-            if size is None:
-                err = 'Cannot locate "Content-Length" header.'
-                flow_task_metadata.status = FlowTaskStatus.FAILURE
-                flow_task_metadata.message = err
-                db.session.commit()
-                raise RuntimeError(err)
+            progress = dict(downloaded=downloaded, size=size)
+            if size:
+                progress["percentage"] = downloaded * 100 / size
+            # JSONb cols needs to be assigned (not updated) to be persisted
+            flow_task_metadata.payload = dict(flow_task_metadata.payload, **progress)
+            flow_task_metadata.message = "Downloaded {0} of {1} bytes".format(
+                downloaded, size or "unknown"
+            )
+            db.session.commit()
 
-        self.object_version.set_contents(
-            response.raw, progress_callback=progress_updater, size=headers_size
+        tmp_folder = current_app.config["CDS_FILES_TMP_FOLDER"]
+        if not os.path.exists(tmp_folder):
+            os.makedirs(tmp_folder)
+        download = RangedDownload(
+            uri,
+            os.path.join(tmp_folder, "download-{0}".format(self.object_version_id)),
+            connections=current_app.config["CDS_FLOWS_DOWNLOAD_CONNECTIONS"],
+            part_min_size=current_app.config["CDS_FLOWS_DOWNLOAD_PART_MIN_SIZE"],
+            retries=current_app.config["CDS_FLOWS_DOWNLOAD_RETRIES"],
+            timeout=current_app.config["CDS_FLOWS_DOWNLOAD_TIMEOUT"],
+        )
+        path = download.download(
+            progress_callback=progress_updater,
+            progress_interval=current_app.config[
+                "CDS_FLOWS_DOWNLOAD_PROGRESS_INTERVAL"
+            ],
         )
+        try:
+            if checksum:
+                verify_checksum(path, checksum)
+            with open(path, "rb") as stream:
+                self.object_version.set_contents(stream, size=download.size)
+            flow_task_metadata.bytes_processed = download.size
+            db.session.commit()
+        finally:
+            os.remove(path)
 
-        db.session.commit()
         self.log("Finished task {0}".format(kwargs["task_id"]))
 
 
@@ -508,17 +609,6 @@ class ExtractMetadataTask(AVCTask):
         validator = "cds.modules.records.validators.PartialDraft4Validator"
         update_record.s(recid=recid, patch=patch, validator=validator).apply()
 
-        # update Celery task payload with tags
-        self._base_payload.update(
-            meta=dict(
-                payload=dict(
-                    tags=tags,
-                    extracted_metadata=extracted_dict,
-                ),
-                message="Attached video metadata",
-            )
-        )
-
         self.log("Finished task {0}".format(kwargs["task_id"]))
         return json.dumps(extracted_dict)
 
@@ -581,7 +671,7 @@ class ExtractFramesTask(AVCTask):
 
         # Calculate time positions
         options = self._time_position(
-            duration=self._base_payload["tags"]["duration"],
+            duration=self.master_tags["duration"],
             frames_start=frames_start,
             frames_end=frames_end,
             frames_gap=frames_gap,
@@ -598,46 +688,44 @@ class ExtractFramesTask(AVCTask):
             )
             self.log(meta["message"])
 
-        bucket_was_locked = False
-        if self.object_version.bucket.locked:
-            # If record was published we need to unlock the bucket
-            bucket_was_locked = True
-            self.object_version.bucket.locked = False
-
+        # If record was published we need to unlock the bucket, while the
+        # transcoding of the same flow might be adding files to it as well
+        bucket_id = str(self.object_version.bucket_id)
+        unlock_bucket(bucket_id, kwargs["task_id"])
         try:
-            frames = self._create_frames(
-                frames=self._create_tmp_frames(
+            try:
+                frames = self._create_frames(
+                    frames=self._create_tmp_frames(
+                        object_=self.object_version,
+                        output_dir=output_folder,
+                        progress_updater=progress_updater,
+                        **options,
+                    ),
                     object_=self.object_version,
-                    output_dir=output_folder,
-                    progress_updater=progress_updater,
                     **options,
-                ),
-                object_=self.object_version,
-                **options,
+                )
+            except Exception:
+                db.session.rollback()
+                shutil.rmtree(output_folder, ignore_errors=True)
+                self.clean(version_id=self.object_version_id)
+                raise
+
+            total_frames = len(frames)
+
+            # Generate GIF images
+            self._create_gif(
+                bucket=bucket_id,
+                frames=frames,
+                output_dir=output_folder,
+                master_id=self.object_version_id,
             )
-        except Exception:
-            db.session.rollback()
-            shutil.rmtree(output_folder, ignore_errors=True)
-            self.clean(version_id=self.object_version_id)
-            raise
-
-        total_frames = len(frames)
 
-        # Generate GIF images
-        self._create_gif(
-            bucket=str(self.object_version.bucket.id),
-            frames=frames,
-            output_dir=output_folder,
-            master_id=self.object_version_id,
-        )
-
-        if bucket_was_locked:
+            # Cleanup
+            shutil.rmtree(output_folder)
+            db.session.commit()
+        finally:
             # Lock the bucket again
-            self.object_version.bucket.locked = True
-
-        # Cleanup
-        shutil.rmtree(output_folder)
-        db.session.commit()
+            relock_bucket(bucket_id, kwargs["task_id"])
 
         self.log("Finished task {0}".format(kwargs["task_id"]))
         return "Created {0} frames.".format(total_frames)
@@ -835,22 +923,18 @@ class ExtractChapterFramesTask(AVCTask):
             self.log(meta["message"])
 
         try:
-            # Get the deposit to access the description
+            # Get the deposit to access the chapters
             from cds.modules.deposit.api import deposit_video_resolver
 
             db.session.refresh(self.object_version)
             deposit_video = deposit_video_resolver(self.deposit_id)
-            description = deposit_video.get("description", "")
-
-            self.log("Found description with {0} characters".format(len(description)))
-
-            # Parse chapters from description
-            chapters = parse_video_chapters(description)
+            # Chapters parsed from the description when publishing
+            chapters = get_video_chapters(deposit_video)
 
             self.log("Found {0} chapters in description".format(len(chapters)))
 
             # Get video duration from metadata
-            duration = float(self._base_payload.get("tags", {}).get("duration", 0))
+            duration = float(self.master_tags.get("duration", 0))
 
             if duration == 0:
                 raise ValueError("Video duration is 0 - cannot extract frames")
@@ -1064,7 +1148,7 @@ class TranscodeVideoTask(AVCTask):
     def _get_flow_task_by_quality(cls, flow_tasks, quality):
         """Get flow task by checking the preset quality field."""
         flow_task_metadata = [
-            task for task in flow_tasks if task.payload["preset_quality"] == quality
+            task for task in flow_tasks if task.preset_quality == quality
         ]
         return flow_task_metadata[0] if len(flow_task_metadata) == 1 else None
 
@@ -1096,8 +1180,11 @@ class TranscodeVideoTask(AVCTask):
         for flow_task_metadata in flow_tasks:
             flow_task_metadata.status = status
             flow_task_metadata.message = message
+            if status == FlowTaskStatus.STARTED:
+                # the upload to OpenCast is part of the transcoding time
+                self.set_flow_task_timing(flow_task_metadata)
 
-            quality = flow_task_metadata.payload["preset_quality"]
+            quality = flow_task_metadata.preset_quality
 
             new_payload = dict(flow_task_metadata.payload)
             new_payload.update(
@@ -1165,7 +1252,7 @@ class TranscodeVideoTask(AVCTask):
             t.payload = new_payload
 
             # cancel not transcodable qualities
-            preset_quality = t.payload["preset_quality"]
+            preset_quality = t.preset_quality
             if preset_quality not in qualities:
                 t.status = FlowTaskStatus.CANCELLED
                 t.message = "The quality {0} cannot be transcoded.".format(
@@ -1222,7 +1309,7 @@ class TranscodeVideoTask(AVCTask):
         try:
             self.log("Starting video upload to OpenCast")
             opencast = OpenCast(deposit_video, self.object_version)
-            qualities_to_transcode = [t.payload["preset_quality"] for t in flow_tasks]
+            qualities_to_transcode = [t.preset_quality for t in flow_tasks]
             opencast_event_id = opencast.run(qualities_to_transcode)
 
             # store the OpenCast event id in the tags
@@ -24,7 +24,7 @@
 
 import json
 
-from flask import Blueprint
+from flask import Blueprint, jsonify, request
 from flask.views import MethodView
 from flask_restful import abort
 from invenio_db import db
@@ -33,13 +33,14 @@ from invenio_pidstore.errors import PIDDoesNotExistError
 
 from cds.modules.flows.api import FlowService
 from cds.modules.flows.decorators import (
+    conditional_flow,
     error_handler,
     need_permission,
     pass_flow,
     pass_user_id,
 )
 from cds.modules.flows.loaders import extract_payload
-from cds.modules.flows.models import FlowMetadata
+from cds.modules.flows.models import FlowMetadata, FlowTaskEvent
 from cds.modules.flows.serializers import make_response, serialize_flow
 
 blueprint = Blueprint("cds_flows", __name__)
@@ -80,12 +81,38 @@ class FlowFeedbackResource(MethodView):
     @pass_user_id
     @pass_flow
     @need_permission("read")
+    @conditional_flow
     def get(self, user_id, flow):
         """Handle GET request: get more flow information."""
         code, status = serialize_flow(flow)
         return json.dumps(status), code
 
 
+class FlowEventsResource(MethodView):
+    """Flow tasks status changes."""
+
+    @require_api_auth()
+    @error_handler
+    @pass_user_id
+    @pass_flow
+    @need_permission("read")
+    def get(self, user_id, flow):
+        """Handle GET request: get the tasks status changes.
+
+        Only the changes after the ``last_event_id`` query argument are
+        returned, so that the clients polling the flow receive each change
+        once.
+        """
+        last_event_id = request.args.get("last_event_id")
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            abort(400)
+
+        events = FlowTaskEvent.get_by_flow(flow.id, after=last_event_id)
+        return jsonify([event.to_dict() for event in events])
+
+
 class FlowListResource(MethodView):
     """List view of Flow resource."""
 
@@ -114,6 +141,7 @@ class FlowListResource(MethodView):
                 key=data["key"],
                 bucket_id=data["bucket_id"],
                 uri=data.get("uri"),
+                checksum=data.get("checksum"),
                 deposit_id=data["deposit_id"],
             ),
         )
@@ -135,6 +163,7 @@ class FlowResource(MethodView):
     @pass_user_id
     @pass_flow
     @need_permission("read")
+    @conditional_flow
     def get(self, user_id, flow):
         """Handle GET request - get flow status."""
         return make_response(flow)
@@ -153,6 +182,7 @@ class FlowResource(MethodView):
 
 task_item = TaskResource.as_view("task_item")
 flow_feedback_item = FlowFeedbackResource.as_view("flow_feedback_item")
+flow_events_item = FlowEventsResource.as_view("flow_events_item")
 
 flow_list = FlowListResource.as_view("flow_list")
 flow_item = FlowResource.as_view("flow_item")
@@ -175,3 +205,8 @@ blueprint.add_url_rule(
     "/flows/<string:flow_id>/feedback",
     view_func=flow_feedback_item,
 )
+
+blueprint.add_url_rule(
+    "/flows/<string:flow_id>/events",
+    view_func=flow_events_item,
+)
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2026 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Bulk maintenance of the videos flows."""
+
+import os
+import time
+from collections import namedtuple
+from itertools import islice
+
+from invenio_db import db
+from invenio_jsonschemas import current_jsonschemas
+from invenio_pidstore.errors import PIDDoesNotExistError, ResolverError
+from invenio_records.models import RecordMetadata
+from invenio_search import RecordsSearch
+
+from cds.modules.deposit.api import (
+    Video,
+    deposit_video_resolver,
+    deposit_videos_resolver,
+    record_videos_resolver,
+)
+
+from ..flows.deposit import index_deposit_project
+from ..flows.models import FlowMetadata
+from ..flows.tasks import ExtractFramesTask
+from .subformats import (
+    _get_master_video,
+    get_qualities_to_transcode,
+    transcoding_signature,
+)
+
+WorkItem = namedtuple(
+    "WorkItem", ["deposit_id", "flow", "qualities", "duration", "error"]
+)
+"""A video to process: ``qualities`` is ``None`` for frames extraction."""
+
+
+def _batches(iterable, size):
+    """Split an iterable in lists of ``size`` items."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def read_ids_file(ids_file):
+    """Read one id per line, skipping empty lines and comments."""
+    for line in ids_file:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+def deposit_ids_from_recids(recids, batch_size=100):
+    """Get the deposit ids of video records, resolved in batches."""
+    for batch in _batches(recids, batch_size):
+        for record in record_videos_resolver(batch):
+            yield record["_deposit"]["id"]
+
+
+def deposit_ids_from_query(query):
+    """Get the deposit ids of the published videos matching a query."""
+    search = (
+        RecordsSearch(index="records-videos-video")
+        .query("query_string", query=query)
+        .source(["_deposit.id"])
+    )
+    for hit in search.scan():
+        yield hit["_deposit"]["id"]
+
+
+def deposit_ids_from_date_range(from_date=None, to_date=None):
+    """Get the ids of the video deposits created in a date range."""
+    query = db.session.query(
+        RecordMetadata.json[("_deposit", "id")].as_string()
+    ).filter(
+        RecordMetadata.json["$schema"].as_string()
+        == current_jsonschemas.path_to_url(Video._schema)
+    )
+    if from_date:
+        query = query.filter(RecordMetadata.created >= from_date)
+    if to_date:
+        query = query.filter(RecordMetadata.created <= to_date)
+    for (deposit_id,) in query.order_by(RecordMetadata.created):
+        yield deposit_id
+
+
+def _resolve_videos(deposit_ids):
+    """Resolve the videos of a batch, with ``None`` for the missing ones."""
+    try:
+        return deposit_videos_resolver(deposit_ids)
+    except (PIDDoesNotExistError, ResolverError):
+        videos = []
+        for deposit_id in deposit_ids:
+            try:
+                videos.append(deposit_video_resolver(deposit_id))
+            except (PIDDoesNotExistError, ResolverError):
+                videos.append(None)
+        return videos
+
+
+def iter_work_plan(deposit_ids, mode, quality=None, batch_size=100):
+    """Build the work plan of a bulk run.
+
+    The deposits, their master files and flows are resolved in batches.
+
+    :param mode: ``frames`` to extract the frames again, otherwise the
+        subformats mode, see
+        :func:`cds.modules.maintenance.subformats.get_qualities_to_transcode`.
+    :returns: an iterator of ``WorkItem``.
+    """
+    for batch in _batches(deposit_ids, batch_size):
+        videos = _resolve_videos(batch)
+        flows = FlowMetadata.get_by_deposits(batch)
+        for deposit_id, video in zip(batch, videos):
+            flow = flows.get(deposit_id)
+            if video is None:
+                yield WorkItem(deposit_id, flow, [], 0, "Video not found")
+                continue
+            if flow is None:
+                yield WorkItem(deposit_id, flow, [], 0, "Flow not found")
+                continue
+            try:
+                master, width, height = _get_master_video(video)
+            except Exception as e:
+                yield WorkItem(deposit_id, flow, [], 0, str(e))
+                continue
+
+            duration = float(master["tags"].get("duration", 0))
+            if mode == "frames":
+                qualities = None
+            else:
+                qualities = get_qualities_to_transcode(
+                    master, width, height, mode, quality
+                )
+            yield WorkItem(deposit_id, flow, qualities, duration, None)
+
+
+class Checkpoint(object):
+    """File recording the deposits processed by a bulk run."""
+
+    def __init__(self, path=None):
+        """Load the deposits already processed."""
+        self.path = path
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.done = set(read_ids_file(f))
+
+    def add(self, deposit_ids):
+        """Record processed deposits."""
+        self.done.update(deposit_ids)
+        if self.path:
+            with open(self.path, "a") as f:
+                f.writelines("{0}\n".format(id_) for id_ in deposit_ids)
+
+    def __contains__(self, deposit_id):
+        """Check if a deposit was already processed."""
+        return deposit_id in self.done
+
+
+class RateLimiter(object):
+    """Limit the number of calls per second."""
+
+    def __init__(self, rate=None):
+        """Initialize the limiter, ``rate`` is in calls per second."""
+        self.interval = 1.0 / rate if rate else 0
+        self._next = time.monotonic()
+
+    def wait(self):
+        """Wait until the next call is allowed."""
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self._next:
+            time.sleep(self._next - now)
+        self._next = max(now, self._next) + self.interval
+
+
+def frames_signature(flow_metadata):
+    """Create the frames flow task and the Celery signature."""
+    payload = flow_metadata.payload
+    payload = dict(
+        deposit_id=payload["deposit_id"],
+        flow_id=payload["flow_id"],
+        key=payload["key"],
+        version_id=payload["version_id"],
+    )
+
+    ExtractFramesTask.create_flow_tasks(payload)
+    return ExtractFramesTask().s(**payload)
+
+
+def run_work_plan(items, rate=None, checkpoint=None, batch_size=100):
+    """Start the flow tasks of a work plan.
+
+    The flow tasks of a batch are created and committed together, then the
+    Celery tasks are sent at most ``rate`` per second. The batch is
+    recorded in the checkpoint once all its tasks are sent.
+
+    :returns: an iterator of ``(WorkItem, started)``.
+    """
+    checkpoint = checkpoint or Checkpoint()
+    limiter = RateLimiter(rate)
+    for batch in _batches(items, batch_size):
+        signatures = []
+        for item in batch:
+            if item.error or item.qualities == []:
+                signatures.append(None)
+            elif item.qualities is None:
+                signatures.append(frames_signature(item.flow))
+            else:
+                signatures.append(transcoding_signature(item.flow, item.qualities))
+        db.session.commit()
+
+        for item, signature in zip(batch, signatures):
+            if signature is not None:
+                limiter.wait()
+                signature.apply_async()
+                index_deposit_project(item.deposit_id)
+            yield item, signature is not None
+        checkpoint.add([item.deposit_id for item in batch])
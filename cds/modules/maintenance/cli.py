@@ -31,6 +31,15 @@ from invenio_records_files.models import RecordsBuckets
 from cds.modules.flows.deposit import index_deposit_project
 from cds.modules.flows.models import FlowMetadata
 from cds.modules.flows.tasks import ExtractFramesTask
+from cds.modules.maintenance.bulk import (
+    Checkpoint,
+    deposit_ids_from_date_range,
+    deposit_ids_from_query,
+    deposit_ids_from_recids,
+    iter_work_plan,
+    read_ids_file,
+    run_work_plan,
+)
 from cds.modules.maintenance.subformats import (
     create_all_missing_subformats,
     create_all_subformats,
@@ -51,11 +60,158 @@ def abort_if_false(ctx, param, value):
         ctx.abort()
 
 
+def bulk_options(f):
+    """Options to select the videos of a bulk command and run it."""
+    options = [
+        click.option("--query", "-q", help="Search query on the published videos."),
+        click.option(
+            "--from",
+            "from_date",
+            type=click.DateTime(),
+            help="Select the video deposits created from this date.",
+        ),
+        click.option(
+            "--to",
+            "to_date",
+            type=click.DateTime(),
+            help="Select the video deposits created until this date.",
+        ),
+        click.option(
+            "--ids-file",
+            type=click.File("r"),
+            help="File with one video id per line.",
+        ),
+        click.option(
+            "--id-type",
+            type=click.Choice(["recid", "depid"]),
+            default="depid",
+            show_default=True,
+            help="Type of the ids in the ids file.",
+        ),
+        click.option(
+            "--batch-size",
+            type=int,
+            default=100,
+            show_default=True,
+            help="Number of videos resolved and committed together.",
+        ),
+        click.option(
+            "--rate",
+            type=float,
+            default=1.0,
+            show_default=True,
+            help="Max number of flow tasks started per second.",
+        ),
+        click.option(
+            "--checkpoint",
+            type=click.Path(dir_okay=False),
+            help="File recording the processed videos, to resume a run.",
+        ),
+        click.option(
+            "--dry-run", is_flag=True, help="Print the work plan without running it."
+        ),
+    ]
+    for option in reversed(options):
+        f = option(f)
+    return f
+
+
+def _select_deposit_ids(query, from_date, to_date, ids_file, id_type, batch_size):
+    """Get the deposit ids selected by the bulk options."""
+    if ids_file:
+        ids = read_ids_file(ids_file)
+        if id_type == "recid":
+            return deposit_ids_from_recids(ids, batch_size=batch_size)
+        return ids
+    if query:
+        return deposit_ids_from_query(query)
+    if from_date or to_date:
+        return deposit_ids_from_date_range(from_date, to_date)
+    raise ClickException('Missing option "--query", "--from/--to" or "--ids-file"')
+
+
+def _run_bulk(
+    mode,
+    quality,
+    query,
+    from_date,
+    to_date,
+    ids_file,
+    id_type,
+    batch_size,
+    rate,
+    checkpoint,
+    dry_run,
+):
+    """Plan and run a bulk command."""
+    checkpoint = Checkpoint(checkpoint)
+    deposit_ids = (
+        depid
+        for depid in _select_deposit_ids(
+            query, from_date, to_date, ids_file, id_type, batch_size
+        )
+        if depid not in checkpoint
+    )
+    plan = iter_work_plan(deposit_ids, mode, quality=quality, batch_size=batch_size)
+
+    videos = jobs = errors = 0
+    seconds = 0.0
+    if dry_run:
+        results = ((item, False) for item in plan)
+    else:
+        results = run_work_plan(
+            plan, rate=rate, checkpoint=checkpoint, batch_size=batch_size
+        )
+    for item, started in results:
+        if item.error:
+            errors += 1
+            click.secho("{0}: {1}".format(item.deposit_id, item.error), fg="red")
+            continue
+        videos += 1
+        if item.qualities is None:
+            jobs += 1
+            click.echo("{0}: extract frames".format(item.deposit_id))
+        else:
+            jobs += len(item.qualities)
+            seconds += item.duration * len(item.qualities)
+            click.echo(
+                "{0}: {1}".format(
+                    item.deposit_id, ", ".join(item.qualities) or "nothing to do"
+                )
+            )
+
+    click.echo(
+        "{0} {1} videos, {2} jobs, {3} errors.".format(
+            "Planned" if dry_run else "Processed", videos, jobs, errors
+        )
+    )
+    if mode != "frames":
+        click.echo(
+            "Estimated transcoding load: {0:.1f} hours of video.".format(
+                seconds / 3600
+            )
+        )
+
+
 @click.group()
 def subformats():
     """Slaves command line utilities."""
 
 
+@subformats.command()
+@click.argument("mode", type=click.Choice(["missing", "all", "quality"]))
+@click.option("--quality", help="Quality to recreate, with the quality mode.")
+@bulk_options
+@with_appcontext
+def bulk(mode, quality, **kwargs):
+    """Create missing, all or one subformat for many videos."""
+    if mode == "quality":
+        qualities = list(current_app.config["CDS_OPENCAST_QUALITIES"].keys())
+        if quality not in qualities:
+            raise ClickException("Input quality must be one of {0}".format(qualities))
+    _run_bulk(mode, quality, **kwargs)
+
+
 # TODO: Test all the commands
 
 
@@ -233,6 +389,14 @@ def extract_frames(recid, depid):
     index_deposit_project(payload["deposit_id"])
 
 
+@videos.command()
+@bulk_options
+@with_appcontext
+def extract_frames_bulk(**kwargs):
+    """Re-trigger the extract frames task for many videos."""
+    _run_bulk("frames", None, **kwargs)
+
+
 @videos.command()
 @click.option("--recid", "recid", help="ID of the video record", default=None, required=True)
 @with_appcontext
@@ -36,21 +36,38 @@ from ..opencast.utils import can_be_transcoded
 id_types = ["recid", "depid"]
 
 
+def get_qualities_to_transcode(master, width, height, mode, quality=None):
+    """Get the qualities to transcode for a master video.
+
+    :param mode: ``missing`` for the qualities without a subformat, ``all``
+        for all of them or ``quality`` for the given quality only.
+    """
+    if mode == "quality":
+        qualities = [quality]
+    elif mode == "missing":
+        subformats = CDSVideosFilesIterator.get_video_subformats(master)
+        dones = [subformat["tags"]["preset_quality"] for subformat in subformats]
+        qualities = set(current_app.config["CDS_OPENCAST_QUALITIES"].keys()) - set(
+            dones
+        )
+    else:
+        qualities = current_app.config["CDS_OPENCAST_QUALITIES"].keys()
+
+    return list(
+        filter(
+            lambda q: can_be_transcoded(q, width, height),
+            qualities,
+        )
+    )
+
+
 def create_all_missing_subformats(id_type, id_value):
     """Create all missing subformats."""
     _validate(id_type=id_type)
 
     depid, video_deposit = _resolve_deposit(id_type, id_value)
     master, w, h = _get_master_video(video_deposit)
-    subformats = CDSVideosFilesIterator.get_video_subformats(master)
-    dones = [subformat["tags"]["preset_quality"] for subformat in subformats]
-    missing = set(current_app.config["CDS_OPENCAST_QUALITIES"].keys()) - set(dones)
-    transcodables_qualities = list(
-        filter(
-            lambda q: can_be_transcoded(q, w, h),
-            missing,
-        )
-    )
+    transcodables_qualities = get_qualities_to_transcode(master, w, h, "missing")
 
     flow_metadata = FlowMetadata.get_by_deposit(depid)
     assert flow_metadata, "Cannot find Flow for given deposit id {0}".format(depid)
@@ -83,13 +100,7 @@ def create_all_subformats(id_type, id_value):
 
     depid, video_deposit = _resolve_deposit(id_type, id_value)
     master, w, h = _get_master_video(video_deposit)
-
-    transcodables_qualities = list(
-        filter(
-            lambda q: can_be_transcoded(q, w, h),
-            current_app.config["CDS_OPENCAST_QUALITIES"].keys(),
-        )
-    )
+    transcodables_qualities = get_qualities_to_transcode(master, w, h, "all")
 
     flow_metadata = FlowMetadata.get_by_deposit(depid)
     assert flow_metadata, "Cannot find Flow for given deposit id {0}".format(depid)
@@ -98,8 +109,8 @@ def create_all_subformats(id_type, id_value):
     return transcodables_qualities
 
 
-def _run_transcoding_for(flow_metadata, qualities=None):
-    """Run transcoding for the given qualities."""
+def transcoding_signature(flow_metadata, qualities=None):
+    """Create the flow tasks for the qualities and the Celery signature."""
     payload = flow_metadata.payload
     payload = dict(
         deposit_id=payload["deposit_id"],
@@ -110,12 +121,18 @@ def _run_transcoding_for(flow_metadata, qualities=None):
     )
 
     TranscodeVideoTask.create_flow_tasks(payload, qualities=qualities)
+    return TranscodeVideoTask().s(**payload)
+
+
+def _run_transcoding_for(flow_metadata, qualities=None):
+    """Run transcoding for the given qualities."""
+    signature = transcoding_signature(flow_metadata, qualities)
     db.session.commit()
 
-    TranscodeVideoTask().s(**payload).apply_async()
+    signature.apply_async()
 
     db.session.commit()
-    index_deposit_project(payload["deposit_id"])
+    index_deposit_project(flow_metadata.payload["deposit_id"])
 
 
 def _resolve_deposit(id_type, id_value):
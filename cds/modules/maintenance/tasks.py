@@ -26,6 +26,8 @@ import time
 from celery import shared_task
 from flask import current_app
 
+from cds.modules.flows.reaper import reap_stuck_tasks
+
 
 @shared_task(ignore_result=True)
 def clean_tmp_videos():
@@ -45,3 +47,16 @@ def clean_tmp_videos():
         to_delete = last_modification_time < SEVEN_DAYS_AGO
         if to_delete:
             shutil.rmtree(path)
+
+
+@shared_task(ignore_result=True)
+def reap_stuck_flow_tasks():
+    """Fail or restart the flow tasks stuck after their worker died."""
+    counts = reap_stuck_tasks()
+    # the counts are logged as a metric of the stuck tasks
+    current_app.logger.info(
+        "Reaped stuck flow tasks: checked=%(checked)s failed=%(failed)s "
+        "restarted=%(restarted)s cancelled=%(cancelled)s",
+        counts,
+        extra=dict(flows_reaper=counts),
+    )
@@ -39,7 +39,6 @@ from invenio_files_rest.models import (
     FileInstance,
     ObjectVersion,
     ObjectVersionTag,
-    as_bucket,
     as_object_version,
 )
 from invenio_pidstore.errors import PIDDeletedError, PIDDoesNotExistError
@@ -47,6 +46,7 @@ from invenio_pidstore.errors import PIDDeletedError, PIDDoesNotExistError
 from cds.modules.deposit.api import deposit_video_resolver
 from cds.modules.flows.decorators import retry
 from cds.modules.flows.deposit import index_deposit_project
+from cds.modules.flows.files import relock_bucket, unlock_bucket
 from cds.modules.flows.models import FlowTaskMetadata
 from cds.modules.flows.models import FlowTaskStatus as FlowTaskStatus
 from cds.modules.flows.tasks import TranscodeVideoTask, sync_records_with_deposit_files
@@ -124,10 +124,9 @@ def _group_tasks_by_opencast_event_id(tasks):
     """Group tasks by event_id."""
     groups = defaultdict(list)
     for obj in tasks:
-        try:
-            event_id = obj.payload["opencast_event_id"]
-            groups[event_id].append(obj)
-        except KeyError:
+        if obj.opencast_event_id:
+            groups[obj.opencast_event_id].append(obj)
+        else:
             current_app.logger.error(
                 "Opencast event id is missing in Task with id: {0} .".format(
                     obj.id
@@ -148,7 +147,7 @@ def get_opencast_events(grouped_flow_tasks):
     with session_context as session:
         for started_flow_tasks in grouped_flow_tasks:
             # the opencast event id is the same for all transcoding tasks
-            event_id = started_flow_tasks[0].payload["opencast_event_id"]
+            event_id = started_flow_tasks[0].opencast_event_id
             try:
                 (
                     opencast_workflow_processing_state,
@@ -201,9 +200,9 @@ def get_opencast_processed_subformats(started_flow_tasks, opencast_subformats):
 )
 def check_transcoding_status():
     """Update all finished transcoding tasks."""
-    started_transcoding_tasks = FlowTaskMetadata.query.filter_by(
-        status=FlowTaskStatus.STARTED, name=TranscodeVideoTask.name
-    ).all()
+    started_transcoding_tasks = FlowTaskMetadata.get_started_by_name(
+        TranscodeVideoTask.name
+    )
     grouped_flow_tasks = _group_tasks_by_opencast_event_id(
         started_transcoding_tasks
     )
@@ -225,7 +224,7 @@ def check_transcoding_status():
         )
     for started_flow_tasks in grouped_flow_tasks:
         # the opencast event id is the same for all transcoding tasks
-        event_id = started_flow_tasks[0].payload["opencast_event_id"]
+        event_id = started_flow_tasks[0].opencast_event_id
         opencast_event = opencast_events.get(event_id)
         if not opencast_event:
             continue
@@ -360,10 +359,6 @@ def on_transcoding_completed(
     WARNING: Do not remove opencast_event_id and flow_task_id, needed for
      @only_one decorator
     """
-    deposit_video_is_published = False
-    bucket = None
-    bucket_was_locked = False
-
     flow_task = FlowTaskMetadata.query.get(flow_task_id)
     if not flow_task:
         return
@@ -377,37 +372,44 @@ def on_transcoding_completed(
     # celery task again
     if flow_task.status != FlowTaskStatus.STARTED:
         return
-    preset_quality = flow_task.payload["preset_quality"]
-    master_object_version = as_object_version(
-        flow_task.payload["master_id"]
-    )
-    master_object_version_id = str(master_object_version.version_id)
 
     deposit_id = flow_task.payload["deposit_id"]
     try:
         deposit_video = deposit_video_resolver(deposit_id)
     except PIDDeletedError:
         # If the video was soft deleted we still process the tasks
-        # If bucket is locked, we unlock and lock it again before exiting
         deposit_video = None
-        bucket = as_bucket(flow_task.payload["bucket_id"])
-        bucket_was_locked = bucket.locked
-        if bucket_was_locked:
-            bucket.locked = False
-        pass
     except PIDDoesNotExistError:
         # If video was hard deleted just exit
         return
 
-    if deposit_video:
-        deposit_video_is_published = deposit_video.is_published()
-        if deposit_video_is_published:
-            assert deposit_video.files.bucket.locked
-            deposit_video.files.bucket.locked = False
+    # The bucket of a published (or deleted) video is locked, and the frames
+    # extraction of the same flow might be adding files to it as well
+    bucket_id = flow_task.payload["bucket_id"]
+    unlock_bucket(bucket_id, flow_task_id)
+    try:
+        _add_transcoded_file(
+            flow_task, deposit_video, opencast_subformat, opencast_event_id
+        )
+    finally:
+        relock_bucket(bucket_id, flow_task_id)
+
+
+def _add_transcoded_file(
+    flow_task, deposit_video, opencast_subformat, opencast_event_id
+):
+    """Write the transcoded file to EOS and add it to the video bucket."""
+    flow_task_id = str(flow_task.id)
+    preset_quality = flow_task.preset_quality
+    master_object_version = as_object_version(
+        flow_task.payload["master_id"]
+    )
+    master_object_version_id = str(master_object_version.version_id)
+    deposit_id = flow_task.payload["deposit_id"]
 
     obj = ObjectVersion.create(
         bucket=flow_task.payload["bucket_id"],
-        key="{0}.mp4".format(flow_task.payload["preset_quality"]),
+        key="{0}.mp4".format(preset_quality),
     )
 
     download_url = opencast_subformat["url"]
@@ -470,13 +472,9 @@ def on_transcoding_completed(
     flow_task.payload = new_payload
 
     if deposit_video:
-        if deposit_video_is_published:
+        if deposit_video.is_published():
             sync_records_with_deposit_files(deposit_id)
-            deposit_video.files.bucket.locked = True
         index_deposit_project(deposit_id)
-    else:
-        if bucket_was_locked:
-            bucket.locked = True
 
     db.session.commit()
 
@@ -38,6 +38,7 @@ from sqlalchemy import func
 
 from .fetchers import recid_fetcher
 from .minters import kwid_minter
+from .refs import replace_refs
 
 
 def dump_object(obj):
@@ -193,6 +194,37 @@ class CDSVideosFilesIterator(CDSFilesIterator):
         master_file = CDSVideosFilesIterator.get_master_video_file(record)
         return CDSVideosFilesIterator.get_video_frames(master_file)[0]
 
+    @staticmethod
+    def get_video_thumbnail(record):
+        """Get the poster and the animated preview shown in the video cards.
+
+        Only the fields needed to build their IIIF links are kept, so that
+        the search results can be rendered without the ``_files`` tree.
+        """
+        files = record.get("_files", [])
+        poster = next((f for f in files if f.get("context_type") == "poster"), None)
+        master_file = next((f for f in files if f.get("context_type") == "master"), {})
+        if poster is None:
+            poster = next(
+                (f for f in master_file.get("frame", []) if f["key"] == "frame-1.jpg"),
+                None,
+            )
+        gif = next(
+            (
+                f
+                for f in master_file.get("frames-preview", [])
+                if f["key"] == "frames.gif"
+            ),
+            None,
+        )
+        thumbnail = {}
+        for name, f in (("poster", poster), ("gif", gif)):
+            if f is not None:
+                thumbnail[name] = {
+                    key: f.get(key) for key in ("bucket_id", "version_id", "key")
+                }
+        return thumbnail
+
 
 class CDSRecord(Record):
     """CDS Record."""
@@ -221,6 +253,12 @@ class CDSRecord(Record):
             pid_type="depid", pid_value=self.get("_deposit", {}).get("id")
         )
 
+    def replace_refs(self):
+        """Replace the ``$ref`` keys, resolving the records in bulk."""
+        if not self.enable_jsonref:
+            return self
+        return replace_refs(dict(self))
+
     @classmethod
     def create_bucket(cls, data):
         """Create a bucket for this record.
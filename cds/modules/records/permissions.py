@@ -338,6 +338,35 @@ def has_read_record_permission(user, record):
     return has_admin_permission()
 
 
+def filter_readable_records(user, records):
+    """Filter the records which the user has read access to.
+
+    Same as ``has_read_record_permission`` on each record, but the user id,
+    provides and admin permission are computed only once.
+    """
+    user_id = int(user.get_id()) if user.is_authenticated else None
+    user_provides = None
+    is_admin = None
+    readable = []
+    for record in records:
+        if is_public(record, "read") or user_id == record.get("_deposit", {}).get(
+            "created_by", -1
+        ):
+            readable.append(record)
+            continue
+        if user_provides is None:
+            user_provides = set(get_user_provides())
+        # Users with update permission can also read
+        if not user_provides.isdisjoint(_get_access_groups(record, "read", "update")):
+            readable.append(record)
+            continue
+        if is_admin is None:
+            is_admin = has_admin_permission()
+        if is_admin:
+            readable.append(record)
+    return readable
+
+
 def has_read_record_eos_path_permission(user, record):
     """Check if user has eos path permissions."""
     user_provides = get_user_provides()
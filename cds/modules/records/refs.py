@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of CDS.
+# Copyright (C) 2026 CERN.
+#
+# CDS is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# CDS is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CDS; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Bulk replacement of the JSON references."""
+
+import re
+from collections import defaultdict
+from copy import deepcopy
+
+from flask import current_app, g, has_request_context
+from invenio_db import db
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
+from invenio_records.models import RecordMetadata
+
+REF_PATTERN = re.compile(
+    r"^https?://cds\.cern\.ch/api/(?P<type>record|keywords|deposits/project"
+    r"|deposits/video)/(?P<value>[^/#?]+)$"
+)
+"""Local references, as routed by the JSON resolvers."""
+
+PID_TYPES = {
+    "record": "recid",
+    "keywords": "kwid",
+    "deposits/project": "depid",
+    "deposits/video": "depid",
+}
+"""PID type of each kind of local reference."""
+
+
+def _get_memo():
+    """Get the resolved references of the current request."""
+    if not has_request_context():
+        return {}
+    if "cds_resolved_refs" not in g:
+        g.cds_resolved_refs = {}
+    return g.cds_resolved_refs
+
+
+def clear_resolved_refs(sender, *args, **kwargs):
+    """Forget the resolved references of the request after a record changes."""
+    if has_request_context():
+        g.pop("cds_resolved_refs", None)
+
+
+def _find_refs(data, ancestors=frozenset()):
+    """Find the references of a JSON tree.
+
+    :returns: a list of ``(parent, key, ref, ancestors)``, where ``ancestors``
+        are the references the tree was resolved from, to stop on cycles.
+    """
+    found = []
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        items = value.items() if isinstance(value, dict) else enumerate(value)
+        for key, item in items:
+            if isinstance(item, dict):
+                ref = item.get("$ref")
+                if isinstance(ref, str):
+                    found.append((value, key, ref, ancestors))
+                    continue
+                stack.append(item)
+            elif isinstance(item, list):
+                stack.append(item)
+    return found
+
+
+def _resolve(refs, memo):
+    """Fetch the JSON of the references not in the memo, one query by PID type.
+
+    The references to PIDs not registered or to deleted records are left
+    out, so that they raise the errors of the JSON resolvers.
+    """
+    pid_values = defaultdict(dict)
+    for ref in refs:
+        match = REF_PATTERN.match(ref)
+        if match and ref not in memo:
+            pid_type = PID_TYPES[match.group("type")]
+            pid_values[pid_type][match.group("value")] = ref
+    for pid_type, by_value in pid_values.items():
+        rows = (
+            db.session.query(PersistentIdentifier.pid_value, RecordMetadata.json)
+            .join(RecordMetadata, RecordMetadata.id == PersistentIdentifier.object_uuid)
+            .filter(
+                PersistentIdentifier.pid_type == pid_type,
+                PersistentIdentifier.pid_value.in_(list(by_value)),
+                PersistentIdentifier.status == PIDStatus.REGISTERED,
+                PersistentIdentifier.object_type == "rec",
+                RecordMetadata.json.isnot(None),
+            )
+        )
+        for pid_value, json in rows:
+            memo[by_value[pid_value]] = json
+
+
+def replace_refs(data):
+    """Replace the JSON references of a record, resolving them in bulk.
+
+    The references of each level of the tree are fetched together, with one
+    query by PID type, instead of one by one when accessed. The resolved
+    records are kept until the end of the request, or until a record is
+    updated, so that the same keywords or videos are fetched only once.
+    Other references are replaced as usual, lazily.
+
+    :param data: a JSON tree, not modified.
+    :returns: a copy of the tree with its references replaced.
+    """
+    data = deepcopy(data)
+    memo = _get_memo()
+    refs = _find_refs(data)
+    unresolved = []
+    while refs:
+        _resolve({ref for _, _, ref, _ in refs}, memo)
+        next_refs = []
+        for parent, key, ref, ancestors in refs:
+            if ref not in memo or ref in ancestors:
+                unresolved.append((parent, key))
+                continue
+            parent[key] = deepcopy(memo[ref])
+            next_refs.extend(_find_refs(parent[key], ancestors | {ref}))
+        refs = next_refs
+
+    if unresolved:
+        state = current_app.extensions["invenio-records"]
+        for parent, key in unresolved:
+            parent[key] = state.replace_refs(parent[key])
+    return data
@@ -27,7 +27,7 @@
 
 from functools import partial
 
-from invenio_pidstore.models import PersistentIdentifier
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 from invenio_pidstore.resolver import Resolver
 
 from .api import CDSRecord, Keyword
@@ -55,3 +55,35 @@ record_resolver = Resolver(
 
 
 get_record_pid = partial(get_pid, pid_type="recid")
+
+
+def records_resolver(pid_values):
+    """Resolve records with one query for the PIDs and one for the records.
+
+    The records are loaded as stored, in the order of ``pid_values``. PIDs
+    which are not registered are resolved one by one with
+    ``record_resolver``, which raises its errors.
+    """
+    if not pid_values:
+        return []
+    pids = PersistentIdentifier.query.filter(
+        PersistentIdentifier.pid_type == "recid",
+        PersistentIdentifier.pid_value.in_(set(pid_values)),
+        PersistentIdentifier.status == PIDStatus.REGISTERED,
+        PersistentIdentifier.object_type == "rec",
+        PersistentIdentifier.object_uuid.isnot(None),
+    )
+    uuids = {pid.pid_value: str(pid.object_uuid) for pid in pids}
+    records = {
+        str(record.id): record
+        for record in CDSRecord.get_records(
+            list(set(uuids.values())), with_deleted=True
+        )
+    }
+    result = []
+    for pid_value in pid_values:
+        record = records.get(uuids.get(pid_value))
+        if record is None:
+            record = record_resolver.resolve(pid_value)[1]
+        result.append(record)
+    return result
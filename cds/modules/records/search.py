@@ -24,16 +24,22 @@
 
 """Configuration for records search."""
 
+import hashlib
+import json
+import time
+import uuid
 
-from flask import current_app, g, request
+from flask import current_app, g, has_app_context, request
 from flask_login import current_user
 from invenio_access.permissions import Permission, superuser_access
+from invenio_cache import current_cache, current_cache_ext
 from invenio_records_rest.errors import InvalidQueryRESTError
+from invenio_records_rest.proxies import current_records_rest
 from invenio_search import RecordsSearch
 from invenio_search.api import DefaultFilter
 from invenio_search.engine import dsl
 
-from .utils import get_user_provides
+from .utils import get_user_access_terms, get_user_provides, is_record
 
 
 def lowercase_filter(field_name):
@@ -55,6 +61,10 @@ def cern_filter():
     if Permission(superuser_access).allows(g.identity):
         return dsl.Q()
 
+    if current_app.config["CDS_RECORDS_SEARCH_ACCESS_TERMS"]:
+        terms = dsl.Q("terms", _access_terms=get_user_access_terms())
+        return dsl.Q("bool", filter=[terms])
+
     # Get CERN user's provides
     provides = get_user_provides()
 
@@ -72,8 +82,82 @@ def cern_filter():
     return dsl.Q("bool", filter=[combined_filter])
 
 
+SEARCH_CACHE_GENERATION_KEY = "cds_records_search:generation"
+"""Cache key of the generation of the cached searches."""
+
+
+def get_search_cache_generation():
+    """Get the generation of the cached searches.
+
+    :returns: the generation id, and the time until which the searches are
+        not cached, as the last changes may not be visible yet.
+    """
+    return current_cache.get(SEARCH_CACHE_GENERATION_KEY) or ("0", 0)
+
+
+def get_search_cache_key(search, generation):
+    """Get the cache key of a search, from its request body and parameters.
+
+    The key also contains the generation of the cached searches, so that
+    they are all expired when it changes.
+    """
+    params = {
+        key: value for key, value in search._params.items() if key != "preference"
+    }
+    request_ = json.dumps(
+        dict(index=search._index, body=search.to_dict(), params=params),
+        sort_keys=True,
+        default=str,
+    )
+    return "cds_records_search:{0}:{1}".format(
+        generation, hashlib.sha1(request_.encode("utf-8")).hexdigest()
+    )
+
+
+def clear_search_cache(sender=None, **kwargs):
+    """Expire the cached searches.
+
+    The last changes are not searchable until the index is refreshed, so the
+    searches are not cached for the next
+    ``CDS_RECORDS_SEARCH_CACHE_SETTLE_TIME`` seconds.
+    """
+    settle_time = current_app.config["CDS_RECORDS_SEARCH_CACHE_SETTLE_TIME"]
+    current_cache.set(
+        SEARCH_CACHE_GENERATION_KEY,
+        (uuid.uuid4().hex, time.time() + settle_time),
+        timeout=0,
+    )
+
+
+def expire_search_cache(sender, record=None, **kwargs):
+    """Expire the cached searches once a record is indexed or deleted.
+
+    Connected to the indexing of the records, by any indexer or task, and
+    to their deletion, which happen before the changes are written to the
+    index. The searches are expired once, by
+    :func:`expire_search_cache_on_teardown`, at the end of the request or
+    task. The deposits are not in the cached searches, they are ignored.
+    """
+    if record is not None and not is_record(record):
+        return
+    if has_app_context():
+        g.cds_search_cache_expired = True
+    else:
+        clear_search_cache()
+
+
+def expire_search_cache_on_teardown(exception=None):
+    """Expire the cached searches if records were indexed or deleted."""
+    if g.pop("cds_search_cache_expired", False):
+        clear_search_cache()
+
+
 class RecordVideosSearch(RecordsSearch):
-    """CERN search class."""
+    """CERN search class.
+
+    The results of the searches marked with :meth:`cache_anonymous` are
+    cached for the anonymous users, which all share the same filter.
+    """
 
     class Meta:
         """Configuration for CERN search."""
@@ -99,6 +183,49 @@ class RecordVideosSearch(RecordsSearch):
         )
         default_filter = DefaultFilter(cern_filter)
 
+    def __init__(self, **kwargs):
+        """Initialize the search."""
+        super(RecordVideosSearch, self).__init__(**kwargs)
+        self._cache_anonymous = False
+
+    def _clone(self):
+        """Clone the search, keeping if its results are cached."""
+        search = super(RecordVideosSearch, self)._clone()
+        search._cache_anonymous = self._cache_anonymous
+        return search
+
+    def cache_anonymous(self):
+        """Cache the results of the search for the anonymous users."""
+        search = self._clone()
+        search._cache_anonymous = True
+        return search
+
+    def execute(self, ignore_cache=False):
+        """Execute the search, or get its results from the cache."""
+        timeout = current_app.config["CDS_RECORDS_SEARCH_CACHE_TIMEOUT"]
+        if (
+            not self._cache_anonymous
+            or not timeout
+            or current_cache_ext.is_authenticated_callback()
+        ):
+            return super(RecordVideosSearch, self).execute(ignore_cache=ignore_cache)
+
+        generation, settled = get_search_cache_generation()
+        if time.time() < settled:
+            # the last indexed records may not be searchable yet
+            return super(RecordVideosSearch, self).execute(ignore_cache=ignore_cache)
+
+        key = get_search_cache_key(self, generation)
+        data = current_cache.get(key)
+        if data is None:
+            response = super(RecordVideosSearch, self).execute(
+                ignore_cache=ignore_cache
+            )
+            current_cache.set(key, response.to_dict(), timeout=timeout)
+            return response
+        self._response = self._response_class(self, data)
+        return self._response
+
 
 class KeywordSearch(RecordsSearch):
     """Keyword search class.
@@ -138,6 +265,25 @@ def query_to_objects(query, cls):
     return cls.get_records(ids)
 
 
+def search_after_hits(search, page_size):
+    """Iterate on all the hits of a sorted search, one page at a time.
+
+    Unlike ``scan``, the hits keep the order of the search and the pages are
+    fetched only when the previous one was consumed.
+    """
+    search_after = None
+    while True:
+        page = search.extra(size=page_size)
+        if search_after:
+            page = page.extra(search_after=search_after)
+        hits = page.execute().hits
+        for hit in hits:
+            yield hit
+        if len(hits) < page_size:
+            return
+        search_after = list(hits[-1].meta.sort)
+
+
 def query_parser_with_fields(search_obj, qstr=None):
     """Custom query parser with fields."""
     if qstr:
@@ -148,7 +294,31 @@ def query_parser_with_fields(search_obj, qstr=None):
     return dsl.Q()
 
 
-def videos_search_factory(_, search_obj, query_parser=None):
+def get_source_filter(resource):
+    """Get the ``_source`` filter of the hits for the serializer of a search.
+
+    The filters are configured in ``CDS_RECORDS_REST_SEARCH_SOURCE`` by REST
+    endpoint and by search serializer, e.g. to send only the fields rendered
+    by the search UI, and applied if ``CDS_RECORDS_REST_SEARCH_SOURCE_ENABLED``.
+
+    :param resource: the REST resource of the search.
+    :returns: a dictionary with the ``includes`` and ``excludes`` fields.
+    """
+    if not current_app.config["CDS_RECORDS_REST_SEARCH_SOURCE_ENABLED"]:
+        return None
+    endpoint = current_records_rest.default_endpoint_prefixes.get(resource.pid_type)
+    filters = current_app.config["CDS_RECORDS_REST_SEARCH_SOURCE"].get(endpoint)
+    if not filters:
+        return None
+    serializers, default_media_type = resource.get_method_serializers(request.method)
+    serializer = resource.match_serializers(serializers, default_media_type)
+    for mimetype, candidate in serializers.items():
+        if candidate is serializer:
+            return filters.get(mimetype)
+    return None
+
+
+def videos_search_factory(resource, search_obj, query_parser=None):
     """Custom query parser."""
     from invenio_records_rest.facets import default_facets_factory
     from invenio_records_rest.sorter import default_sorter_factory
@@ -171,5 +341,11 @@ def videos_search_factory(_, search_obj, query_parser=None):
     for key, value in sortkwargs.items():
         urlkwargs.add(key, value)
 
+    source_filter = get_source_filter(resource)
+    if source_filter:
+        search = search.source(**source_filter)
+    if isinstance(search, RecordVideosSearch):
+        search = search.cache_anonymous()
+
     urlkwargs.add("q", query_string)
     return search, urlkwargs
@@ -31,6 +31,7 @@ from invenio_records_rest.serializers.response import (
     search_responsify,
 )
 
+from .cache import cached_record_responsify
 from .datacite import CDSDataCite41Serializer
 from .drupal import DrupalSerializer
 from .json import CDSJSONSerializer as JSONSerializer
@@ -63,10 +64,10 @@ json_v1 = JSONSerializer(RecordSchemaJSONV1, replace_refs=True)
 # =================================
 
 #: SMIL record serializer for individual records.
-smil_v1_response = record_responsify(smil_v1, "application/smil")
+smil_v1_response = cached_record_responsify(smil_v1, "application/smil")
 
 #: VTT record serializer for individual records.
-vtt_v1_response = record_responsify(vtt_v1, "text/vtt")
+vtt_v1_response = cached_record_responsify(vtt_v1, "text/vtt")
 
 #: Drupal record serializer for individual records.
 drupal_v1_response = record_responsify(drupal_v1, "application/json")
@@ -81,3 +82,6 @@ cdsdeposit_json_v1_response = record_responsify(cdsdeposit_json_v1, "application
 json_v1_response = record_responsify(json_v1, "application/json")
 
 json_v1_search = search_responsify(json_v1, "application/json")
+
+#: JSON search results of the search UI, with only the fields it renders
+json_v1_search_ui = search_responsify(json_v1, "application/json")
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of CDS.
+# Copyright (C) 2026 CERN.
+#
+# CDS is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# CDS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with CDS. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+"""Cache of the record formats rendered for the players."""
+
+import hashlib
+
+from flask import current_app, request
+from invenio_cache import current_cache
+from invenio_records_rest.serializers.response import add_link_header
+
+from ..permissions import is_public
+
+
+def cached_render(name, record, render):
+    """Render a format of a record, cached until the record changes.
+
+    The cache key contains the record revision, which changes on every
+    commit of the record, e.g. when it is published again.
+
+    :param name: name of the format.
+    :param render: function rendering the format, as a string.
+    """
+    revision_id = getattr(record, "revision_id", None)
+    if revision_id is None:
+        # not a stored record
+        return render()
+    key = "cds_records_format:{0}:{1}:{2}".format(name, record.id, revision_id)
+    data = current_cache.get(key)
+    if data is None:
+        data = render()
+        current_cache.set(
+            key, data, timeout=current_app.config["CDS_RECORDS_FORMAT_CACHE_TIMEOUT"]
+        )
+    return data
+
+
+def make_cacheable(response, record):
+    """Add a strong ETag, computed from the content, and a max age.
+
+    The response is turned into a ``304 Not Modified`` if the client already
+    has the same content.
+    """
+    response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+    response.cache_control.max_age = current_app.config["CDS_RECORDS_FORMAT_MAX_AGE"]
+    if is_public(record, "read"):
+        response.cache_control.public = True
+    else:
+        response.cache_control.private = True
+    return response.make_conditional(request)
+
+
+def cached_record_responsify(serializer, mimetype):
+    """Create a Records-REST response serializer with HTTP caching.
+
+    Same as ``record_responsify``, but the ETag is computed from the content
+    instead of the revision, so that the players keep it between
+    revisions which did not change the content.
+    """
+
+    def view(pid, record, code=200, headers=None, links_factory=None):
+        response = current_app.response_class(
+            serializer.serialize(pid, record, links_factory=links_factory),
+            mimetype=mimetype,
+        )
+        response.status_code = code
+        response.last_modified = record.updated
+        if headers is not None:
+            response.headers.extend(headers)
+
+        if links_factory is not None:
+            add_link_header(response, links_factory(pid))
+
+        return make_cacheable(response, record)
+
+    return view
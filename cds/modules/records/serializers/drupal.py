@@ -22,6 +22,8 @@
 """Drupal serializer for records."""
 
 
+import json
+
 import arrow
 from arrow.parser import ParserError
 from flask import current_app
@@ -52,6 +54,10 @@ class VideoDrupal(object):
 
     def format(self):
         """Format video."""
+        return {"entries": [{"entry": self.entry()}]}
+
+    def entry(self):
+        """Get the Drupal entry of the video."""
         record = self._record
 
         title_en = record.get("title", {}).get("title", "")
@@ -66,7 +72,7 @@ class VideoDrupal(object):
         caption_en = self.html_tag_remover.unescape(caption_en)
         caption_fr = self.html_tag_remover.unescape(caption_fr)
 
-        entry = {
+        return {
             "caption_en": caption_en,
             "caption_fr": caption_fr,
             "copyright_date": record.get("copyright", {}).get("year", ""),
@@ -87,7 +93,6 @@ class VideoDrupal(object):
             "type": "video" if not record.get("vr", False) else "360 video",
             "video_length": self.video_length,
         }
-        return {"entries": [{"entry": entry}]}
 
     def get_translation(self, field_name, subfield_name, lang_code):
         """Get title france."""
@@ -174,3 +179,29 @@ class DrupalSerializer(JSONSerializer):
         if record["$schema"] == Video.get_record_schema():
             return VideoDrupal(record=record).format()
         return {}
+
+
+def drupal_feed(hits, as_json=False):
+    """Yield the Drupal entries of search hits, without loading the records.
+
+    :param as_json: yield a single JSON document, in chunks, like the one of
+        a record export, instead of one JSON entry per line.
+    """
+    if as_json:
+        yield '{"entries": ['
+    first = True
+    for hit in hits:
+        try:
+            entry = VideoDrupal(record=hit.to_dict()).entry()
+        except (KeyError, IndexError, TypeError):
+            current_app.logger.warning(
+                "Cannot export video %s to Drupal.", hit.meta.id, exc_info=True
+            )
+            continue
+        if not as_json:
+            yield json.dumps(entry) + "\n"
+            continue
+        yield ("" if first else ", ") + json.dumps({"entry": entry})
+        first = False
+    if as_json:
+        yield "]}"
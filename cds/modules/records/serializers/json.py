@@ -21,19 +21,32 @@
 # or submit itself to any jurisdiction.
 """CDS JSON Serializer."""
 
+from functools import lru_cache
+from html import unescape
 
-from flask import has_request_context
+from flask import current_app, has_request_context, request, stream_with_context
 from flask_security import current_user
+from invenio_records_rest.schemas import RecordSchemaJSONV1
 from invenio_records_rest.serializers.json import JSONSerializer
+from pkg_resources import DistributionNotFound, get_distribution
 
+from ...deposit.api import deposit_videos_resolver, is_deposit, record_unbuild_url
 from ..api import CDSRecord
 from ..permissions import (
+    filter_readable_records,
     has_read_record_eos_path_permission,
-    has_read_record_permission,
 )
-from ..utils import HTMLTagRemover, parse_video_chapters
+from ..refs import replace_refs
+from ..resolver import records_resolver
+from ..utils import HTMLTagRemover, get_video_chapters
 from marshmallow_utils.html import sanitize_html, ALLOWED_HTML_ATTRS, ALLOWED_CSS_STYLES
 
+try:
+    get_distribution("orjson")
+    import orjson
+except DistributionNotFound:
+    orjson = None
+
 CUSTOM_ALLOWED_ATTRS = {
     **ALLOWED_HTML_ATTRS,
     "a": ALLOWED_HTML_ATTRS.get("a", []) + ["href", "title", "target", "rel"],
@@ -43,6 +56,29 @@ CUSTOM_ALLOWED_ATTRS = {
 
 CUSTOM_ALLOWED_CSS = ALLOWED_CSS_STYLES + ["color"]
 
+SANITIZE_CACHE_SIZE = 2048
+"""Number of sanitized descriptions kept in memory by each worker."""
+
+
+@lru_cache(maxsize=SANITIZE_CACHE_SIZE)
+def sanitize_description(description):
+    """Unescape and sanitize a description, allowing links and colors.
+
+    The descriptions are immutable strings, so the result is cached by
+    their content and the same record is parsed only once by each worker.
+    """
+    return sanitize_html(
+        unescape(description),
+        attrs=CUSTOM_ALLOWED_ATTRS,
+        css_styles=CUSTOM_ALLOWED_CSS,
+    )
+
+
+@lru_cache(maxsize=SANITIZE_CACHE_SIZE)
+def sanitize_translated_description(description):
+    """Unescape and sanitize the description of a translation."""
+    return sanitize_html(unescape(description))
+
 
 class CDSJSONSerializer(JSONSerializer):
     """CDS JSON serializer.
@@ -52,76 +88,153 @@ class CDSJSONSerializer(JSONSerializer):
 
     html_tag_remover = HTMLTagRemover()
 
+    @staticmethod
+    def _fast_json():
+        """Check if the records are encoded with ``orjson``."""
+        return orjson is not None and current_app.config["CDS_RECORDS_REST_FAST_JSON"]
+
+    @staticmethod
+    def _dumps(data):
+        """Encode to JSON with ``orjson``, as the Flask JSON provider does."""
+        option = orjson.OPT_NON_STR_KEYS
+        if request and request.args.get("prettyprint"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=current_app.json.default, option=option)
+
     def dump(self, obj, context=None):
         """Serialize object with schema."""
+        if self.schema_class is RecordSchemaJSONV1 and self._fast_json():
+            # same output as the schema, without copying the metadata
+            result = {}
+            if obj.get("pid") is not None:
+                result["id"] = str(obj["pid"].pid_value)
+            for key in ("metadata", "links", "created", "updated"):
+                if key in obj:
+                    result[key] = obj[key]
+            return result
         return self.schema_class(context=context).dump(obj)
 
-    def _sanitize_metadata(self, metadata):
-        """Sanitize title, description and translations in metadata."""
-        try:
-            if "title" in metadata and "title" in metadata["title"]:
-                title = metadata["title"]["title"]
-                title = self.html_tag_remover.unescape(title)
-
-            if "description" in metadata:
-                description = metadata["description"]
-                description = self.html_tag_remover.unescape(description)
-                metadata["description"] = sanitize_html(
-                    description,
-                    attrs=CUSTOM_ALLOWED_ATTRS,
-                    css_styles=CUSTOM_ALLOWED_CSS,
+    def serialize(self, pid, record, links_factory=None, **kwargs):
+        """Serialize a single record and persistent identifier."""
+        if not self._fast_json():
+            return super(CDSJSONSerializer, self).serialize(
+                pid, record, links_factory=links_factory, **kwargs
+            )
+        return self._dumps(self.transform_record(pid, record, links_factory, **kwargs))
+
+    def serialize_search(
+        self, pid_fetcher, search_result, links=None, item_links_factory=None, **kwargs
+    ):
+        """Serialize a search result.
+
+        With ``orjson``, the hits are encoded and sent one by one, instead of
+        building the whole result first.
+        """
+        if not self._fast_json():
+            return super(CDSJSONSerializer, self).serialize_search(
+                pid_fetcher,
+                search_result,
+                links=links,
+                item_links_factory=item_links_factory,
+                **kwargs
+            )
+
+        def generate():
+            yield b'{"hits":{"hits":['
+            for index, hit in enumerate(search_result["hits"]["hits"]):
+                if index:
+                    yield b","
+                yield self._dumps(
+                    self.transform_search_hit(
+                        pid_fetcher(hit["_id"], hit["_source"]),
+                        hit,
+                        links_factory=item_links_factory,
+                        **kwargs
+                    )
                 )
+            yield b'],"total":%s},"links":%s,"aggregations":%s}' % (
+                self._dumps(search_result["hits"]["total"]["value"]),
+                self._dumps(links or {}),
+                self._dumps(search_result.get("aggregations", {})),
+            )
 
-            if "translations" in metadata:
-                for t in metadata["translations"]:
-                    if "title" in t and "title" in t["title"]:
-                        t_title = t["title"]["title"]
-                        t_title = self.html_tag_remover.unescape(t_title)
+        return stream_with_context(generate())
 
-                    if "description" in t:
-                        t_desc = t["description"]
-                        t_desc = self.html_tag_remover.unescape(t_desc)
-                        t["description"] = sanitize_html(t_desc)
+    def _sanitize_metadata(self, metadata):
+        """Sanitize description and translations in metadata."""
+        if "description" in metadata:
+            metadata["description"] = sanitize_description(metadata["description"])
 
-        except KeyError:
-            # ignore error if keys are missing
-            pass
+        for t in metadata.get("translations", []):
+            if "description" in t:
+                t["description"] = sanitize_translated_description(t["description"])
 
         return metadata
 
+    def _get_video_refs(self, record):
+        """Get the references of the videos, if they have to be resolved."""
+        videos = record.get("videos")
+        if not self.replace_refs or not videos:
+            return None
+        refs = [video.get("$ref") for video in videos]
+        return refs if all(refs) else None
+
+    @staticmethod
+    def _resolve_video_refs(refs):
+        """Resolve the videos in bulk, keeping their order.
+
+        The published videos are loaded as the stored records, the others as
+        the video deposits, as by their JSON resolvers.
+        """
+        deposits = iter(
+            deposit_videos_resolver(
+                [record_unbuild_url(ref) for ref in refs if is_deposit(ref)]
+            )
+        )
+        records = iter(
+            records_resolver(
+                [record_unbuild_url(ref) for ref in refs if not is_deposit(ref)]
+            )
+        )
+        return [next(deposits) if is_deposit(ref) else next(records) for ref in refs]
+
     def preprocess_record(self, pid, record, links_factory=None):
         """Include ``_eos_library_path`` for single record retrievals."""
+        video_refs = self._get_video_refs(record)
+        if video_refs:
+            # resolve the videos in bulk instead of one by one with the other
+            # references, and only the ones the user can read
+            record = record.__class__(
+                {key: value for key, value in record.items() if key != "videos"},
+                model=record.model,
+            )
         result = super(CDSJSONSerializer, self).preprocess_record(
             pid, record, links_factory=links_factory
         )
+        metadata = result["metadata"]
+        if video_refs:
+            metadata["videos"] = self._resolve_video_refs(video_refs)
+
         # Add/remove files depending on access right.
         if isinstance(record, CDSRecord):
-            metadata = result["metadata"]
             if "_eos_library_path" in record and (
                 not has_request_context()
                 or not has_read_record_eos_path_permission(current_user, record)
             ):
                 metadata.pop("_eos_library_path")
 
-            # sanitize title by unescaping and stripping html tags
-            try:
-                metadata = self._sanitize_metadata(metadata)
-                if has_request_context():
-                    metadata["videos"] = [
-                        video
-                        for video in metadata["videos"]
-                        if has_read_record_permission(current_user, video)
-                    ]
-            except KeyError:
-                # ignore error if keys are missing in the metadata
-                pass
-
-            description = metadata.get("description", "")
-            if description:
-                metadata["chapters"] = parse_video_chapters(description)
-            else:
-                metadata["chapters"] = []
+            metadata = self._sanitize_metadata(metadata)
+            if "videos" in metadata and has_request_context():
+                metadata["videos"] = filter_readable_records(
+                    current_user, metadata["videos"]
+                )
+
+            metadata["chapters"] = get_video_chapters(metadata)
 
+        if video_refs:
+            metadata["videos"] = replace_refs(
+                [dict(video) for video in metadata["videos"]]
+            )
         return result
 
     def preprocess_search_hit(self, pid, record_hit, links_factory=None):
@@ -120,6 +120,14 @@ class PhysicalMediumSchema(StrictKeysSchema):
     shelf = fields.Str()
 
 
+class ChapterSchema(StrictKeysSchema):
+    """Chapter parsed from the description."""
+
+    timestamp = fields.Str()
+    seconds = fields.Int()
+    title = fields.Str()
+
+
 class VideoSchema(StrictKeysSchema):
     """Video schema."""
 
@@ -132,6 +140,7 @@ class VideoSchema(StrictKeysSchema):
     accelerator_experiment = fields.Nested(AcceleratorExperimentSchema)
     agency_code = fields.Str()
     category = fields.Str()
+    chapters = fields.Nested(ChapterSchema, many=True)
     contributors = fields.Nested(ContributorSchema, many=True, required=True)
     copyright = fields.Nested(CopyrightSchema)
     date = DateString(required=True)
@@ -22,7 +22,7 @@
 """Smil serializer for records."""
 
 
-from flask import render_template
+from flask import current_app, render_template
 from invenio_db import db
 from invenio_files_rest.models import ObjectVersion, ObjectVersionTag, as_object_version
 from invenio_rest.errors import FieldError, RESTValidationError
@@ -31,19 +31,15 @@ from six import BytesIO
 from ...deposit.api import Video
 from ...previewer.api import get_relative_path
 from ..api import CDSVideosFilesIterator
+from .cache import cached_render
 
 
 class SmilSerializer(object):
     """Smil serializer for records."""
 
     @staticmethod
-    def serialize(pid, record, links_factory=None, **kwargs):
-        """Serialize a single record and persistent identifier.
-
-        :param pid: Persistent identifier instance.
-        :param record: Record instance.
-        :param links_factory: Factory function for record links.
-        """
+    def render(record, **kwargs):
+        """Render the SMIL file of a video record."""
         if record["$schema"] != Video.get_record_schema() and not kwargs.get(
             "skip_schema_validation"
         ):
@@ -52,6 +48,23 @@ class SmilSerializer(object):
             )
         return Smil(record=record).format()
 
+    @staticmethod
+    def serialize(pid, record, links_factory=None, **kwargs):
+        """Serialize a single record and persistent identifier.
+
+        The SMIL file stored when the record was published is used if
+        available, otherwise it is rendered.
+
+        :param pid: Persistent identifier instance.
+        :param record: Record instance.
+        :param links_factory: Factory function for record links.
+        """
+        return cached_render(
+            "smil",
+            record,
+            lambda: get_stored_smil(record) or SmilSerializer.render(record, **kwargs),
+        )
+
 
 class Smil(object):
     """Smil formatter."""
@@ -111,6 +124,31 @@ class Smil(object):
             )
 
 
+def get_stored_smil(record):
+    """Get the content of the SMIL file generated when publishing a video."""
+    master_file = CDSVideosFilesIterator.get_master_video_file(record)
+    playlist = (master_file or {}).get("playlist")
+    if not playlist:
+        return None
+    obj = ObjectVersion.get(
+        playlist[0]["bucket_id"],
+        playlist[0]["key"],
+        version_id=playlist[0].get("version_id"),
+    )
+    if obj is None or obj.file is None:
+        return None
+    try:
+        with obj.file.storage().open() as fp:
+            return fp.read().decode("utf-8")
+    except (IOError, OSError):
+        current_app.logger.warning(
+            "Cannot read the SMIL file of record %s.",
+            record.get("recid"),
+            exc_info=True,
+        )
+        return None
+
+
 def generate_smil_file(record_id, record, bucket, master_object, **kwargs):
     """Generate SMIL file for Video record (on publish)."""
     master_object = as_object_version(master_object)
@@ -118,7 +156,7 @@ def generate_smil_file(record_id, record, bucket, master_object, **kwargs):
     # Generate SMIL file
     master_key = master_object.key
     smil_key = "{0}.smil".format(master_key.rsplit(".", 1)[0])
-    smil_content = SmilSerializer.serialize(record_id, record, **kwargs)
+    smil_content = SmilSerializer.render(record, **kwargs)
 
     # Create ObjectVersion for SMIL file
     with db.session.begin_nested():
@@ -31,6 +31,7 @@ from invenio_rest.errors import FieldError, RESTValidationError
 
 from ...deposit.api import Video
 from ..api import CDSVideosFilesIterator
+from .cache import cached_render
 
 
 class VTTSerializer(object):
@@ -48,7 +49,7 @@ class VTTSerializer(object):
             raise RESTValidationError(
                 errors=[FieldError(str(record.id), "Unsupported format")]
             )
-        return VTT(record=record).format()
+        return cached_render("vtt", record, VTT(record=record).format)
 
 
 class VTT(object):
@@ -25,6 +25,7 @@
 """Helper methods for CDS records."""
 
 
+import hashlib
 import json
 import re
 from datetime import timedelta
@@ -33,7 +34,7 @@ from urllib import parse
 
 import six
 from cds.modules.records.api import CDSVideosFilesIterator
-from flask import current_app, g, request
+from flask import current_app, g, has_request_context, request, session
 from flask_security import current_user
 from invenio_db import db
 from invenio_files_rest.models import as_bucket
@@ -95,9 +96,82 @@ def lowercase_value(value):
     return lowercase_value
 
 
+USER_PROVIDES_SESSION_KEY = "cds_user_provides"
+"""Session key of the user's provides."""
+
+ACCESS_TERM_PUBLIC = "_public"
+"""Access term of the records anyone can read."""
+
+
 def get_user_provides():
-    """Extract the user's provides from g."""
-    return [lowercase_value(need.value) for need in g.identity.provides]
+    """Extract the user's provides from g.
+
+    The provides of the logged in users are kept in the session, and only
+    rebuilt when the needs of the identity change, e.g. when the user joins
+    or leaves a group.
+    """
+    identity = g.identity
+    identity_id = getattr(identity, "id", None)
+    if identity_id is None or not has_request_context():
+        # no session for the anonymous users
+        return [lowercase_value(need.value) for need in identity.provides]
+    key = hashlib.sha1(
+        repr(sorted(repr(need) for need in identity.provides)).encode("utf-8")
+    ).hexdigest()
+    cached = session.get(USER_PROVIDES_SESSION_KEY)
+    if cached is None or cached["key"] != key:
+        cached = dict(
+            key=key,
+            provides=[lowercase_value(need.value) for need in identity.provides],
+        )
+        session[USER_PROVIDES_SESSION_KEY] = cached
+    return cached["provides"]
+
+
+def clear_user_provides(sender, identity=None, **kwargs):
+    """Forget the user's provides kept in the session."""
+    if has_request_context():
+        session.pop(USER_PROVIDES_SESSION_KEY, None)
+
+
+def owner_access_term(user_id):
+    """Get the access term of the owner of a record."""
+    return "_owner:{0}".format(user_id)
+
+
+def get_access_terms(record, read=True):
+    """Get the access terms of a record, indexed in ``_access_terms``.
+
+    They are the lowercased emails and groups allowed to update the record,
+    and to read it if ``read`` is set, its owner and
+    :data:`ACCESS_TERM_PUBLIC` if anyone can read it.
+    """
+    access = record.get("_access", {})
+    terms = {str(lowercase_value(value)) for value in access.get("update", [])}
+    if read:
+        if access.get("read"):
+            terms.update(str(lowercase_value(value)) for value in access["read"])
+        else:
+            terms.add(ACCESS_TERM_PUBLIC)
+    created_by = record.get("_deposit", {}).get("created_by")
+    if created_by is not None:
+        terms.add(owner_access_term(created_by))
+    return sorted(terms)
+
+
+def get_user_access_terms(read=True):
+    """Get the access terms matching the records the user can find.
+
+    The terms are sorted, so that the same user sends the same query and the
+    search engine can reuse its cached results of the filter.
+    """
+    terms = {str(value) for value in get_user_provides()}
+    user_id = getattr(current_user, "id", None)
+    if user_id is not None:
+        terms.add(owner_access_term(user_id))
+    if read:
+        terms.add(ACCESS_TERM_PUBLIC)
+    return sorted(terms)
 
 
 def remove_html_tags(html_tag_remover, value):
@@ -500,6 +574,14 @@ def get_existing_chapter_frame_timestamps(deposit):
     return existing
 
 
+# Regex pattern to match timestamp formats:
+# - 0:00, 00:00, 0:0, 00:0, 0:00:00, 00:00:00, etc.
+# - Followed by optional space/tab and chapter title
+CHAPTER_PATTERN = re.compile(
+    r"(?:^|\n)\s*(\d{1,2}:(?:\d{1,2}:)?\d{1,2})\s*[-\s]*(.+?)(?=\n|$)", re.MULTILINE
+)
+
+
 def parse_video_chapters(description):
     """Parse YouTube-style chapter timestamps from video description.
 
@@ -514,18 +596,13 @@ def parse_video_chapters(description):
     Returns:
         list: List of chapter dicts with 'timestamp', 'seconds', and 'title' keys
     """
-    html_tag_remover = HTMLTagRemover()
     if not description:
         return []
 
-    # Regex pattern to match timestamp formats:
-    # - 0:00, 00:00, 0:0, 00:0, 0:00:00, 00:00:00, etc.
-    # - Followed by optional space/tab and chapter title
-    pattern = r"(?:^|\n)\s*(\d{1,2}:(?:\d{1,2}:)?\d{1,2})\s*[-\s]*(.+?)(?=\n|$)"
-
+    html_tag_remover = None
     chapters = []
     seen_timestamps = set()  # Unique seconds in timestamps
-    matches = re.findall(pattern, description, re.MULTILINE)
+    matches = CHAPTER_PATTERN.findall(description)
 
     for timestamp_str, title in matches:
         # Parse timestamp to seconds
@@ -539,8 +616,11 @@ def parse_video_chapters(description):
         else:
             continue
 
-        # Clean up title
-        title = remove_html_tags(html_tag_remover, title).strip()
+        # Clean up title, only parsing the ones with tags or entities
+        if "<" in title or "&" in title:
+            html_tag_remover = html_tag_remover or HTMLTagRemover()
+            title = remove_html_tags(html_tag_remover, title)
+        title = title.strip()
         if title and total_seconds not in seen_timestamps:
             seen_timestamps.add(total_seconds)
             chapters.append(
@@ -553,6 +633,17 @@ def parse_video_chapters(description):
     return chapters
 
 
+def get_video_chapters(record):
+    """Get the chapters of a video, parsed when it was published.
+
+    The description of the videos published before the chapters were
+    stored is parsed instead.
+    """
+    if "chapters" in record:
+        return record["chapters"]
+    return parse_video_chapters(record.get("description", ""))
+
+
 def seconds_to_timestamp(seconds):
     """Convert seconds to timestamp string (MM:SS or HH:MM:SS).
 
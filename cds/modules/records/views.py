@@ -38,6 +38,7 @@ from werkzeug.utils import import_string
 from ..deposit.api import Project, Video
 from ..deposit.fetcher import deposit_fetcher
 from .forms import RecordDeleteForm
+from .serializers.cache import make_cacheable
 from .utils import delete_project_record, delete_video_record, is_project_record
 
 blueprint = Blueprint(
@@ -77,6 +78,8 @@ def records_ui_export(pid, record, template=None, **kwargs):
         if "raw" in request.args:
             response = make_response(data)
             response.headers["Content-Type"] = formats[fmt]["mimetype"]
+            if formats[fmt].get("cacheable"):
+                response = make_cacheable(response, record)
             return response
         else:
             if isinstance(data, six.binary_type):
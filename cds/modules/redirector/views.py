@@ -25,12 +25,26 @@
 """CDS redirector views."""
 
 
-from flask import Blueprint, abort, current_app, redirect, request, url_for
+import arrow
+from arrow.parser import ParserError
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    current_app,
+    redirect,
+    request,
+    stream_with_context,
+    url_for,
+)
 from invenio_pidstore.models import PersistentIdentifier
 from six.moves.urllib.parse import urlencode, urlparse
 from sqlalchemy.orm.exc import NoResultFound
 
+from cds.modules.deposit.api import record_unbuild_url
 from cds.modules.records.api import Record
+from cds.modules.records.search import RecordVideosSearch, search_after_hits
+from cds.modules.records.serializers.drupal import drupal_feed
 
 blueprint = Blueprint(
     "cds_redirector",
@@ -53,10 +67,11 @@ def recid_from_rn(report_number):
         .object_uuid
     )
 
-    record = Record.get_record(object_uuid).replace_refs()
+    record = Record.get_record(object_uuid)
     videos = record.get("videos")
     if videos:
-        return videos[0]["recid"]
+        # the recid is in the reference, no need to load the video
+        return videos[0].get("recid") or record_unbuild_url(videos[0]["$ref"])
     return record.get("recid")
 
 
@@ -96,3 +111,47 @@ def drupal_export_alias():
     api_url += ("&" if urlparse(api_url).query else "?") + urlencode(format_param)
 
     return redirect(api_url, code=301)
+
+
+def get_last_updated(search):
+    """Get when the last of the records matching a search was updated."""
+    hits = search.sort("-_updated").source(["_updated"])[:1].execute().hits
+    if not hits:
+        return None
+    return arrow.get(hits[0]["_updated"]).datetime.replace(microsecond=0)
+
+
+@api_blueprint.route("/mediaexport/feed", strict_slashes=False)
+def drupal_export_feed():
+    """Stream the Drupal entries of the videos updated since a date.
+
+    The entries are built from the search index, oldest update first, one
+    JSON entry per line or, with ``format=json``, as a single document.
+    """
+    search = RecordVideosSearch().sort("_updated", "recid")
+    since = request.args.get("since")
+    if since:
+        try:
+            since = arrow.get(since)
+        except ParserError:
+            abort(400)
+        search = search.filter("range", _updated={"gte": since.isoformat()})
+
+    last_modified = get_last_updated(search)
+    if_modified_since = request.if_modified_since
+    if last_modified and if_modified_since and last_modified <= if_modified_since:
+        response = current_app.response_class(status=304)
+        response.last_modified = last_modified
+        return response
+
+    as_json = request.args.get("format") == "json"
+    hits = search_after_hits(
+        search, current_app.config["CDS_RECORDS_DRUPAL_FEED_PAGE_SIZE"]
+    )
+    response = Response(
+        stream_with_context(drupal_feed(hits, as_json=as_json)),
+        mimetype="application/json" if as_json else "application/x-ndjson",
+    )
+    if last_modified:
+        response.last_modified = last_modified
+    return response
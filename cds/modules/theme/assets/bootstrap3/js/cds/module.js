@@ -69,10 +69,18 @@ app.directive("cdsSearchResults", [
           });
         }
       };
+      // Find the thumbnail computed when indexing the record
+      scope.findThumbnail = function (record, showGif) {
+        var metadata = record.metadata || record;
+        if (metadata._thumbnail) {
+          return showGif ? metadata._thumbnail.gif : metadata._thumbnail.poster;
+        }
+        return showGif ? scope.findGif(record) : scope.findPoster(record);
+      };
       // Get image preview
       scope.getImagePreview = function (record, showGif, size) {
         try {
-          var file = showGif ? scope.findGif(record) : scope.findPoster(record);
+          var file = scope.findThumbnail(record, showGif);
           return _.template(
             "/api/iiif/v2/<%=bucket%>:<%=version_id%>:<%=key%>/full/!<%=size%>/0/default.<%=ext%>"
           )({
@@ -113,6 +113,8 @@ def app():
         THEOPLAYER_LICENSE="CHANGE_ME",
         PRESERVE_CONTEXT_ON_EXCEPTION=False,
         REST_CSRF_ENABLED=False,
+        CDS_REINDEX_QUEUE_ENABLED=False,
+        CDS_RECORDS_SEARCH_CACHE_TIMEOUT=0,
     )
     app.register_blueprint(files_rest_blueprint)
     app.register_blueprint(cds_api_blueprint)
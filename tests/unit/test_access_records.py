@@ -29,12 +29,14 @@ import uuid
 
 import pytest
 from flask_principal import RoleNeed, identity_loaded
-from flask_security import login_user
+from flask_security import current_user, login_user
 from invenio_accounts.models import User
 from invenio_records.api import Record
 
 from cds.modules.records.permissions import (
+    filter_readable_records,
     has_admin_permission,
+    has_read_record_permission,
     record_permission_factory,
 )
 
@@ -122,3 +124,31 @@ def test_record_access(db, users, access, action, is_allowed):
     login_and_test(1)
     # Now test that super-user can do all actions
     login_and_test(3)
+
+
+def test_filter_readable_records(db, users):
+    """Test filtering records as with a read permission check on each."""
+    records = [
+        {"foo": "bar"},
+        {"_access": {"read": []}},
+        {"_access": {"read": [2, "no-access@cern.ch"]}},
+        {"_access": {"read": ["Test-egroup@cern.ch"]}},
+        {"_access": {"read": ["no-access@cern.ch"], "update": [1]}},
+        {"_access": {"read": ["no-access@cern.ch"]}, "_deposit": {"created_by": 1}},
+        {"_access": {"read": ["no-access@cern.ch"]}, "_deposit": {"created_by": 2}},
+    ]
+
+    @identity_loaded.connect
+    def mock_identity_provides(sender, identity):
+        """Add additional group to the user."""
+        identity.provides |= {RoleNeed("Test-Egroup@cern.ch")}
+
+    for user_id, expected in ((users[0], 5), (users[2], 7)):
+        login_user(User.query.get(user_id))
+        readable = filter_readable_records(current_user, records)
+        assert len(readable) == expected
+        assert readable == [
+            record
+            for record in records
+            if has_read_record_permission(current_user, record)
+        ]
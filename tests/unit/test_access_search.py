@@ -27,14 +27,25 @@
 
 import json
 
+import mock
 from flask import g, url_for
-from flask_principal import RoleNeed, UserNeed, identity_loaded
+from flask_principal import Identity, RoleNeed, UserNeed, identity_loaded
 from flask_security import login_user
 from invenio_accounts.models import User
 from invenio_indexer.api import RecordIndexer
-from invenio_search import current_search_client
+from invenio_search import RecordsSearch, current_search_client
+from invenio_search.engine import dsl
 
-from cds.modules.records.search import RecordVideosSearch
+from cds.modules.records.search import (
+    RecordVideosSearch,
+    clear_search_cache,
+    expire_search_cache,
+)
+from cds.modules.records.utils import (
+    ACCESS_TERM_PUBLIC,
+    get_access_terms,
+    get_user_provides,
+)
 
 
 def mock_provides(needs):
@@ -132,3 +143,168 @@ def test_deposit_search(api_app, es, users, api_project, json_headers):
         assert res.status_code == 200
         data = json.loads(res.data.decode("utf-8"))
         assert len(data["hits"]["hits"]) == 1
+
+
+def test_access_terms(api_app, users):
+    """Test the access terms of the records and of the users."""
+    record = {
+        "_access": {"read": ["Group@cern.ch"], "update": ["Editor@cern.ch"]},
+        "_deposit": {"created_by": 1},
+    }
+    assert get_access_terms(record) == [
+        "_owner:1",
+        "editor@cern.ch",
+        "group@cern.ch",
+    ]
+    assert get_access_terms(record, read=False) == ["_owner:1", "editor@cern.ch"]
+    assert get_access_terms({"_access": {"read": []}}) == [ACCESS_TERM_PUBLIC]
+
+    api_app.config["CDS_RECORDS_SEARCH_ACCESS_TERMS"] = True
+    try:
+        with api_app.test_request_context():
+            login_user(User.query.get(users[1]))
+            mock_provides([UserNeed("Test@test.ch"), RoleNeed("groupx")])
+            assert RecordVideosSearch().to_dict()["query"]["bool"]["filter"] == [
+                {
+                    "bool": {
+                        "filter": [
+                            {
+                                "terms": {
+                                    "_access_terms": [
+                                        ACCESS_TERM_PUBLIC,
+                                        "_owner:{0}".format(users[1]),
+                                        "groupx",
+                                        "test@test.ch",
+                                    ]
+                                }
+                            }
+                        ]
+                    }
+                }
+            ]
+    finally:
+        api_app.config["CDS_RECORDS_SEARCH_ACCESS_TERMS"] = False
+
+
+def test_access_terms_search(api_app, es, users, api_project, json_headers):
+    """Test the deposit search filtered by the access terms."""
+    api_app.config["CDS_RECORDS_SEARCH_ACCESS_TERMS"] = True
+    try:
+        RecordIndexer().bulk_index([r.id for r in api_project])
+        RecordIndexer().process_bulk_queue()
+        current_search_client.indices.refresh()
+
+        with api_app.test_client() as client:
+            login_user(User.query.get(users[0]))
+            url = url_for("invenio_deposit_rest.project_list", q="")
+            res = client.get(url, headers=json_headers)
+            assert res.status_code == 200
+            assert len(res.json["hits"]["hits"]) == 1
+
+        with api_app.test_client() as client:
+            login_user(User.query.get(users[1]))
+            res = client.get(url, headers=json_headers)
+            assert res.status_code == 200
+            assert len(res.json["hits"]["hits"]) == 0
+
+            proj = api_project[0]
+            proj["_access"] = {"update": [User.query.get(users[1]).email.upper()]}
+            proj.commit()
+            RecordIndexer().index(proj)
+            current_search_client.indices.refresh()
+
+            res = client.get(url, headers=json_headers)
+            assert res.status_code == 200
+            assert len(res.json["hits"]["hits"]) == 1
+    finally:
+        api_app.config["CDS_RECORDS_SEARCH_ACCESS_TERMS"] = False
+
+
+def test_user_provides_session(api_app, users):
+    """Test that the user's provides are kept in the session."""
+    with api_app.test_request_context():
+        login_user(User.query.get(users[0]))
+        g.identity = Identity(users[0])
+        g.identity.provides.update([UserNeed(users[0]), RoleNeed("Groupx")])
+        provides = get_user_provides()
+        assert sorted(provides, key=str) == sorted([users[0], "groupx"], key=str)
+
+        with mock.patch("cds.modules.records.utils.lowercase_value") as lowercase:
+            assert get_user_provides() == provides
+        assert not lowercase.called
+
+        # a new role is added to the user
+        g.identity.provides.add(RoleNeed("groupy"))
+        assert "groupy" in get_user_provides()
+
+        # the user leaves a group and joins another one
+        g.identity.provides.discard(RoleNeed("groupy"))
+        g.identity.provides.add(RoleNeed("groupz"))
+        provides = get_user_provides()
+        assert "groupz" in provides
+        assert "groupy" not in provides
+
+
+def test_anonymous_search_cache(api_app, es, users, project_published, json_headers):
+    """Test that the searches of the anonymous users are cached."""
+    RecordIndexer().bulk_index(
+        [deposit.fetch_published()[1].id for deposit in project_published]
+    )
+    RecordIndexer().process_bulk_queue()
+    current_search_client.indices.refresh()
+    with api_app.test_request_context():
+        url = url_for("invenio_records_rest.recid_list", q="")
+
+    api_app.config["CDS_RECORDS_SEARCH_CACHE_TIMEOUT"] = 60
+    api_app.config["CDS_RECORDS_SEARCH_CACHE_SETTLE_TIME"] = 0
+    clear_search_cache()
+    try:
+        with mock.patch.object(
+            RecordsSearch, "execute", autospec=True, side_effect=dsl.Search.execute
+        ) as execute:
+            with api_app.test_client() as client:
+                res = client.get(url, headers=json_headers)
+                assert res.status_code == 200
+                hits = res.json["hits"]
+                assert execute.call_count == 1
+
+                res = client.get(url, headers=json_headers)
+                assert res.json["hits"] == hits
+                assert execute.call_count == 1
+
+                # another page is another search
+                res = client.get(url, query_string={"page": 2}, headers=json_headers)
+                assert res.status_code == 200
+                assert execute.call_count == 2
+
+                # the cached searches expire once the records are indexed, at
+                # the end of the request or task
+                record = project_published[1].fetch_published()[1]
+                with api_app.app_context():
+                    expire_search_cache(None, record=record)
+                    expire_search_cache(None, record=record)
+                    res = client.get(url, headers=json_headers)
+                    assert execute.call_count == 2
+                res = client.get(url, headers=json_headers)
+                assert execute.call_count == 3
+                # but not when a deposit is indexed
+                with api_app.app_context():
+                    expire_search_cache(None, record=project_published[1])
+                res = client.get(url, headers=json_headers)
+                assert execute.call_count == 3
+
+                # the searches are not cached until the changes are visible
+                api_app.config["CDS_RECORDS_SEARCH_CACHE_SETTLE_TIME"] = 60
+                clear_search_cache()
+                res = client.get(url, headers=json_headers)
+                res = client.get(url, headers=json_headers)
+                assert execute.call_count == 5
+
+            with api_app.test_client() as client:
+                login_user(User.query.get(users[0]))
+                res = client.get(url, headers=json_headers)
+                assert res.status_code == 200
+                assert execute.call_count == 6
+    finally:
+        api_app.config["CDS_RECORDS_SEARCH_CACHE_TIMEOUT"] = 0
+        api_app.config["CDS_RECORDS_SEARCH_CACHE_SETTLE_TIME"] = 0
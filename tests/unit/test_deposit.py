@@ -231,3 +231,83 @@ def test_deposit_prepare_edit(api_app, db, location, project_deposit_metadata, u
     assert deposit.is_published() is True
     assert deposit.has_record() is True
     check_deposit_record_files(deposit, edited_files, record, edited_files)
+
+
+def test_index_deposit_project_queue(api_app, api_project):
+    """Test that repeated reindexing of a video and its project is collapsed."""
+    from cds.modules.deposit.indexer import current_reindex_queue
+    from cds.modules.deposit.tasks import process_reindex_queue
+    from cds.modules.flows.deposit import index_deposit_project
+
+    (project, video_1, video_2) = api_project
+    current_reindex_queue.client.delete(current_reindex_queue.key)
+    api_app.config["CDS_REINDEX_QUEUE_ENABLED"] = True
+    try:
+        with mock.patch("invenio_indexer.tasks.index_record.delay") as mock_index:
+            for _ in range(5):
+                index_deposit_project(video_1["_deposit"]["id"])
+            index_deposit_project(video_2["_deposit"]["id"])
+        assert not mock_index.called
+        assert len(current_reindex_queue) == 3
+
+        with mock.patch(
+            "invenio_indexer.api.RecordIndexer.bulk_index"
+        ) as mock_bulk_index, mock.patch(
+            "invenio_indexer.api.RecordIndexer.process_bulk_queue"
+        ):
+            process_reindex_queue.delay()
+        assert mock_bulk_index.call_count == 1
+        ((ids,), _) = mock_bulk_index.call_args
+        assert set(ids) == {str(project.id), str(video_1.id), str(video_2.id)}
+        assert len(current_reindex_queue) == 0
+    finally:
+        api_app.config["CDS_REINDEX_QUEUE_ENABLED"] = False
+
+
+def test_index_deposit_projects(api_app, api_project):
+    """Test that only the updated projects are indexed, in chunks."""
+    from datetime import datetime, timedelta
+
+    from cds.modules.deposit.tasks import index_deposit_projects
+
+    (project, video_1, video_2) = api_project
+    start_date = datetime.utcnow() - timedelta(hours=1)
+    with mock.patch("invenio_indexer.api.RecordIndexer.bulk_index") as mock_bulk_index:
+        index_deposit_projects.delay(start_date=start_date, chunk_size=1)
+    ids = [id_ for (ids,), _ in mock_bulk_index.call_args_list for id_ in ids]
+    assert ids == [str(project.id)]
+
+    # nothing changed since the last run
+    with mock.patch("invenio_indexer.api.RecordIndexer.bulk_index") as mock_bulk_index:
+        index_deposit_projects.delay()
+    assert not mock_bulk_index.called
+
+
+def test_indexer_receiver_uses_record_in_hand(api_app, api_project):
+    """Test that the indexer receiver does not reload the deposit."""
+    from invenio_records.api import Record
+
+    from cds.modules.deposit.api import Video
+    from cds.modules.deposit.indexer import (
+        cdsdeposit_indexer_receiver,
+        prefetch_deposits,
+    )
+
+    (project, video_1, video_2) = api_project
+    with mock.patch.object(Video, "get_record") as mock_get_record:
+        json = video_1.dumps()
+        cdsdeposit_indexer_receiver(None, json=json, record=video_1)
+        assert json["_cds"]["state"] == video_1["_cds"]["state"]
+        assert json["_files"] == video_1["_files"]
+
+        record = Record.get_record(video_2.id)
+        json = record.dumps()
+        cdsdeposit_indexer_receiver(None, json=json, record=record)
+        assert json["_files"] == video_2["_files"]
+
+        with prefetch_deposits([str(video_2.id)]) as deposits:
+            assert list(deposits) == [str(video_2.id)]
+            json = record.dumps()
+            cdsdeposit_indexer_receiver(None, json=json, record=record)
+            assert json["_files"] == video_2["_files"]
+    assert not mock_get_record.called
@@ -26,10 +26,12 @@
 
 
 import json
+from datetime import datetime, timedelta
 
 import mock
 import pytest
-from celery import states
+from celery import group, states
+from click.testing import CliRunner
 from flask import url_for
 from flask_principal import UserNeed, identity_loaded
 from flask_security import current_user, login_user
@@ -47,8 +49,20 @@ from invenio_records import Record
 from invenio_records.models import RecordMetadata
 
 from cds.modules.deposit.api import deposit_project_resolver, deposit_video_resolver
-from cds.modules.flows.api import FlowService, get_tasks_status_grouped_by_task_name
-from cds.modules.flows.models import FlowMetadata
+from cds.modules.flows.api import (
+    AVCFlowCeleryTasks,
+    FlowService,
+    get_tasks_status_grouped_by_task_name,
+)
+from cds.modules.flows.cli import flows as flows_cli
+from cds.modules.flows.models import FlowMetadata, FlowTaskStatus
+from cds.modules.flows.profile import TaskTiming, build_report, critical_path
+from cds.modules.flows.tasks import (
+    DownloadTask,
+    ExtractFramesTask,
+    ExtractMetadataTask,
+    TranscodeVideoTask,
+)
 
 
 # TODO: CHECK
@@ -441,3 +455,85 @@ def test_avc_workflow_clean_extract_metadata(
 
     assert ObjectVersion.query.count() == get_object_count()
     assert ObjectVersionTag.query.count() == get_tag_count()
+
+
+def test_build_workflow(app, db, users):
+    """Test that frames and transcoding run in parallel after metadata."""
+    flow = FlowMetadata.create(deposit_id="test", user_id=users[0])
+    db.session.flush()
+    payload = dict(
+        flow_id=str(flow.id),
+        deposit_id="test",
+        key="test.mp4",
+        version_id="version",
+    )
+
+    workflow = AVCFlowCeleryTasks.build_workflow(
+        payload, has_remote_file_to_download="http://example.com/test.mp4"
+    )
+    download, metadata, parallel = workflow.tasks
+    assert download.task == DownloadTask.name
+    assert metadata.task == ExtractMetadataTask.name
+    assert isinstance(parallel, group)
+    assert sorted(s.task for s in parallel.tasks) == sorted(
+        [ExtractFramesTask.name, TranscodeVideoTask.name]
+    )
+
+    workflow = AVCFlowCeleryTasks.build_workflow(
+        payload, has_remote_file_to_download=None
+    )
+    metadata, parallel = workflow.tasks
+    assert metadata.task == ExtractMetadataTask.name
+    assert isinstance(parallel, group)
+
+
+def test_flows_profile(script_info):
+    """Test the timing report and the critical path of the flows."""
+    start = datetime(2026, 1, 1)
+
+    def timing(name, queued, started, finished, status=FlowTaskStatus.SUCCESS):
+        return TaskTiming(
+            flow_id="flow",
+            name=name,
+            stage=name,
+            status=status,
+            queued=start + timedelta(seconds=queued),
+            started=start + timedelta(seconds=started),
+            finished=start + timedelta(seconds=finished),
+            bytes_processed=100 * 10**6,
+            duration=600.0,
+        )
+
+    download = timing("file_download", 0, 10, 60)
+    metadata = timing("file_video_metadata_extraction", 60, 70, 80)
+    frames = timing("file_video_extract_frames", 80, 85, 120)
+    transcode = timing("file_transcode", 80, 100, 380)
+    timings = [download, metadata, frames, transcode]
+
+    assert critical_path(timings) == [download, metadata, transcode]
+
+    report = build_report(timings)
+    assert report["stages"]["file_download"]["wait"][50] == 10
+    assert report["stages"]["file_download"]["run"][50] == 50
+    assert report["stages"]["file_download"]["mb_per_second"] == 2
+    assert report["stages"]["file_transcode"]["realtime_factor"] == 600 / 280.0
+    assert "file_video_extract_frames" not in report["critical_path"]
+    assert report["critical_path"]["file_transcode"]["seconds"] == 300
+    assert report["flows"]["count"] == 1
+    assert report["flows"]["total"][50] == 380
+
+    # flows with failed tasks are not in the critical path
+    report = build_report(
+        timings + [timing("file_transcode", 80, 100, 110, FlowTaskStatus.FAILURE)]
+    )
+    assert report["stages"]["file_transcode"]["failures"] == 1
+    assert report["flows"]["count"] == 0
+
+    # the share of the critical path is missing when it takes no time
+    instant = [timing(t.name, 0, 0, 0) for t in timings]
+    report = build_report(instant)
+    assert report["critical_path"]["file_transcode"]["share"] is None
+    with mock.patch("cds.modules.flows.cli.get_task_timings", return_value=instant):
+        res = CliRunner().invoke(flows_cli, ["profile"], obj=script_info)
+    assert res.exit_code == 0
+    assert "-% of the time" in res.output
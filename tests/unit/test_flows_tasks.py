@@ -23,8 +23,11 @@
 # as an Intergovernmental Organization or submit itself to any jurisdiction.
 """CDS tests for Webhook Celery tasks."""
 
+import hashlib
+import json
 import threading
 import uuid
+from datetime import datetime, timedelta
 
 import mock
 from cds.modules.flows.api import FlowService
@@ -60,7 +63,16 @@ from cds.modules.deposit.api import (
     deposit_project_resolver,
     deposit_video_resolver,
 )
-from cds.modules.flows.models import FlowMetadata, FlowTaskMetadata
+from cds.modules.flows.download import RangedDownload, verify_checksum
+from cds.modules.flows.errors import DownloadTaskError
+from cds.modules.flows.files import relock_bucket, unlock_bucket
+from cds.modules.flows.reaper import REAPER_MESSAGE, count_restarts, reap_stuck_tasks
+from cds.modules.flows.models import (
+    FlowMetadata,
+    FlowTaskEvent,
+    FlowTaskMetadata,
+    FlowTaskStatus,
+)
 from cds.modules.flows.tasks import (
     DownloadTask,
     ExtractFramesTask,
@@ -198,6 +210,229 @@ def test_update_record_retry(app, db):
     assert records[0].json == {"fuu": "bar"}
 
 
+def test_task_payload_columns(app, db):
+    """Test that the promoted payload fields follow the task payload."""
+    flow = FlowMetadata(id=uuid.uuid4(), name="Test", user_id="1", deposit_id="test")
+    db.session.add(flow)
+    task = FlowTaskMetadata.create(
+        flow_id=flow.id,
+        name=TranscodeVideoTask.name,
+        payload={"preset_quality": "480p", "opencast_event_id": "event-1"},
+    )
+    assert task.preset_quality == "480p"
+    assert task.opencast_event_id == "event-1"
+
+    task.payload = dict(task.payload, opencast_event_id="event-2")
+    assert task.preset_quality == "480p"
+    assert task.opencast_event_id == "event-2"
+
+    task.status = FlowTaskStatus.STARTED
+    db.session.commit()
+    started = FlowTaskMetadata.get_started_by_name(TranscodeVideoTask.name)
+    assert [t.id for t in started] == [task.id]
+
+
+def test_task_payload_references_master(app, db, bucket):
+    """Test that the task payload does not copy the master tags."""
+    obj = ObjectVersion.create(bucket, key="test.mp4", stream=BytesIO(b"\x00" * 10))
+    ObjectVersionTag.create(obj, "duration", "10.0")
+    db.session.commit()
+
+    task = ExtractFramesTask()
+    task.deposit_id, task.flow_id, task.key = "test", "flow", "test.mp4"
+    task.object_version = obj
+    task.object_version_id = str(obj.version_id)
+    task.set_base_payload()
+
+    payload = task.get_full_payload(task_id="task")
+    assert "tags" not in payload
+    assert payload["master_id"] == str(obj.version_id)
+    assert task.master_tags["duration"] == "10.0"
+
+
+def test_task_set_status(app, db):
+    """Test setting the status of tasks by primary key."""
+    flow = FlowMetadata(id=uuid.uuid4(), name="Test", user_id="1", deposit_id="test")
+    db.session.add(flow)
+    task_1 = FlowTaskMetadata.create(flow_id=flow.id, name=DownloadTask.name)
+    task_2 = FlowTaskMetadata.create(flow_id=flow.id, name=DownloadTask.name)
+    task_1.status = FlowTaskStatus.STARTED
+    db.session.commit()
+    assert task_1.started is not None
+    assert task_1.worker
+    updated = task_1.updated
+
+    FlowTaskMetadata.set_status(
+        flow.id, DownloadTask.name, [task_1.id], FlowTaskStatus.SUCCESS, "done"
+    )
+    db.session.commit()
+
+    assert task_1.status == FlowTaskStatus.SUCCESS
+    assert task_1.message == "done"
+    assert task_1.updated > updated
+    assert task_1.finished is not None
+    assert task_2.status == FlowTaskStatus.PENDING
+    assert task_2.finished is None
+    events = FlowTaskEvent.get_by_flow(flow.id)
+    assert [(e.task_id, e.status) for e in events][-1] == (task_1.id, "SUCCESS")
+
+
+def test_reap_stuck_tasks(app, db, users):
+    """Test failing the stuck tasks and cancelling the following ones."""
+    flow = FlowMetadata.create(deposit_id="test", user_id=users[0])
+    db.session.flush()
+    download = FlowTaskMetadata.create(flow_id=flow.id, name=DownloadTask.name)
+    metadata = FlowTaskMetadata.create(
+        flow_id=flow.id, name=ExtractMetadataTask.name
+    )
+    download.status = FlowTaskStatus.STARTED
+    download.payload = dict(celery_task_id="dead")
+    db.session.commit()
+
+    with mock.patch(
+        "cds.modules.flows.reaper.get_celery_task_ids", return_value={"alive"}
+    ), mock.patch("cds.modules.flows.reaper.index_deposit_project"):
+        # within the SLA
+        assert reap_stuck_tasks()["checked"] == 0
+
+        counts = reap_stuck_tasks(now=datetime.utcnow() + timedelta(hours=2))
+
+    assert counts == dict(checked=1, failed=1, restarted=0, cancelled=1)
+    assert download.status == FlowTaskStatus.FAILURE
+    assert download.message.startswith(REAPER_MESSAGE)
+    assert metadata.status == FlowTaskStatus.CANCELLED
+    assert count_restarts([download.id]) == {download.id: 1}
+
+
+def test_reap_running_transcoding(app, db, users):
+    """Test that the transcoding still running on OpenCast is not reaped."""
+    flow = FlowMetadata.create(deposit_id="test", user_id=users[0])
+    db.session.flush()
+    transcode = FlowTaskMetadata.create(
+        flow_id=flow.id,
+        name=TranscodeVideoTask.name,
+        payload=dict(opencast_event_id="event", preset_quality="360p"),
+    )
+    transcode.status = FlowTaskStatus.STARTED
+    db.session.commit()
+
+    later = datetime.utcnow() + timedelta(days=1)
+    with mock.patch(
+        "cds.modules.flows.reaper.get_opencast_events",
+        return_value={"event": dict(processing_state="RUNNING", subformats=[])},
+    ), mock.patch("cds.modules.flows.reaper.index_deposit_project"):
+        counts = reap_stuck_tasks(now=later)
+    assert counts == dict(checked=1, failed=0, restarted=0, cancelled=0)
+    assert transcode.status == FlowTaskStatus.STARTED
+
+    with mock.patch(
+        "cds.modules.flows.reaper.get_opencast_events",
+        return_value={"event": dict(processing_state="FAILED", subformats=[])},
+    ), mock.patch("cds.modules.flows.reaper.index_deposit_project"), mock.patch(
+        "cds.modules.flows.reaper.FlowService"
+    ):
+        counts = reap_stuck_tasks(now=later)
+    assert counts == dict(checked=1, failed=0, restarted=1, cancelled=0)
+    assert transcode.status == FlowTaskStatus.FAILURE
+
+
+def test_ranged_download(tmpdir):
+    """Test downloading a file in parallel parts and resuming it."""
+    content = bytes(bytearray(range(256))) * 40
+    requested = []
+
+    def get(uri, headers=None, **kwargs):
+        start, end = headers["Range"][len("bytes=") :].split("-")
+        start, end = int(start), int(end)
+        requested.append((start, end))
+        response = mock.MagicMock(status_code=206)
+        response.headers = {
+            "Content-Range": "bytes {0}-{1}/{2}".format(start, end, len(content))
+        }
+        response.iter_content.return_value = [content[start : end + 1]]
+        response.__enter__.return_value = response
+        return response
+
+    path = str(tmpdir.join("file"))
+    progress = []
+    with mock.patch("requests.get", side_effect=get):
+        download = RangedDownload(
+            "http://example.com/file", path, connections=4, part_min_size=1000
+        )
+        download.download(lambda done, size: progress.append((done, size)))
+    with open(path, "rb") as f:
+        assert f.read() == content
+    assert len(requested) == 5
+    assert progress[-1] == (len(content), len(content))
+    assert not tmpdir.join("file.parts").exists()
+
+    verify_checksum(path, "md5:" + hashlib.md5(content).hexdigest())
+    with pytest.raises(DownloadTaskError):
+        verify_checksum(path, "md5:0")
+
+    # resume from the recorded parts, only the missing bytes are requested
+    tmpdir.join("file.parts").write(
+        json.dumps(
+            dict(
+                uri="http://example.com/file",
+                size=len(content),
+                parts=[[0, 4999, 5000], [5000, 10239, 240]],
+            )
+        )
+    )
+    del requested[:]
+    with mock.patch("requests.get", side_effect=get):
+        RangedDownload("http://example.com/file", path).download()
+    assert requested == [(0, 0), (5240, 10239)]
+
+
+def test_ranged_download_truncated(tmpdir):
+    """Test resuming the parts whose range response is truncated."""
+    content = bytes(bytearray(range(256))) * 40
+    requested = []
+    always_truncate = []
+
+    def get(uri, headers=None, **kwargs):
+        start, end = headers["Range"][len("bytes=") :].split("-")
+        start, end = int(start), int(end)
+        requested.append((start, end))
+        response = mock.MagicMock(status_code=206)
+        response.headers = {
+            "Content-Range": "bytes {0}-{1}/{2}".format(start, end, len(content))
+        }
+        if end - start > 100 and (always_truncate or start in (0, 5120)):
+            # the connection is closed after the first 100 bytes
+            end = start + 99
+        response.iter_content.return_value = [content[start : end + 1]]
+        response.__enter__.return_value = response
+        return response
+
+    path = str(tmpdir.join("file"))
+    with mock.patch("requests.get", side_effect=get), mock.patch("time.sleep"):
+        RangedDownload(
+            "http://example.com/file", path, connections=2, part_min_size=1000
+        ).download()
+    with open(path, "rb") as f:
+        assert f.read() == content
+    # each part is resumed after the bytes already written
+    assert (100, 5119) in requested
+    assert (5220, 10239) in requested
+    assert not tmpdir.join("file.parts").exists()
+
+    # the partial file is removed once the retries are exhausted
+    always_truncate.append(True)
+    del requested[:]
+    with mock.patch("requests.get", side_effect=get), mock.patch("time.sleep"):
+        download = RangedDownload(
+            "http://example.com/file", path, part_min_size=100000, retries=1
+        )
+        with pytest.raises(DownloadTaskError):
+            download.download()
+    assert requested == [(0, 0), (0, 10239), (100, 10239)]
+    assert not tmpdir.join("file").exists()
+    assert not tmpdir.join("file.parts").exists()
+
+
 # TODO: CHECK
 @pytest.mark.skip(reason="TO BE CHECKED")
 def test_metadata_extraction_video(app, db, cds_depid, bucket, video):
@@ -579,6 +814,60 @@ def test_sync_records_with_deposits(
     check_deposit_record_files(deposit, edited_files, record, re_edited_files)
 
 
+def test_published_video_flow_rerun_bucket_lock(
+    app, db, location, users, project_deposit_metadata, video_deposit_metadata
+):
+    """Test the bucket lock when the flow of a published video is re-run."""
+    project = Project.create(project_deposit_metadata)
+    video_deposit_metadata["_project_id"] = project["_deposit"]["id"]
+    deposit = Video.create(video_deposit_metadata)
+    depid = deposit["_deposit"]["id"]
+    bucket_id = str(deposit.files.bucket.id)
+    ObjectVersion.create(deposit.files.bucket, "video.mp4").set_location(
+        "mylocation", 1, "mychecksum"
+    )
+
+    login_user(User.query.get(users[0]))
+    prepare_videos_for_publish([deposit])
+    deposit = deposit.publish()
+    db.session.commit()
+    assert Bucket.get(bucket_id).locked is True
+
+    # frames extraction and transcoding run in parallel
+    frames_task_id, transcode_task_id = str(uuid.uuid4()), str(uuid.uuid4())
+    unlock_bucket(bucket_id, frames_task_id)
+    unlock_bucket(bucket_id, transcode_task_id)
+    assert Bucket.get(bucket_id).locked is False
+
+    # the transcoding finishes first and syncs the record files
+    ObjectVersion.create(Bucket.get(bucket_id), "360p.mp4").set_location(
+        "mylocation_360p", 1, "mychecksum_360p"
+    )
+    db.session.commit()
+    sync_records_with_deposit_files.s(deposit_id=depid).apply_async()
+    relock_bucket(bucket_id, transcode_task_id)
+    # the frames extraction is still adding files
+    assert Bucket.get(bucket_id).locked is False
+    ObjectVersion.create(Bucket.get(bucket_id), "frame-1.jpg").set_location(
+        "mylocation_frame", 1, "mychecksum_frame"
+    )
+    db.session.commit()
+
+    relock_bucket(bucket_id, frames_task_id)
+    assert Bucket.get(bucket_id).locked is True
+    deposit = deposit_video_resolver(depid)
+    assert deposit.is_published() is True
+    _, record = deposit.fetch_published()
+    assert "360p.mp4" in [f["key"] for f in record["_files"]]
+
+    # an unlocked bucket is left unlocked
+    project_bucket_id = str(project.files.bucket.id)
+    assert Bucket.get(project_bucket_id).locked is False
+    unlock_bucket(project_bucket_id, frames_task_id)
+    relock_bucket(project_bucket_id, frames_task_id)
+    assert Bucket.get(project_bucket_id).locked is False
+
+
 def test_extract_chapter_frames_task(app, db, bucket, video, users):
     """Test that chapter frames and chapters.vtt are created from description."""
     # Create a video object version
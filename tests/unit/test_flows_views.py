@@ -48,7 +48,12 @@ from invenio_files_rest.models import Bucket, ObjectVersion, ObjectVersionTag
 from invenio_records.models import RecordMetadata
 
 from cds.modules.deposit.api import deposit_video_resolver
-from cds.modules.flows.models import FlowMetadata
+from cds.modules.flows.models import (
+    FlowMetadata,
+    FlowTaskEvent,
+    FlowTaskMetadata,
+    FlowTaskStatus,
+)
 
 
 def check_restart_avc_workflow(
@@ -561,3 +566,98 @@ def test_flows_reload_master(
         # publish again
         resp = client.post(publish_url, headers=json_headers)
         assert resp.status_code == 202
+
+
+def test_flow_events(api_app, db, api_project, users, access_token):
+    """Test the log of the flow tasks status changes."""
+    (project, video_1, video_2) = api_project
+    video_depid = video_1["_deposit"]["id"]
+    flow = FlowMetadata.create(
+        deposit_id=video_depid,
+        user_id=users[0],
+        payload=dict(deposit_id=video_depid),
+    )
+    db.session.flush()
+    task = FlowTaskMetadata.create(flow_id=flow.id, name="file_download")
+    db.session.commit()
+    task.status = FlowTaskStatus.STARTED
+    db.session.commit()
+    task.message = "Downloading"
+    db.session.commit()
+    task.status = FlowTaskStatus.SUCCESS
+    db.session.commit()
+
+    events = FlowTaskEvent.get_by_flow(flow.id)
+    assert [e.status for e in events] == ["PENDING", "STARTED", "SUCCESS"]
+    assert events[-1].message == "Downloading"
+
+    with api_app.test_request_context():
+        url = url_for(
+            "cds_flows.flow_events_item",
+            flow_id=str(flow.id),
+            access_token=access_token,
+        )
+    with api_app.test_client() as client:
+        resp = client.get(url)
+        assert resp.status_code == 200
+        assert [d["id"] for d in resp.json] == [e.id for e in events]
+
+        # only the events after the last one received
+        resp = client.get(url + "&last_event_id={0}".format(events[0].id))
+        assert [d["status"] for d in resp.json] == ["STARTED", "SUCCESS"]
+
+        resp = client.get(url + "&last_event_id=invalid")
+        assert resp.status_code == 400
+
+
+def test_flow_feedback_not_modified(api_app, db, api_project, users, access_token):
+    """Test the conditional requests of the flow feedback."""
+    (project, video_1, video_2) = api_project
+    video_depid = video_1["_deposit"]["id"]
+    obj = ObjectVersion.create(Bucket.get(video_1["_buckets"]["deposit"]), "test.mp4")
+    flow = FlowMetadata.create(
+        deposit_id=video_depid,
+        user_id=users[0],
+        payload=dict(deposit_id=video_depid, version_id=str(obj.version_id)),
+    )
+    db.session.flush()
+    task = FlowTaskMetadata.create(
+        flow_id=flow.id, name="file_download", payload=dict(key="test.mp4")
+    )
+    db.session.commit()
+
+    with api_app.test_request_context():
+        url = url_for(
+            "cds_flows.flow_feedback_item",
+            flow_id=str(flow.id),
+            access_token=access_token,
+        )
+    with api_app.test_client() as client:
+        resp = client.get(url)
+        assert resp.status_code == 201
+        etag = resp.headers["ETag"]
+
+        resp = client.get(url, headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.headers["ETag"] == etag
+        assert not resp.data
+
+        # the modification dates are not precise enough
+        resp = client.get(
+            url, headers={"If-Modified-Since": "Sun, 01 Jan 2040 00:00:00 GMT"}
+        )
+        assert resp.status_code == 201
+
+        # the tags of the file are part of the response
+        ObjectVersionTag.create(obj, "display_aspect_ratio", "16:9")
+        db.session.commit()
+        resp = client.get(url, headers={"If-None-Match": etag})
+        assert resp.status_code == 201
+        assert resp.headers["ETag"] != etag
+        etag = resp.headers["ETag"]
+
+        task.status = FlowTaskStatus.SUCCESS
+        db.session.commit()
+        resp = client.get(url, headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["ETag"] != etag
@@ -26,8 +26,9 @@
 
 
 import pytest
-from mock import patch
+from mock import MagicMock, patch
 
+from cds.modules.maintenance.bulk import Checkpoint, iter_work_plan, run_work_plan
 from cds.modules.maintenance.subformats import (
     create_all_missing_subformats,
     create_all_subformats,
@@ -165,3 +166,63 @@ def test_recreate_all_subformats(
     sorenson_can_transcode.side_effect = None
     result = create_all_subformats("recid", 2)
     assert sorted(result) == sorted(["360p", "480p", "720p", "1080p", "2160p"])
+
+
+def test_bulk_checkpoint(tmpdir):
+    """Test that the checkpoint of a bulk run can be resumed."""
+    path = str(tmpdir.join("checkpoint"))
+    checkpoint = Checkpoint(path)
+    checkpoint.add(["dep1", "dep2"])
+
+    checkpoint = Checkpoint(path)
+    assert "dep1" in checkpoint
+    assert "dep3" not in checkpoint
+    checkpoint.add(["dep3"])
+    assert Checkpoint(path).done == {"dep1", "dep2", "dep3"}
+
+
+@patch("cds.modules.maintenance.bulk.index_deposit_project")
+@patch("cds.modules.maintenance.bulk.transcoding_signature")
+@patch("cds.modules.maintenance.bulk.FlowMetadata.get_by_deposits")
+@patch("cds.modules.maintenance.bulk._resolve_videos")
+def test_bulk_work_plan(
+    resolve_videos, get_flows, transcoding_signature, index_deposit_project, app
+):
+    """Test the plan and the run of a bulk subformats command."""
+    master = dict(
+        tags=dict(width="1920", height="1080", duration="60"),
+        version_id="uuid_version",
+    )
+    video = dict(
+        _files=[dict(context_type="master", media_type="video", **master)]
+    )
+    resolve_videos.return_value = [None, video, video]
+    get_flows.return_value = {"dep2": "flow2"}
+
+    with patch(
+        "cds.modules.maintenance.bulk._get_master_video",
+        return_value=(master, 1920, 1080),
+    ), patch(
+        "cds.modules.maintenance.bulk.get_qualities_to_transcode",
+        return_value=["360p", "720p"],
+    ):
+        plan = list(iter_work_plan(["dep1", "dep2", "dep3"], "missing"))
+
+    assert [item.error for item in plan] == [
+        "Video not found",
+        None,
+        "Flow not found",
+    ]
+    assert plan[1].qualities == ["360p", "720p"]
+    assert plan[1].duration == 60
+
+    signature = MagicMock()
+    transcoding_signature.return_value = signature
+    checkpoint = Checkpoint()
+    results = list(run_work_plan(plan, checkpoint=checkpoint))
+
+    assert [started for _, started in results] == [False, True, False]
+    transcoding_signature.assert_called_once_with("flow2", ["360p", "720p"])
+    signature.apply_async.assert_called_once_with()
+    index_deposit_project.assert_called_once_with("dep2")
+    assert checkpoint.done == {"dep1", "dep2", "dep3"}
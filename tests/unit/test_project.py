@@ -61,6 +61,7 @@ from cds.modules.deposit.api import (
 )
 from cds.modules.deposit.errors import DiscardConflict
 from cds.modules.deposit.indexer import CDSRecordIndexer
+from cds.modules.flows.api import merge_tasks_status
 from cds.modules.invenio_deposit.search import DepositSearch
 from cds.modules.records.permissions import has_update_permission
 
@@ -166,6 +167,42 @@ def test_delete_videos(api_project):
     assert project["videos"] == [{"$ref": video_1.ref}]
 
 
+def test_video_refs_index(api_project):
+    """Test video references index invalidation and bulk resolution."""
+    (project, video_1, video_2) = api_project
+    assert project._video_refs == [video_1.ref, video_2.ref]
+    assert [video.id for video in project.videos] == [video_1.id, video_2.id]
+    # the index follows direct changes of the list of videos
+    project["videos"] = list(reversed(project["videos"]))
+    assert project._find_refs([video_1.ref]) == {1: video_1.ref}
+    assert [video.id for video in project.videos] == [video_2.id, video_1.id]
+    project._delete_videos([video_2.ref])
+    assert project._video_refs == [video_1.ref]
+    assert [video.id for video in project.videos] == [video_1.id]
+
+
+def test_sync_videos_fresh(api_project):
+    """Test that syncing the videos doesn't overwrite newer changes."""
+    (project, video_1, video_2) = api_project
+    # the videos are resolved and kept by the project
+    assert [video.id for video in project.videos] == [video_1.id, video_2.id]
+
+    # a video is modified in the meantime
+    video = deposit_video_resolver(video_1["_deposit"]["id"])
+    video["title"] = {"title": "modified in the meantime"}
+    video.commit()
+    db.session.commit()
+
+    project.update(_access={"update": ["editor@cern.ch"]})
+    db.session.commit()
+
+    video = deposit_video_resolver(video_1["_deposit"]["id"])
+    assert video["title"] == {"title": "modified in the meantime"}
+    assert video["_access"]["update"] == ["editor@cern.ch"]
+    video = deposit_video_resolver(video_2["_deposit"]["id"])
+    assert video["_access"]["update"] == ["editor@cern.ch"]
+
+
 def test_add_video(
     api_app, es, users, location, project_deposit_metadata, video_deposit_metadata
 ):
@@ -604,3 +641,18 @@ def test_project_keywords(es, api_project, keyword_1, keyword_2, users):
     kw_result = {k["key_id"]: k["name"] for k in result["_source"]["keywords"]}
     kw_expect = {k["key_id"]: k["name"] for k in [keyword_2]}
     assert kw_expect == kw_result
+
+
+def test_project_tasks_status(api_project):
+    """Test the project tasks status computed without loading the videos."""
+    (project, video_1, video_2) = api_project
+    with mock.patch.object(Video, "get_record") as mock_get_record, mock.patch.object(
+        Video, "get_records"
+    ) as mock_get_records:
+        status = project._current_tasks_status()
+    assert not mock_get_record.called
+    assert not mock_get_records.called
+    expected = {}
+    for video in (video_1, video_2):
+        expected = merge_tasks_status(expected, video._current_tasks_status())
+    assert status == expected
@@ -27,6 +27,7 @@
 
 import json
 import re
+from copy import deepcopy
 from functools import partial
 
 import mock
@@ -37,7 +38,11 @@ from helpers import assert_hits_len, get_files_metadata
 from invenio_accounts.models import User
 from invenio_db import db
 from invenio_indexer.api import RecordIndexer
+from invenio_records.api import Record
 from invenio_search import current_search_client
+from jsonref import JsonRefError
+
+from cds.modules.records.api import CDSRecord, CDSVideosFilesIterator
 
 
 def test_records_ui_export(app, project_published, video_record_metadata):
@@ -113,6 +118,42 @@ def test_records_ui_export(app, project_published, video_record_metadata):
             assert get_pre(data).startswith("&lt;?xml version=")
 
 
+def test_records_ui_export_cache(app, project_published, video_record_metadata):
+    """Test the HTTP caching of the formats requested by the players."""
+    (project, video_1, video_2) = project_published
+    _, record_video = video_1.fetch_published()
+    record_video.update(**video_record_metadata)
+    record_video.commit()
+    db.session.commit()
+    vid = video_1["_deposit"]["pid"]["value"]
+
+    with app.test_request_context():
+        url = url_for(
+            "invenio_records_ui.recid_export", pid_value=vid, format="vtt", raw=True
+        )
+
+    with app.test_client() as client:
+        res = client.get(url)
+        assert res.status_code == 200
+        etag = res.headers["ETag"]
+        assert not etag.startswith("W/")
+        assert res.cache_control.max_age == app.config["CDS_RECORDS_FORMAT_MAX_AGE"]
+
+        # served from the cache
+        with mock.patch("cds.modules.records.serializers.vtt.VTT.format") as format_:
+            res = client.get(url, headers={"If-None-Match": etag})
+        assert res.status_code == 304
+        assert not format_.called
+
+        # until a new revision of the record
+        record_video["_files"][0]["frame"] = record_video["_files"][0]["frame"][:2]
+        record_video.commit()
+        db.session.commit()
+        res = client.get(url, headers={"If-None-Match": etag})
+        assert res.status_code == 200
+        assert res.headers["ETag"] != etag
+
+
 def test_records_rest(
     api_app,
     users,
@@ -306,3 +347,139 @@ def test_videos_search(api_app, indexed_videos):
         res = client.get(search_url, query_string={"q": "Project"})
         assert_hits_len(res, 0)
         assert res.status_code == 200
+
+
+def test_records_replace_refs(api_app, project_published, keyword_1, keyword_2):
+    """Test replacing the references of a record in bulk."""
+    (project, video_1, video_2) = project_published
+    pid, record = project.fetch_published()
+    record["keywords"] = [{"$ref": keyword_1.ref}, {"$ref": keyword_2.ref}]
+    record.commit()
+    _, record_video = video_1.fetch_published()
+    record_video["keywords"] = [{"$ref": keyword_1.ref}]
+    record_video.commit()
+    db.session.commit()
+
+    record = CDSRecord.get_record(record.id)
+    expected = deepcopy(Record.replace_refs(record))
+    with api_app.test_request_context():
+        with mock.patch(
+            "cds.modules.records.jsonresolver.records.record_resolver"
+        ) as record_resolver, mock.patch(
+            "cds.modules.records.jsonresolver.keywords.keyword_resolver"
+        ) as keyword_resolver:
+            assert record.replace_refs() == expected
+        assert not record_resolver.resolve.called
+        assert not keyword_resolver.resolve.called
+        assert [video["title"] for video in expected["videos"]] == [
+            video_1["title"],
+            video_2["title"],
+        ]
+        assert expected["videos"][0]["keywords"][0]["name"] == "13 TeV"
+
+        # the resolved records are kept for the request
+        with mock.patch("cds.modules.records.refs.db") as refs_db:
+            assert record.replace_refs() == expected
+        assert not refs_db.session.query.called
+
+        # until a record changes
+        record_video["title"]["title"] = "Changed"
+        record_video.commit()
+        assert record.replace_refs()["videos"][0]["title"]["title"] == "Changed"
+
+    # a reference which cannot be resolved in bulk raises as before
+    record["keywords"].append({"$ref": "https://cds.cern.ch/api/keywords/404"})
+    with pytest.raises(JsonRefError):
+        deepcopy(record.replace_refs())
+
+
+def test_drupal_export_feed(api_app, es, project_published, video_record_metadata):
+    """Test the feed of the Drupal entries of the updated videos."""
+    (project, video_1, video_2) = project_published
+    _, record_video = video_1.fetch_published()
+    record_video.update(**video_record_metadata)
+    record_video.commit()
+    db.session.commit()
+    RecordIndexer().index(record_video)
+    current_search_client.indices.refresh()
+
+    with api_app.test_request_context():
+        url = url_for("cds_api_redirector.drupal_export_feed")
+
+    with api_app.test_client() as client:
+        res = client.get(url)
+        assert res.status_code == 200
+        assert res.mimetype == "application/x-ndjson"
+        lines = res.get_data(as_text=True).splitlines()
+        entries = [json.loads(line) for line in lines]
+        assert record_video["report_number"][0] in [entry["id"] for entry in entries]
+
+        res = client.get(url, query_string={"format": "json"})
+        assert res.status_code == 200
+        assert [entry["entry"] for entry in res.json["entries"]] == entries
+
+        # nothing changed since the last export
+        res = client.get(
+            url, headers={"If-Modified-Since": res.headers["Last-Modified"]}
+        )
+        assert res.status_code == 304
+
+        res = client.get(url, query_string={"since": "2100-01-01"})
+        assert res.status_code == 200
+        assert res.data == b""
+
+        res = client.get(url, query_string={"since": "yesterday"})
+        assert res.status_code == 400
+
+
+def test_records_search_ui_source(
+    api_app, es, project_published, video_record_metadata
+):
+    """Test that the search UI gets only the fields it renders."""
+    (project, video_1, video_2) = project_published
+    _, record_video = video_1.fetch_published()
+    record_video.update(**video_record_metadata)
+    record_video.commit()
+    db.session.commit()
+    RecordIndexer().index(record_video)
+    current_search_client.indices.refresh()
+
+    frame = video_record_metadata["_files"][0]["frame"][0]
+    thumbnail = CDSVideosFilesIterator.get_video_thumbnail(record_video)
+    assert thumbnail == {
+        "poster": {
+            "bucket_id": frame["bucket_id"],
+            "version_id": frame["version_id"],
+            "key": "frame-1.jpg",
+        }
+    }
+
+    with api_app.test_request_context():
+        url = url_for("invenio_records_rest.recid_list")
+
+    query = "recid:{0}".format(record_video["recid"])
+    with api_app.test_client() as client:
+        res = client.get(url, query_string={"q": query})
+        assert res.status_code == 200
+        [hit] = res.json["hits"]["hits"]
+        assert "_files" in hit["metadata"]
+        assert hit["metadata"]["_thumbnail"] == thumbnail
+
+        # the full hits until the records are reindexed
+        res = client.get(url, query_string={"q": query, "format": "ui"})
+        assert res.status_code == 200
+        [hit] = res.json["hits"]["hits"]
+        assert "_files" in hit["metadata"]
+
+        api_app.config["CDS_RECORDS_REST_SEARCH_SOURCE_ENABLED"] = True
+        try:
+            res = client.get(url, query_string={"q": query, "format": "ui"})
+        finally:
+            api_app.config["CDS_RECORDS_REST_SEARCH_SOURCE_ENABLED"] = False
+        assert res.status_code == 200
+        [hit] = res.json["hits"]["hits"]
+        assert hit["id"] == str(record_video["recid"])
+        assert hit["metadata"]["title"] == record_video["title"]
+        assert hit["metadata"]["_thumbnail"] == thumbnail
+        assert "_files" not in hit["metadata"]
+        assert "_deposit" not in hit["metadata"]
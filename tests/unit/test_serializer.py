@@ -25,14 +25,27 @@
 """Test serializers."""
 
 
+import json
 import xml.etree.ElementTree as ET
+from io import BytesIO
+
+from flask_security import login_user
+from invenio_accounts.models import User
+from invenio_db import db
+from invenio_files_rest.models import ObjectVersion
+from invenio_pidstore.fetchers import FetchedPID
+from invenio_records_rest.schemas import RecordSchemaJSONV1
+import pytest
 
 from cds.modules.deposit.api import Video
 from cds.modules.records.serializers.drupal import VideoDrupal
-from cds.modules.records.serializers.json import CDSJSONSerializer
+from cds.modules.records.serializers.json import (
+    CDSJSONSerializer,
+    sanitize_description,
+)
 from cds.modules.records.api import CDSRecord
-from unittest.mock import Mock
-from cds.modules.records.serializers.smil import Smil
+from unittest.mock import Mock, patch
+from cds.modules.records.serializers.smil import Smil, SmilSerializer
 from cds.modules.records.serializers.vtt import VTT
 
 
@@ -78,6 +91,25 @@ def test_smil_serializer(video_record_metadata):
     parse_and_test(rec, 2, "240")
 
 
+def test_smil_serializer_stored_file(db, video_record_metadata):
+    """Test that the SMIL file generated when publishing is served."""
+    master = video_record_metadata["_files"][0]
+    obj = ObjectVersion.create(
+        master["bucket_id"], "test.smil", stream=BytesIO(b"<smil>stored</smil>")
+    )
+    db.session.commit()
+    master["playlist"] = [
+        dict(
+            bucket_id=str(obj.bucket_id), key=obj.key, version_id=str(obj.version_id)
+        )
+    ]
+    record = CDSRecord.create(video_record_metadata)
+
+    assert SmilSerializer.serialize(None, record) == "<smil>stored</smil>"
+    # the file itself is rendered from the record
+    assert "stored" not in SmilSerializer.render(record)
+
+
 def test_vtt_serializer(video_record_metadata):
     """Test vtt serializer."""
     serializer = VTT(record=video_record_metadata)
@@ -201,3 +233,120 @@ def test_cds_json_serializer_sanitization(video_record_metadata):
     translations = result['metadata']['translations']
     for tr in translations:
         assert '<script>' not in tr['description']
+
+
+def test_cds_json_serializer_sanitization_cache():
+    """Test that the same description is sanitized only once."""
+    serializer = CDSJSONSerializer()
+    description = '<script>alert("xss")</script>Cached <b>content</b>'
+    hits = sanitize_description.cache_info().hits
+
+    first = serializer._sanitize_metadata(dict(description=description))
+    second = serializer._sanitize_metadata(dict(description=description))
+
+    assert first == second
+    assert "<script>" not in second["description"]
+    assert sanitize_description.cache_info().hits == hits + 1
+
+
+def test_cds_json_serializer_stored_chapters(video_record_metadata):
+    """Test that the chapters stored when publishing are not parsed again."""
+    record = CDSRecord.create(video_record_metadata)
+    record["description"] = "0:00 Intro\n1:00 Conclusion"
+    record["chapters"] = [{"timestamp": "0:00", "seconds": 0, "title": "Stored"}]
+    mock_pid = Mock()
+    mock_pid.pid_value = "1"
+
+    with patch("cds.modules.records.utils.parse_video_chapters") as parse:
+        result = CDSJSONSerializer().preprocess_record(mock_pid, record)
+    assert result["metadata"]["chapters"] == record["chapters"]
+    assert not parse.called
+
+    # records published before the chapters were stored
+    del record["chapters"]
+    result = CDSJSONSerializer().preprocess_record(mock_pid, record)
+    assert [c["title"] for c in result["metadata"]["chapters"]] == [
+        "Intro",
+        "Conclusion",
+    ]
+
+
+def test_cds_json_serializer_project_videos(api_app, project_published, users):
+    """Test that the videos of a project are resolved and filtered in bulk."""
+    project, video_1, video_2 = project_published
+    _, record = project.fetch_published()
+    _, video_record = video_2.fetch_published()
+    video_record["_access"] = {"read": ["no-access@cern.ch"]}
+    video_record.commit()
+    db.session.commit()
+    mock_pid = Mock()
+    mock_pid.pid_value = record["recid"]
+
+    with api_app.test_request_context():
+        login_user(User.query.get(users[1]))
+        with patch(
+            "cds.modules.deposit.api.record_video_resolver"
+        ) as single_resolver, patch(
+            "cds.modules.records.resolver.record_resolver"
+        ) as record_resolver:
+            result = CDSJSONSerializer(replace_refs=True).preprocess_record(
+                mock_pid, CDSRecord.get_record(record.id)
+            )
+        assert not single_resolver.called
+        assert not record_resolver.resolve.called
+        videos = result["metadata"]["videos"]
+        _, video_1_record = video_1.fetch_published()
+        assert [video["recid"] for video in videos] == [video_1_record["recid"]]
+        assert "$ref" not in str(videos)
+        # the videos are the published records, not the deposits
+        stored = CDSRecord.get_record(video_1_record.id)
+        assert videos[0]["_files"] == stored["_files"]
+        assert videos[0]["_cds"] == stored["_cds"]
+
+        # the owner reads all the videos
+        login_user(User.query.get(users[0]))
+        result = CDSJSONSerializer(replace_refs=True).preprocess_record(
+            mock_pid, CDSRecord.get_record(record.id)
+        )
+        assert len(result["metadata"]["videos"]) == 2
+
+
+def test_cds_json_serializer_fast_json(api_app, video_record_metadata):
+    """Test that the records are encoded the same with ``orjson``."""
+    pytest.importorskip("orjson")
+    record = CDSRecord.create(video_record_metadata)
+    pid = FetchedPID(provider=None, pid_type="recid", pid_value="1")
+    hits = [
+        {"_id": str(record.id), "_source": dict(record), "_version": 1},
+        {"_id": str(record.id), "_source": dict(record), "_version": 2},
+    ]
+    search_result = {
+        "hits": {"hits": hits, "total": {"value": 2}},
+        "aggregations": {"type": {"buckets": []}},
+    }
+    serializer = CDSJSONSerializer(RecordSchemaJSONV1)
+
+    def serialize():
+        search = serializer.serialize_search(
+            lambda id_, source: pid,
+            search_result,
+            links={"self": "http://localhost/api/records/"},
+        )
+        if not isinstance(search, (str, bytes)):
+            # streamed hits
+            search = b"".join(search)
+        return json.loads(serializer.serialize(pid, record)), json.loads(search)
+
+    with api_app.test_request_context():
+        expected = serialize()
+    api_app.config["CDS_RECORDS_REST_FAST_JSON"] = True
+    try:
+        with api_app.test_request_context():
+            assert isinstance(serializer.serialize(pid, record), bytes)
+            with patch.object(RecordSchemaJSONV1, "dump") as dump:
+                assert serialize() == expected
+            assert not dump.called
+    finally:
+        api_app.config["CDS_RECORDS_REST_FAST_JSON"] = False
+    assert expected[0]["id"] == "1"
+    assert len(expected[1]["hits"]["hits"]) == 2